@@ -1,7 +1,8 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from src.models.traj_gru_enc_dec import TrajGRUCell
+from functools import partial
+from src.models.traj_gru_enc_dec import TrajGRUCell, checkpoint_call, check_checkpoint_mode
 
 
 class TrajGRU(nn.Module):
@@ -26,8 +27,11 @@ class TrajGRU(nn.Module):
         Input sequence length (default: 10).
     seq_len_out : int, optional
         Output sequence length (default: 1).
+    checkpoint : str, optional
+        Activation checkpointing during training: 'step' recomputes each TrajGRU time step,
+        'stage' recomputes each layer over the whole input sequence, None keeps all activations (default: None).
     """
-    def __init__(self, input_channels, hidden_channels, kernel_size=3, L=5, seq_len_in=10, seq_len_out=1):
+    def __init__(self, input_channels, hidden_channels, kernel_size=3, L=5, seq_len_in=10, seq_len_out=1, checkpoint=None):
         super().__init__()
         self.seq_len_in = seq_len_in
         self.seq_len_out = seq_len_out
@@ -52,13 +56,23 @@ class TrajGRU(nn.Module):
             ) for i in range(self.n_layers)
         ])
         self.out_conv = nn.Conv2d(hidden_channels[-1], input_channels, 1)
+        self.set_checkpointing(checkpoint)
+
+    def set_checkpointing(self, mode):
+        """
+        Select activation checkpointing: 'step', 'stage' or None.
+        """
+        self.checkpoint_mode = check_checkpoint_mode(mode)
+        for cell in self.cells:
+            cell.checkpoint = mode == "step"
 
     def forward(self, x):
         B, C, D, H, W = x.size()
         seq = x.permute(2, 0, 1, 3, 4)
         states = []
         for i, cell in enumerate(self.cells):
-            outputs_i, state_i = cell(seq if i == 0 else seq_i, None, seq_len=self.seq_len_in)
+            outputs_i, state_i = checkpoint_call(self.checkpoint_mode == "stage", partial(cell, seq_len=self.seq_len_in),
+                                                 seq if i == 0 else seq_i, None)
             seq_i = outputs_i
             states.append(state_i)
         outputs = []
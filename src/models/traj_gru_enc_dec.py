@@ -1,9 +1,33 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from functools import partial
+from torch.utils.checkpoint import checkpoint as _checkpoint
 from typing import Optional, List, Tuple
 
 
+CHECKPOINT_MODES = (None, "step", "stage")
+
+
+def checkpoint_call(enabled: bool, fn, *args):
+    """
+    Call fn(*args), under activation checkpointing when enabled and gradients are recorded.
+
+    The activations inside fn are freed after the forward pass and recomputed during backward;
+    only the inputs and outputs of fn are kept.
+    """
+    if enabled and torch.is_grad_enabled():
+        return _checkpoint(fn, *args, use_reentrant=False)
+    return fn(*args)
+
+
+def check_checkpoint_mode(mode):
+    """Validate an activation checkpointing mode ('step', 'stage' or None)."""
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"Unknown checkpoint mode: {mode}. Choose from {CHECKPOINT_MODES}")
+    return mode
+
+
 class TrajGRUCell(nn.Module):
     """
     Trajectory GRU (TrajGRU) recurrent cell with flow-based warping.
@@ -26,6 +50,13 @@ class TrajGRUCell(nn.Module):
         Padding of the input-to-hidden convolution.
     act_type : callable, optional (default=torch.tanh)
         Activation function used inside the flow generator and for new memory computation.
+
+    Attributes
+    ----------
+    checkpoint : bool
+        If True, each time step is run under activation checkpointing during training, so the
+        flows and the L warped copies of the hidden state are recomputed in backward instead of
+        being kept for every step (default: False).
     """
     def __init__(
         self,
@@ -49,6 +80,7 @@ class TrajGRUCell(nn.Module):
         self.h2f_conv1 = nn.Conv2d(num_filter, 32, kernel_size=5, padding=2)
         self.flows_conv = nn.Conv2d(32, L * 2, kernel_size=5, padding=2)
         self.ret = nn.Conv2d(num_filter * L, num_filter * 3, kernel_size=1)
+        self.checkpoint = False
 
     def _wrap(self, input: torch.Tensor, flow: torch.Tensor) -> torch.Tensor:
         """
@@ -117,23 +149,30 @@ class TrajGRUCell(nn.Module):
         outputs = []
         for t in range(seq_len):
             x_t = inputs[t, ...] if inputs is not None else None
-            flows = self._flow_generator(x_t, h_prev)
-            warped = [self._wrap(h_prev, -flow) for flow in flows]
-            wrapped_data = torch.cat(warped, dim=1)
-            h2h = self.ret(wrapped_data)
-            h2h_slices = torch.split(h2h, self.num_filter, dim=1)
             if i2h_slices is not None:
-                reset_gate = torch.sigmoid(i2h_slices[0][t, ...] + h2h_slices[0])
-                update_gate = torch.sigmoid(i2h_slices[1][t, ...] + h2h_slices[1])
-                new_mem = self.act(i2h_slices[2][t, ...] + reset_gate * h2h_slices[2])
+                h_prev = checkpoint_call(self.checkpoint, self._step, x_t, h_prev,
+                                         i2h_slices[0][t, ...], i2h_slices[1][t, ...], i2h_slices[2][t, ...])
             else:
-                reset_gate = torch.sigmoid(h2h_slices[0])
-                update_gate = torch.sigmoid(h2h_slices[1])
-                new_mem = self.act(reset_gate * h2h_slices[2])
-            h_prev = update_gate * h_prev + (1 - update_gate) * new_mem
+                h_prev = checkpoint_call(self.checkpoint, self._step, x_t, h_prev)
             outputs.append(h_prev)
         return torch.stack(outputs), h_prev
 
+    def _step(self, x_t, h_prev, i2h_r=None, i2h_u=None, i2h_m=None):
+        flows = self._flow_generator(x_t, h_prev)
+        warped = [self._wrap(h_prev, -flow) for flow in flows]
+        wrapped_data = torch.cat(warped, dim=1)
+        h2h = self.ret(wrapped_data)
+        h2h_slices = torch.split(h2h, self.num_filter, dim=1)
+        if i2h_r is not None:
+            reset_gate = torch.sigmoid(i2h_r + h2h_slices[0])
+            update_gate = torch.sigmoid(i2h_u + h2h_slices[1])
+            new_mem = self.act(i2h_m + reset_gate * h2h_slices[2])
+        else:
+            reset_gate = torch.sigmoid(h2h_slices[0])
+            update_gate = torch.sigmoid(h2h_slices[1])
+            new_mem = self.act(reset_gate * h2h_slices[2])
+        return update_gate * h_prev + (1 - update_gate) * new_mem
+
 
 class TrajGRUEncoder(nn.Module):
     """
@@ -180,6 +219,7 @@ class TrajGRUEncoder(nn.Module):
                 )
             )
             curr_in = h
+        self.checkpoint = False
 
     def forward(self, x_sbhwc: torch.Tensor) -> Tuple[Tuple[torch.Tensor, ...], torch.Tensor]:
         """
@@ -194,7 +234,7 @@ class TrajGRUEncoder(nn.Module):
             feats_reshaped = feats.reshape(-1, feats.size(2), feats.size(3), feats.size(4))
             feats_reshaped = stage(feats_reshaped)
             feats = feats_reshaped.view(S, B, feats_reshaped.size(1), feats_reshaped.size(2), feats_reshaped.size(3))
-            outputs, state = rnn(feats, None, seq_len=S)
+            outputs, state = checkpoint_call(self.checkpoint, partial(rnn, seq_len=S), feats, None)
             feats = outputs
             hidden_states.append(state)
         return tuple(hidden_states), feats
@@ -259,6 +299,7 @@ class TrajGRUForecaster(nn.Module):
                     output_padding=max(stride - 1, 0),
                 )
             )
+        self.checkpoint = False
 
     def forward(self, hidden_states: Tuple[torch.Tensor, ...], out_len: int, start_feats: torch.Tensor) -> torch.Tensor:
         """
@@ -273,7 +314,7 @@ class TrajGRUForecaster(nn.Module):
         for i in range(self.blocks):
             rnn = self.rnns[i]
             state = hidden_states[-(i + 1)]
-            outputs, _ = rnn(x, state, seq_len=out_len)
+            outputs, _ = checkpoint_call(self.checkpoint, partial(rnn, seq_len=out_len), x, state)
             o = outputs.reshape(-1, outputs.size(2), outputs.size(3), outputs.size(4))
             o = self.stages[i](o)
             x = o.view(out_len, B, o.size(1), o.size(2), o.size(3))
@@ -302,6 +343,9 @@ class TrajGRUEncoderDecoder(nn.Module):
         Number of input frames.
     seq_len_out : int, optional (default=1)
         Number of output frames to generate.
+    checkpoint : str, optional (default=None)
+        Activation checkpointing during training: 'step' recomputes each TrajGRU time step,
+        'stage' recomputes each TrajGRU stage over the whole sequence, None keeps all activations.
     """
     def __init__(
         self,
@@ -313,12 +357,23 @@ class TrajGRUEncoderDecoder(nn.Module):
         conv_strides,
         seq_len_in=10,
         seq_len_out=1,
+        checkpoint=None,
     ):
         super().__init__()
         self.seq_len_in = seq_len_in
         self.seq_len_out = seq_len_out
         self.encoder = TrajGRUEncoder(input_channels, hidden_channels, conv_kernels, conv_strides, L)
         self.forecaster = TrajGRUForecaster(hidden_channels, conv_kernels, conv_strides, L, out_channels=input_channels)
+        self.set_checkpointing(checkpoint)
+
+    def set_checkpointing(self, mode):
+        """
+        Select activation checkpointing: 'step', 'stage' or None.
+        """
+        self.checkpoint_mode = check_checkpoint_mode(mode)
+        for cell in list(self.encoder.rnns) + list(self.forecaster.rnns):
+            cell.checkpoint = mode == "step"
+        self.encoder.checkpoint = self.forecaster.checkpoint = mode == "stage"
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         """
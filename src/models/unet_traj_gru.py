@@ -1,7 +1,7 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from src.models.traj_gru_enc_dec import TrajGRUCell 
+from src.models.traj_gru_enc_dec import TrajGRUCell, checkpoint_call, check_checkpoint_mode
 
 
 class DoubleTrajGRUBlock(nn.Module):
@@ -146,8 +146,12 @@ class UNetTrajGRU(nn.Module):
         Convolution kernel size for all TrajGRU convolutions (must be odd) (default: 3).
     L : int, optional
         Number of flow fields for all TrajGRU layers across encoder, bottleneck, and decoder (default: 5).
+    checkpoint : str, optional
+        Activation checkpointing during training: 'step' recomputes each TrajGRU cell step,
+        'stage' recomputes each U-Net stage (inc, down, bottleneck, up) per time step,
+        None keeps all activations (default: None).
     """
-    def __init__(self, in_ch, out_ch, base_ch=32, bottleneck_dims=None, seq_len=10, kernel=3, L=5):
+    def __init__(self, in_ch, out_ch, base_ch=32, bottleneck_dims=None, seq_len=10, kernel=3, L=5, checkpoint=None):
         super().__init__()
         self.seq_len = seq_len
         self.kernel = kernel
@@ -175,6 +179,19 @@ class UNetTrajGRU(nn.Module):
         self.up1 = Up(in_channels, base_ch*2, base_ch*2, kernel, L, seq_len)
         self.up2 = Up(base_ch*2, base_ch, base_ch, kernel, L, seq_len)
         self.outc = nn.Conv2d(base_ch, out_ch, 1)
+        self.set_checkpointing(checkpoint)
+
+    def set_checkpointing(self, mode):
+        """
+        Select activation checkpointing: 'step', 'stage' or None.
+        """
+        self.checkpoint_mode = check_checkpoint_mode(mode)
+        for module in self.modules():
+            if isinstance(module, TrajGRUCell):
+                module.checkpoint = mode == "step"
+
+    def _stage(self, module, *args):
+        return checkpoint_call(self.checkpoint_mode == "stage", module, *args)
 
     def forward(self, x):
         # x: (B, S, C, H, W)
@@ -213,18 +230,18 @@ class UNetTrajGRU(nn.Module):
             xt = x[:, t]  # (B, C, H, W)
             
             # Input stage 
-            h_inc = self.inc(xt, hidden_states['inc'][0], hidden_states['inc'][1])
+            h_inc = self._stage(self.inc, xt, hidden_states['inc'][0], hidden_states['inc'][1])
             hidden_states['inc'][0] = h_inc  
             hidden_states['inc'][1] = h_inc
             encoded_features.append(h_inc)
             
             # Downsampling stages
-            h_down1 = self.down1(h_inc, hidden_states['down1'][0], hidden_states['down1'][1])
+            h_down1 = self._stage(self.down1, h_inc, hidden_states['down1'][0], hidden_states['down1'][1])
             hidden_states['down1'][0] = h_down1
             hidden_states['down1'][1] = h_down1
             encoded_features.append(h_down1)
             
-            h_down2 = self.down2(h_down1, hidden_states['down2'][0], hidden_states['down2'][1])
+            h_down2 = self._stage(self.down2, h_down1, hidden_states['down2'][0], hidden_states['down2'][1])
             hidden_states['down2'][0] = h_down2
             hidden_states['down2'][1] = h_down2
             encoded_features.append(h_down2)
@@ -233,12 +250,12 @@ class UNetTrajGRU(nn.Module):
         x = encoded_features[-1]  # Deepest encoded feature 
         
         for i, bottleneck_layer in enumerate(self.bottleneck):
-            x = bottleneck_layer(x, bottleneck_hidden[i][0], bottleneck_hidden[i][1])
+            x = self._stage(bottleneck_layer, x, bottleneck_hidden[i][0], bottleneck_hidden[i][1])
             bottleneck_hidden[i][0] = x
             bottleneck_hidden[i][1] = x
         
         # Decoder path 
-        x = self.up1(x, encoded_features[-2], hidden_states['down1'][0], hidden_states['down1'][1]) 
-        x = self.up2(x, encoded_features[-3], hidden_states['inc'][0], hidden_states['inc'][1])
+        x = self._stage(self.up1, x, encoded_features[-2], hidden_states['down1'][0], hidden_states['down1'][1])
+        x = self._stage(self.up2, x, encoded_features[-3], hidden_states['inc'][0], hidden_states['inc'][1])
         x = self.outc(x)  # (B, out_ch, H, W)
         return x
@@ -0,0 +1,202 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import argparse
+import json
+import time
+import torch
+
+from src.training.utils.training_utils import b_mse_loss, weighted_mse_loss, lut_weighted_mse, B_MSE_EDGES, B_MSE_WEIGHTS
+
+
+def reference_weighted_mse_loss(pred, target, threshold=30.0, weight_high=10.0, maxv=85.0, eps=1e-6):
+    """Mask-based weighted MSE, kept as the baseline of the benchmark."""
+    pred_dBZ = pred * (maxv + eps)
+    target_dBZ = target * (maxv + eps)
+    weight = torch.ones_like(target_dBZ)
+    weight[target_dBZ > threshold] = weight_high
+    return ((pred_dBZ - target_dBZ) ** 2 * weight).mean()
+
+
+def reference_b_mse_loss(pred, target, maxv=85.0, eps=1e-6):
+    """Chained torch.where B-MSE, kept as the baseline of the benchmark."""
+    pred_dBZ = pred * (maxv + eps)
+    target_dBZ = target * (maxv + eps)
+    w = torch.ones_like(target_dBZ)
+    w = torch.where(target_dBZ < 2, torch.tensor(1.0, device=target.device), w)
+    w = torch.where((target_dBZ >= 2) & (target_dBZ < 5), torch.tensor(2.0, device=target.device), w)
+    w = torch.where((target_dBZ >= 5) & (target_dBZ < 10), torch.tensor(5.0, device=target.device), w)
+    w = torch.where((target_dBZ >= 10) & (target_dBZ < 30), torch.tensor(10.0, device=target.device), w)
+    w = torch.where((target_dBZ >= 30) & (target_dBZ < 45), torch.tensor(30.0, device=target.device), w)
+    w = torch.where(target_dBZ >= 45, torch.tensor(45.0, device=target.device), w)
+    return (w * (pred_dBZ - target_dBZ) ** 2).mean()
+
+
+def saved_tensor_bytes(loss_fn, pred, target):
+    """
+    Bytes of the tensors kept alive for backward by one forward call of `loss_fn`.
+
+    Parameters
+    ----------
+    loss_fn : callable
+        Loss function taking (pred, target).
+    pred : torch.Tensor
+        Predictions with requires_grad=True.
+    target : torch.Tensor
+        Targets.
+
+    Returns
+    -------
+    int
+        Total size of the distinct saved tensors in bytes.
+    """
+    seen = {}
+
+    def pack(t):
+        seen[(t.data_ptr(), t.numel(), t.dtype)] = t.numel() * t.element_size()
+        return t
+
+    with torch.autograd.graph.saved_tensors_hooks(pack, lambda t: t):
+        loss = loss_fn(pred, target)
+    del loss
+    return sum(seen.values())
+
+
+def time_forward_backward(loss_fn, pred, target, iters=20, warmup=3):
+    """
+    Mean wall time of a forward + backward call in milliseconds, and peak CUDA memory in MB.
+
+    Parameters
+    ----------
+    loss_fn : callable
+        Loss function taking (pred, target).
+    pred : torch.Tensor
+        Predictions with requires_grad=True.
+    target : torch.Tensor
+        Targets.
+    iters : int, optional
+        Number of timed iterations (default: 20).
+    warmup : int, optional
+        Number of untimed warmup iterations (default: 3).
+
+    Returns
+    -------
+    tuple
+        (milliseconds per iteration, peak CUDA memory in MB or None on CPU).
+    """
+    cuda = pred.device.type == "cuda"
+    for _ in range(warmup):
+        loss_fn(pred, target).backward()
+        pred.grad = None
+    if cuda:
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+        base = torch.cuda.memory_allocated()
+    start = time.perf_counter()
+    for _ in range(iters):
+        loss_fn(pred, target).backward()
+        pred.grad = None
+    if cuda:
+        torch.cuda.synchronize()
+    ms = (time.perf_counter() - start) / iters * 1e3
+    peak = (torch.cuda.max_memory_allocated() - base) / 2**20 if cuda else None
+    return ms, peak
+
+
+def run_benchmark(batch_size=4, channels=14, height=360, width=240, device="cpu", iters=20, compile=False):
+    """
+    Compare the reference, lookup-table and fused implementations of the weighted losses.
+
+    Parameters
+    ----------
+    batch_size : int, optional
+        Batch size (default: 4).
+    channels : int, optional
+        Number of channels (default: 14).
+    height : int, optional
+        Frame height (default: 360).
+    width : int, optional
+        Frame width (default: 240).
+    device : str, optional
+        Device to run on (default: 'cpu').
+    iters : int, optional
+        Number of timed iterations per variant (default: 20).
+    compile : bool, optional
+        Whether to also benchmark torch.compile of the lookup-table losses (default: False).
+
+    Returns
+    -------
+    dict
+        Per-variant time (ms), saved-for-backward memory (MB), peak CUDA memory (MB) and
+        maximum absolute difference to the reference loss value.
+    """
+    torch.manual_seed(0)
+    target = torch.rand(batch_size, channels, height, width, device=device) ** 3
+    pred = (target + 0.05 * torch.randn_like(target)).clamp(0, 1).requires_grad_(True)
+    variants = {
+        "b_mse/reference": reference_b_mse_loss,
+        "b_mse/lut": lambda p, t: lut_weighted_mse(p, t, B_MSE_EDGES, B_MSE_WEIGHTS, right=True, fused=False),
+        "b_mse/fused": lambda p, t: b_mse_loss(p, t, fused=True),
+        "weighted_mse/reference": reference_weighted_mse_loss,
+        "weighted_mse/lut": lambda p, t: lut_weighted_mse(p, t, (30.0,), (1.0, 10.0), right=False, fused=False),
+        "weighted_mse/fused": lambda p, t: weighted_mse_loss(p, t, fused=True),
+    }
+    if compile:
+        variants["b_mse/lut+compile"] = torch.compile(
+            lambda p, t: lut_weighted_mse(p, t, B_MSE_EDGES, B_MSE_WEIGHTS, right=True, fused=False))
+        variants["weighted_mse/lut+compile"] = torch.compile(
+            lambda p, t: lut_weighted_mse(p, t, (30.0,), (1.0, 10.0), right=False, fused=False))
+
+    results = {}
+    for name, loss_fn in variants.items():
+        reference = variants[name.split("/")[0] + "/reference"]
+        with torch.no_grad():
+            diff = abs(float(loss_fn(pred, target)) - float(reference(pred, target)))
+        saved = saved_tensor_bytes(loss_fn, pred, target) if "compile" not in name else None
+        ms, peak = time_forward_backward(loss_fn, pred, target, iters=iters)
+        results[name] = {
+            "ms_per_iter": ms,
+            "saved_for_backward_mb": saved / 2**20 if saved is not None else None,
+            "peak_cuda_mb": peak,
+            "abs_diff_to_reference": diff,
+        }
+        saved_str = f"{saved / 2**20:8.1f} MB saved" if saved is not None else " " * 17
+        peak_str = f" | peak {peak:8.1f} MB" if peak is not None else ""
+        print(f"{name:28s} {ms:8.2f} ms | {saved_str}{peak_str} | |Δloss| {diff:.2e}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the B-MSE and weighted MSE loss implementations.")
+    parser.add_argument("--batch_size", type=int, default=4, help="Batch size (default: 4)")
+    parser.add_argument("--channels", type=int, default=14, help="Number of channels (default: 14)")
+    parser.add_argument("--height", type=int, default=360, help="Frame height (default: 360)")
+    parser.add_argument("--width", type=int, default=240, help="Frame width (default: 240)")
+    parser.add_argument("--device", type=str, default="cpu", help="Device to run on (default: cpu)")
+    parser.add_argument("--iters", type=int, default=20, help="Timed iterations per variant (default: 20)")
+    parser.add_argument("--compile", type=str, default="False", help="Whether to also benchmark torch.compile of the lookup-table losses: True or False (default: False)")
+    parser.add_argument("--out", type=str, default=None, help="Optional JSON file to save the results")
+    args = parser.parse_args()
+
+    if isinstance(args.compile, str):
+        if args.compile.lower() in ["true", "1", "yes"]:
+            args.compile = True
+        elif args.compile.lower() in ["false", "0", "no"]:
+            args.compile = False
+        else:
+            raise ValueError("--compile must be True or False")
+
+    results = run_benchmark(
+        batch_size=args.batch_size,
+        channels=args.channels,
+        height=args.height,
+        width=args.width,
+        device=args.device,
+        iters=args.iters,
+        compile=args.compile,
+    )
+    if args.out is not None:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved benchmark results to {args.out}")
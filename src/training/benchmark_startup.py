@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import argparse
+import json
+import statistics
+import subprocess
+import time
+
+SCRIPTS = (
+    "train_3D_cnn.py",
+    "train_conv_lstm.py",
+    "train_trajGRU.py",
+    "train_trajGRU_enc_dec.py",
+    "train_unet_3D_cnn.py",
+    "train_unet_conv_lstm.py",
+    "train_unet_trajGRU.py",
+)
+
+
+def time_command(cmd, repeats=5):
+    """
+    Wall time of a command in milliseconds over several runs.
+
+    Parameters
+    ----------
+    cmd : list of str
+        Command to run.
+    repeats : int, optional
+        Number of timed runs (default: 5).
+
+    Returns
+    -------
+    dict
+        Median, min and max time in ms.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1e3)
+    return {"median_ms": statistics.median(times), "min_ms": min(times), "max_ms": max(times)}
+
+
+def run_benchmark(scripts=SCRIPTS, command="test", repeats=5):
+    """
+    Measure the startup latency of `python <script> <command> --help` of the training scripts.
+
+    The interpreter startup (`python -c pass`) is measured as a baseline.
+
+    Parameters
+    ----------
+    scripts : sequence of str, optional
+        Script file names in src/training (default: all train_*.py scripts).
+    command : str, optional
+        Subcommand whose help is printed: 'train' or 'test' (default: 'test').
+    repeats : int, optional
+        Number of timed runs per script (default: 5).
+
+    Returns
+    -------
+    dict
+        Per-script median, min and max time in ms.
+    """
+    here = Path(__file__).parent
+    results = {"python": time_command([sys.executable, "-c", "pass"], repeats)}
+    print(f"{'python -c pass':28s} {results['python']['median_ms']:8.1f} ms")
+    for script in scripts:
+        results[script] = time_command([sys.executable, str(here / script), command, "--help"], repeats)
+        print(f"{script:28s} {results[script]['median_ms']:8.1f} ms (min {results[script]['min_ms']:.1f}, max {results[script]['max_ms']:.1f})")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup latency of the training scripts (`<script> test --help`).")
+    parser.add_argument("--scripts", type=str, default=None, help="Comma-separated script names, e.g., train_trajGRU.py (default: all train_*.py scripts)")
+    parser.add_argument("--command", type=str, default="test", choices=["train", "test"], help="Subcommand whose help is timed (default: test)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per script (default: 5)")
+    parser.add_argument("--max_ms", type=float, default=None, help="Exit with an error if a script's median exceeds this many ms (default: None)")
+    parser.add_argument("--out", type=str, default=None, help="Optional JSON file to save the results")
+    args = parser.parse_args()
+
+    scripts = SCRIPTS if args.scripts is None else tuple(s.strip() for s in args.scripts.split(","))
+    results = run_benchmark(scripts=scripts, command=args.command, repeats=args.repeats)
+    if args.out is not None:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved benchmark results to {args.out}")
+    if args.max_ms is not None:
+        slow = [s for s in scripts if results[s]["median_ms"] > args.max_ms]
+        if slow:
+            sys.exit(f"Startup slower than {args.max_ms:.0f} ms: {', '.join(slow)}")
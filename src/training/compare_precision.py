@@ -0,0 +1,80 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import argparse
+import json
+
+
+def compare_precision(run_dir, baseline="fp32", candidate="bf16"):
+    """
+    Compare the test throughput and skill scores of two precisions evaluated on the same run.
+
+    Reads results/test_metrics.json (fp32) and results/test_metrics_{precision}.json written by
+    the test command of the training scripts with --precision.
+
+    Parameters
+    ----------
+    run_dir : str
+        Run directory containing the results/ folder.
+    baseline : str, optional
+        Reference precision (default: 'fp32').
+    candidate : str, optional
+        Precision compared against the baseline (default: 'bf16').
+
+    Returns
+    -------
+    dict
+        Throughput of both precisions, speedup, and candidate - baseline deltas of B-MSE, MSE,
+        CSI and HSS per threshold.
+    """
+    results_dir = Path(run_dir) / "results"
+    metrics = {}
+    for precision in (baseline, candidate):
+        suffix = "" if precision == "fp32" else f"_{precision}"
+        path = results_dir / f"test_metrics{suffix}.json"
+        if not path.exists():
+            raise FileNotFoundError(f"{path} not found; run the test command with --precision {precision} first")
+        with open(path) as f:
+            metrics[precision] = json.load(f)
+    base, cand = metrics[baseline], metrics[candidate]
+
+    report = {
+        "baseline": baseline,
+        "candidate": candidate,
+        "samples_per_sec": {baseline: base.get("samples_per_sec"), candidate: cand.get("samples_per_sec")},
+        "speedup": None,
+        "b_mse_delta": cand["b_mse"] - base["b_mse"],
+        "mse_delta": cand["mse"] - base["mse"],
+        "csi_delta_by_threshold": {k: cand["csi_by_threshold"][k] - v for k, v in base["csi_by_threshold"].items()},
+        "hss_delta_by_threshold": {k: cand["hss_by_threshold"][k] - v for k, v in base["hss_by_threshold"].items()},
+    }
+    if base.get("samples_per_sec") and cand.get("samples_per_sec"):
+        report["speedup"] = cand["samples_per_sec"] / base["samples_per_sec"]
+
+    print(f"Precision comparison for {run_dir} ({candidate} vs {baseline}):")
+    if report["speedup"] is not None:
+        print(f"  Throughput: {base['samples_per_sec']:.1f} → {cand['samples_per_sec']:.1f} samples/s "
+              f"(speedup {report['speedup']:.2f}x)")
+    print(f"  B-MSE: {base['b_mse']:.4f} → {cand['b_mse']:.4f} (Δ {report['b_mse_delta']:+.4f})")
+    print(f"  MSE: {base['mse']:.4f} → {cand['mse']:.4f} (Δ {report['mse_delta']:+.4f})")
+    for th, delta in report["csi_delta_by_threshold"].items():
+        print(f"  CSI {th}: {base['csi_by_threshold'][th]:.4f} → {cand['csi_by_threshold'][th]:.4f} (Δ {delta:+.4f})")
+    for th, delta in report["hss_delta_by_threshold"].items():
+        print(f"  HSS {th}: {base['hss_by_threshold'][th]:.4f} → {cand['hss_by_threshold'][th]:.4f} (Δ {delta:+.4f})")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare test throughput and CSI/HSS of two precisions on the same run.")
+    parser.add_argument("--run_dir", type=str, required=True, help="Run directory containing results/test_metrics*.json")
+    parser.add_argument("--baseline", type=str, default="fp32", choices=["fp32", "bf16"], help="Reference precision (default: fp32)")
+    parser.add_argument("--candidate", type=str, default="bf16", choices=["fp32", "bf16"], help="Compared precision (default: bf16)")
+    parser.add_argument("--out", type=str, default=None, help="JSON file to save the report (default: results/precision_comparison.json in the run directory)")
+    args = parser.parse_args()
+
+    report = compare_precision(args.run_dir, baseline=args.baseline, candidate=args.candidate)
+    out = args.out or str(Path(args.run_dir) / "results" / "precision_comparison.json")
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved precision comparison to {out}")
@@ -0,0 +1,1863 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+import multiprocessing
+import numpy as np
+
+# torch, the training utilities, the model modules and wandb are imported inside the functions
+# that use them, so that the command line (--help, argument errors) starts without loading them.
+
+
+class LayoutAdapter:
+    """
+    Converts batches between the dataset layout and the tensor layout of a model.
+
+    Datasets yield inputs of shape (B, T, C, H, W) and targets of shape (B, C, H, W).
+    Models take the inputs either as they are or time-second (B, C, T, H, W), and may
+    return their prediction with a singleton time dimension, which is squeezed.
+
+    Parameters
+    ----------
+    time_second_inputs : bool, optional
+        Whether the model takes inputs of shape (B, C, T, H, W) (default: False).
+    output_time_dim : int, optional
+        Time dimension of the model output, squeezed when it has size 1
+        (default: None, the model returns (B, C, H, W)).
+    """
+
+    def __init__(self, time_second_inputs=False, output_time_dim=None):
+        self.time_second_inputs = time_second_inputs
+        self.output_time_dim = output_time_dim
+
+    def inputs(self, xb):
+        """Model input from a dataset input batch."""
+        return xb.permute(0, 2, 1, 3, 4) if self.time_second_inputs else xb
+
+    def outputs(self, pred):
+        """Prediction in target layout from a model output."""
+        if self.output_time_dim is not None and pred.shape[self.output_time_dim] == 1:
+            pred = pred.squeeze(self.output_time_dim)
+        return pred
+
+    def targets(self, yb):
+        """Target batch matching outputs()."""
+        if self.output_time_dim is None:
+            return yb
+        if yb.ndim == 4:
+            yb = yb.unsqueeze(2)
+        if yb.shape[2] == 1:
+            yb = yb.squeeze(2)
+        return yb
+
+
+LAYOUTS = {
+    "btchw": LayoutAdapter(),
+    "bcthw": LayoutAdapter(time_second_inputs=True, output_time_dim=2),
+    "btchw->bcthw": LayoutAdapter(output_time_dim=2),
+    "bcthw->btchw": LayoutAdapter(time_second_inputs=True, output_time_dim=1),
+}
+
+
+class ModelSpec:
+    """
+    Registry entry describing how the engine builds, feeds and configures one model family.
+
+    Parameters
+    ----------
+    name : str
+        Registry key, e.g. 'cnn3d'.
+    title : str
+        Human-readable name used in messages and CLI descriptions, e.g. '3D CNN'.
+    build : callable
+        build(C, seq_len_in, seq_len_out, **model_kwargs) returning the torch.nn.Module.
+    layout : str
+        Key of LAYOUTS giving the input/output layout of the model.
+    add_arguments : callable
+        add_arguments(parser, command) adding the architecture options of the 'train' or 'test' subparser.
+    parse_arguments : callable
+        parse_arguments(args, command) returning the model_kwargs from the parsed CLI arguments.
+    cli_defaults : dict, optional
+        Overrides of shared CLI defaults per command, e.g. {'train': {'use_patches': 'True'}} (default: None).
+    description : str, optional
+        CLI description (default: 'Train or test a {title} radar forecasting model.').
+    """
+
+    def __init__(self, name, title, build, layout, add_arguments, parse_arguments, cli_defaults=None, description=None):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout: {layout}. Choose from {list(LAYOUTS)}")
+        self.name = name
+        self.title = title
+        self.build = build
+        self.layout = LAYOUTS[layout]
+        self.add_arguments = add_arguments
+        self.parse_arguments = parse_arguments
+        self.cli_defaults = cli_defaults or {}
+        self.description = description or f"Train or test a {title} radar forecasting model."
+
+
+MODEL_REGISTRY = {}
+
+
+def register_model(spec):
+    """
+    Add a model family to the registry.
+
+    Parameters
+    ----------
+    spec : ModelSpec
+        Model specification.
+
+    Returns
+    -------
+    ModelSpec
+        The registered specification.
+    """
+    if spec.name in MODEL_REGISTRY:
+        raise ValueError(f"Model already registered: {spec.name}")
+    MODEL_REGISTRY[spec.name] = spec
+    return spec
+
+
+def get_model_spec(name):
+    """
+    Look up a registered model family.
+
+    Parameters
+    ----------
+    name : str
+        Registry key.
+
+    Returns
+    -------
+    ModelSpec
+        The registered specification.
+    """
+    if name not in MODEL_REGISTRY:
+        raise ValueError(f"Unknown model: {name}. Available: {sorted(MODEL_REGISTRY)}")
+    return MODEL_REGISTRY[name]
+
+
+def _validation_metrics_json(ep, vl, vm):
+    """JSON-serializable validation metrics of epoch `ep` with loss `vl`, from run_epoch.validation_metrics."""
+    return {
+        "epoch": int(ep),
+        "val_loss": float(vl),
+        "b_mse": float(vm["b_mse"]),
+        "mse": float(vm["mse"]),
+        **{key: {k: float(v) for k, v in vm[key].items()}
+           for key in ("csi_by_threshold", "hss_by_threshold", "pod_by_threshold", "far_by_threshold", "bias_by_threshold")},
+        "confusion_by_threshold": {k: {kk: int(vv) for kk, vv in d.items()} for k, d in vm["confusion_by_threshold"].items()},
+        "mse_by_range": {k: (float(v) if not np.isnan(v) else None) for k, v in vm["mse_by_range"].items()},
+    }
+
+
+def train_radar_model(
+    model_name: str,
+    npy_path: str,
+    save_dir: str,
+    args,
+    *,
+    model_kwargs: dict = None,
+    seq_len_in: int = 10,
+    seq_len_out: int = 1,
+    train_val_test_split: tuple = (0.7, 0.15, 0.15),
+    batch_size: int = 4,
+    lr: float = 2e-4,
+    epochs: int = 15,
+    device: str = "cuda",
+    loss_name: str = "mse",
+    loss_weight_thresh: float = 30.0,
+    loss_weight_high: float = 10.0,
+    patch_size: int = 64,
+    patch_stride: int = 32,
+    patch_thresh: float = 35.0,
+    patch_frac: float = 0.01,
+    use_patches: bool = False,
+    wandb_project: str = "radar-forecasting",
+    early_stopping_patience: int = 10,
+    sampler: str = "sequential",
+    sampler_temperature: float = 1.0,
+    sampler_dry_keep: float = 1.0,
+    sampler_num_samples: int = None,
+    random_crop: bool = False,
+    crop_sizes: tuple = None,
+    wrap_azimuth: bool = False,
+    channels: tuple = None,
+    channel_reduce: str = None,
+    downsample: int = 1,
+    downsample_mode: str = "max",
+    pyramid_cache: bool = False,
+    fused_loss: bool = True,
+    precision: str = "fp32",
+    compile: bool = False,
+    compile_cache_dir: str = None,
+    distributed: bool = False,
+    accum_steps: int = 1,
+    activation_checkpoint: str = None,
+    async_checkpoint: bool = False,
+    keep_last_checkpoints: int = 0,
+    val_every: int = 1,
+    val_fraction: float = 1.0,
+    timing_log: bool = False,
+    profile_steps: tuple = None,
+    num_workers: int = 0,
+    num_threads: int = None,
+    interop_threads: int = None,
+    cache_dir: str = None,
+    checkpoint_every_steps: int = 0,
+    ema_decay: float = 0.0,
+):
+    """
+    Train a registered radar forecasting model.
+
+    Parameters
+    ----------
+    model_name : str
+        Registry key of the model family, e.g. 'cnn3d' (see MODEL_REGISTRY).
+    npy_path : str
+        Path to the input NumPy file containing radar reflectivity data with shape (T, C, H, W).
+    save_dir : str
+        Directory to save model checkpoints and statistics.
+    args : argparse.Namespace
+        Parsed CLI arguments; only `no_wandb` is read.
+    model_kwargs : dict, optional
+        Architecture arguments passed to the model builder (default: None, builder defaults).
+    seq_len_in : int, optional
+        Number of input time steps (default: 10).
+    seq_len_out : int, optional
+        Number of output time steps to predict (default: 1).
+    train_val_test_split : tuple, optional
+        Tuple/list of three floats (train, val, test) that sum to 1.0 (default: (0.7, 0.15, 0.15)).
+    batch_size : int, optional
+        Batch size for training (default: 4).
+    lr : float, optional
+        Learning rate for the optimizer (default: 2e-4).
+    epochs : int, optional
+        Number of training epochs (default: 15).
+    device : str, optional
+        Device to run training on ('cuda' or 'cpu'); defaults to 'cuda' if available.
+    loss_name : str, optional
+        Loss function to use; either 'mse', 'weighted_mse', or 'b_mse'.
+    loss_weight_thresh : float, optional
+        Reflectivity threshold in dBZ for weighted_mse loss (e.g., 30.0). Only used when loss_name='weighted_mse'.
+    loss_weight_high : float, optional
+        Weight multiplier for pixels above threshold in weighted_mse loss (e.g., 10.0). Only used when loss_name='weighted_mse'.
+    patch_size : int, optional
+        Size of spatial patches to extract (default: 64).
+    patch_stride : int, optional
+        Stride for patch extraction (default: 32).
+    patch_thresh : float, optional
+        Threshold for extracting patches (default: 35.0 dBZ).
+    patch_frac : float, optional
+        Minimum fraction of pixels in patch above threshold (default: 0.01).
+    use_patches : bool, optional
+        Whether to use patch-based training (default: False).
+    wandb_project : str, optional
+        wandb project name (default: "radar-forecasting").
+    early_stopping_patience : int, optional
+        Number of validations with no improvement before early stopping (default: 10). With
+        val_every > 1, epochs without validation are not counted, so training stops after about
+        patience * val_every epochs without improvement. Set to 0 or negative to disable early stopping.
+    sampler : str, optional
+        Training sampler: 'sequential' iterates all training windows in order, 'event' draws storm-heavy
+        windows more often based on the fraction of target pixels above 35/45 dBZ (default: 'sequential').
+    sampler_temperature : float, optional
+        Temperature of the event sampler; larger values flatten the sampling distribution (default: 1.0).
+    sampler_dry_keep : float, optional
+        Fraction of dry windows (no target pixel above 35 dBZ) eligible per epoch with the event sampler (default: 1.0).
+    sampler_num_samples : int, optional
+        Number of samples drawn per epoch with the event sampler (default: number of eligible windows).
+    random_crop : bool, optional
+        Whether patch-based training samples random crops inside qualifying regions instead of
+        fixed grid patches (default: False). Only used when use_patches=True.
+    crop_sizes : tuple, optional
+        Crop sizes for random-crop mode. With several sizes, training uses them in ascending order
+        over equal stages of the run (progressive resizing) (default: (patch_size,)).
+    wrap_azimuth : bool, optional
+        Whether training patches may cross the 0°/360° azimuth seam (default: False). Only used when use_patches=True.
+    channels : tuple, optional
+        Channel (elevation) indices to read from the cube, e.g. (0, 1, 2) for the lowest three
+        elevations (default: None, all channels). The model input/output size follows the selection.
+    channel_reduce : str, optional
+        Reduce the selected channels to one composite channel at load time: 'max' (column-max
+        composite) or 'mean' (default: None).
+    downsample : int, optional
+        Spatial pooling factor applied to the frames, e.g. 2 or 4 (default: 1, full resolution).
+    downsample_mode : str, optional
+        Pooling used for downsampling: 'max' or 'mean' (default: 'max').
+    pyramid_cache : bool, optional
+        Whether to cache the pooled cubes next to npy_path as a pyramid of 2x levels (default: False).
+    fused_loss : bool, optional
+        Whether weighted_mse/b_mse use the fused lookup-table loss, which keeps a single
+        full-size tensor for backward. If False, the original mask-based losses are used (default: True).
+    precision : str, optional
+        Forward-pass precision: 'fp32' or 'bf16' (torch.autocast on the training device);
+        losses and metrics are always computed in float32 (default: 'fp32').
+    compile : bool, optional
+        Whether to run the model forward through torch.compile; falls back to eager execution
+        if compilation fails (default: False).
+    compile_cache_dir : str, optional
+        Directory of the persistent torch.compile cache, reused between runs (default: None,
+        Inductor's default cache directory).
+    distributed : bool, optional
+        Whether to train data-parallel with DistributedDataParallel over the gloo process group
+        of a torchrun launch (default: False). batch_size is per process; rank 0 writes the
+        checkpoints, metrics and wandb logs, and validation metrics are summed over all processes.
+    accum_steps : int, optional
+        Number of micro-batches of batch_size whose gradients are accumulated before each
+        optimizer step; the effective batch size is batch_size * accum_steps (default: 1).
+    activation_checkpoint : str, optional
+        Activation checkpointing of the TrajGRU models: 'step' recomputes every TrajGRU time step
+        and 'stage' every recurrent stage in backward, trading compute for memory (default: None).
+    async_checkpoint : bool, optional
+        Whether checkpoints are copied to CPU and written by a background thread, so training
+        does not wait for the disk (default: False).
+    keep_last_checkpoints : int, optional
+        Number of per-epoch checkpoints epoch_XXX.pt to keep next to latest.pt; older ones are
+        deleted (default: 0, only latest.pt and best_val.pt).
+    val_every : int, optional
+        Validate at the epochs that are multiples of val_every, counted from epoch 1 also when
+        resuming, and at the last epoch (default: 1).
+    val_fraction : float, optional
+        Fraction of the validation windows, evenly spaced in time, used for intermediate
+        validations (loss only). The full validation with all metrics only runs when the subset
+        loss improves, and at the last epoch (default: 1.0, always full validation).
+    timing_log : bool, optional
+        Whether to record per-step data-wait, forward, backward, optimizer and metric times,
+        samples/s and peak RSS to timing.jsonl in save_dir (timing_rank{r}.jsonl per process
+        when distributed) and epoch means to wandb (default: False).
+    profile_steps : tuple, optional
+        Range (start, stop) of training steps (micro-batches, counted from 0 over all epochs)
+        recorded with torch.profiler; the Chrome trace and operator tables are saved to
+        save_dir/profile (default: None, no profiling).
+    num_workers : int, optional
+        DataLoader worker processes of the training and validation loaders (default: 0, load
+        in the main process).
+    num_threads : int, optional
+        torch intra-op threads (default: None, torch default; CPU count / processes when distributed).
+    interop_threads : int, optional
+        torch inter-op threads (default: None, torch default).
+    cache_dir : str, optional
+        Directory of the patch index and frame score caches, shared between runs such as the
+        runs of a sweep; the cache names then include every option they depend on. These
+        options are also saved next to each cache and a cache computed with others is rebuilt
+        (default: None, save_dir).
+    checkpoint_every_steps : int, optional
+        Save a mid-epoch checkpoint latest_step.pt every N optimizer steps, with the position in
+        the epoch, the generator states and the running training loss, so that a restart
+        continues from the exact step (default: 0, only the end-of-epoch checkpoints).
+    ema_decay : float, optional
+        Decay per optimizer step of an exponential moving average of the weights, e.g. 0.999.
+        Validation then runs the averaged weights, best_val.pt holds them and latest.pt stores
+        them next to the trained weights (default: 0.0, no moving average).
+    """
+    import torch
+    from torch.nn.parallel import DistributedDataParallel
+    from torch.utils.data import DataLoader, Subset
+    from tqdm import tqdm
+    from src.training.utils import ResumableSampler, atomic_save, get_rng_state, set_rng_state
+    from src.training.utils import set_seed, configure_threads, AsyncCheckpointWriter, ModelEMA, mse_loss, weighted_mse_loss, b_mse_loss
+    from src.training.utils import RadarWindowDataset, PatchRadarWindowDataset, build_train_sampler, selected_channel_count
+    from src.training.utils import load_pooled_cube, autocast_context, CompiledForward
+    from src.training.utils import init_distributed, cleanup_distributed, barrier, all_reduce_sum, StepTimer, StepProfiler
+    from src.training.utils.training_utils import ForecastingMetricsAccumulator
+
+    set_seed(123)
+    spec = get_model_spec(model_name)
+    layout = spec.layout
+    model_kwargs = model_kwargs or {}
+    if not (isinstance(train_val_test_split, (tuple, list)) and len(train_val_test_split) == 3):
+        raise ValueError("train_val_test_split must be a tuple/list of three floats (train, val, test)")
+    if not abs(sum(train_val_test_split) - 1.0) < 1e-6:
+        raise ValueError(f"train_val_test_split must sum to 1.0, got {train_val_test_split} (sum={sum(train_val_test_split)})")
+    train_frac, val_frac, _ = train_val_test_split
+    if accum_steps < 1:
+        raise ValueError(f"accum_steps must be >= 1, got {accum_steps}")
+    if val_every < 1:
+        raise ValueError(f"val_every must be >= 1, got {val_every}")
+    if checkpoint_every_steps < 0:
+        raise ValueError(f"checkpoint_every_steps must be >= 0, got {checkpoint_every_steps}")
+    if not 0.0 <= ema_decay < 1.0:
+        raise ValueError(f"ema_decay must be in [0, 1), got {ema_decay}")
+    if not 0.0 < val_fraction <= 1.0:
+        raise ValueError(f"val_fraction must be in (0, 1], got {val_fraction}")
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    if distributed:
+        rank, world_size, device = init_distributed(device, num_threads=num_threads)
+    else:
+        rank, world_size = 0, 1
+    configure_threads(num_threads, interop_threads)
+    is_main = rank == 0
+    use_wandb = not args.no_wandb and is_main
+    save_dir = Path(save_dir)
+    save_dir.mkdir(parents=True, exist_ok=True)
+
+    # rank 0 builds the cached pooled cubes, patch index and frame scores first, the other ranks then load them
+    if not is_main:
+        barrier()
+
+    # memmory mapped loading
+    cube = np.load(npy_path, mmap_mode='r')
+    if downsample > 1:
+        cube = load_pooled_cube(npy_path, cube, downsample, downsample_mode, cache=pyramid_cache)
+        print(f"Downsampled {downsample}x with {downsample_mode} pooling → {cube.shape}")
+    T,C,H,W = cube.shape
+    C = selected_channel_count(C, channels, channel_reduce)
+    print(f"Loaded {npy_path} → {cube.shape}")
+
+    # chronological split & min-max
+    n_total = T - seq_len_in - seq_len_out + 1
+    n_train = int(n_total * train_frac)
+    n_val = int(n_total * val_frac)
+    val_indices = list(range(n_train, n_train + n_val))
+    val_sub_indices = subsample_evenly(val_indices, val_fraction)
+    maxv = 85.0
+    print(f"Normalization maxv (fixed): {maxv}")
+    np.savez(save_dir/"minmax_stats.npz", maxv=maxv)
+    eps = 1e-6
+
+    # DataLoaders
+    # Cache names in a shared cache_dir carry every option the cached arrays depend on, so runs
+    # with other options never overwrite them; the options are also checked when a cache is loaded
+    cache_path = save_dir if cache_dir is None else Path(cache_dir)
+    cache_path.mkdir(parents=True, exist_ok=True)
+    channel_tag = (("" if channels is None else "_ch" + "-".join(str(c) for c in channels))
+                   + ("" if channel_reduce is None else f"_{channel_reduce}"))
+    pool_tag = f"_pool{downsample}_{downsample_mode}" if downsample > 1 else ""
+    score_thresholds = (35.0, 45.0)
+    score_name = "frame_scores"
+    if cache_dir is not None:
+        score_name += "_th" + "-".join(f"{th:g}" for th in score_thresholds) + channel_tag + pool_tag
+    score_path = cache_path / f"{score_name}.npy"
+    loader_kwargs = dict(num_workers=num_workers, persistent_workers=num_workers > 0)
+    if use_patches:
+        patch_index_name = ("patch_regions" if random_crop else "patch_indices") + ("_wrap" if wrap_azimuth else "")
+        patch_index_name += channel_tag + pool_tag
+        if cache_dir is not None:
+            patch_index_name += f"_in{seq_len_in}_out{seq_len_out}_p{patch_size}_s{patch_stride}_t{patch_thresh:g}_f{patch_frac:g}"
+            if random_crop:
+                # The regions are max(crop_sizes) + patch_stride wide
+                patch_index_name += "_c" + "-".join(str(c) for c in sorted(crop_sizes or (patch_size,)))
+        patch_index_path = str(cache_path / f"{patch_index_name}.npy")
+        patch_ds = PatchRadarWindowDataset(cube, seq_len_in, seq_len_out, patch_size, patch_stride, patch_thresh, patch_frac, patch_index_path=patch_index_path, maxv=maxv,
+                                           random_crop=random_crop, crop_sizes=crop_sizes, wrap_azimuth=wrap_azimuth,
+                                           channels=channels, channel_reduce=channel_reduce)
+        train_idx = [i for i, (t, y, x) in enumerate(patch_ds.patches) if t < n_train]
+        train_ds = Subset(patch_ds, train_idx)
+        train_sampler = build_train_sampler(
+            sampler, cube, seq_len_in, seq_len_out, [patch_ds.patches[i][0] for i in train_idx],
+            temperature=sampler_temperature, dry_keep=sampler_dry_keep, num_samples=sampler_num_samples,
+            thresholds=score_thresholds, score_path=str(score_path), num_replicas=world_size, rank=rank,
+            channels=channels, channel_reduce=channel_reduce,
+        )
+        train_loader_sampler = ResumableSampler(train_sampler if train_sampler is not None else range(len(train_ds)))
+        # Random crops need workers started every epoch, with the crop size and first batch of the epoch
+        train_loader_kwargs = {**loader_kwargs, "persistent_workers": False} if random_crop else loader_kwargs
+        train_dl = DataLoader(train_ds, batch_size, shuffle=False, sampler=train_loader_sampler, **train_loader_kwargs)
+
+        # Validation always use full frames
+        full_ds = RadarWindowDataset(cube, seq_len_in, seq_len_out, maxv=maxv, channels=channels, channel_reduce=channel_reduce)
+        val_ds = Subset(full_ds, val_indices[rank::world_size])
+        val_dl = DataLoader(val_ds, batch_size, shuffle=False, **loader_kwargs)
+        print(f"Patch-based training: train_patches={len(train_ds)}, val_fullframes={len(val_ds)}")
+    else:
+        full_ds  = RadarWindowDataset(cube, seq_len_in, seq_len_out, maxv=maxv, channels=channels, channel_reduce=channel_reduce)
+        train_ds = Subset(full_ds, list(range(0, n_train)))
+        val_ds   = Subset(full_ds, val_indices[rank::world_size])
+        train_sampler = build_train_sampler(
+            sampler, cube, seq_len_in, seq_len_out, train_ds.indices,
+            temperature=sampler_temperature, dry_keep=sampler_dry_keep, num_samples=sampler_num_samples,
+            thresholds=score_thresholds, score_path=str(score_path), num_replicas=world_size, rank=rank,
+            channels=channels, channel_reduce=channel_reduce,
+        )
+        train_loader_sampler = ResumableSampler(train_sampler if train_sampler is not None else range(len(train_ds)))
+        train_dl = DataLoader(train_ds, batch_size, shuffle=False, sampler=train_loader_sampler, **loader_kwargs)
+        val_dl   = DataLoader(val_ds, batch_size, shuffle=False, **loader_kwargs)
+        print(f"Full-frame training: train={len(train_ds)}, val={len(val_ds)}")
+    val_sub_dl = None
+    if val_fraction < 1.0:
+        val_sub_dl = DataLoader(Subset(full_ds, val_sub_indices[rank::world_size]), batch_size, shuffle=False, **loader_kwargs)
+        print(f"Intermediate validation on {len(val_sub_indices)}/{len(val_indices)} windows")
+    if is_main:
+        barrier()
+    if is_main and (accum_steps > 1 or world_size > 1):
+        print(f"Effective batch size: {batch_size * accum_steps * world_size} "
+              f"(batch_size={batch_size} x accum_steps={accum_steps} x processes={world_size})")
+
+    # model, optimizer, loss
+    if C <= 0:
+        raise ValueError(f"Invalid number of channels: {C}")
+    model     = spec.build(C, seq_len_in, seq_len_out, **model_kwargs).to(device)
+    if activation_checkpoint is not None:
+        if not hasattr(model, "set_checkpointing"):
+            raise ValueError(f"Activation checkpointing is not supported by the {spec.title} model")
+        model.set_checkpointing(activation_checkpoint)
+        print(f"Activation checkpointing: {activation_checkpoint}")
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    if loss_name == "mse":
+        criterion = lambda pred, tgt: mse_loss(pred, tgt, maxv=maxv, eps=eps)
+    elif loss_name == "weighted_mse":
+        criterion = lambda pred, tgt: weighted_mse_loss(
+            pred, tgt,
+            threshold=loss_weight_thresh,  # dBZ
+            weight_high=loss_weight_high,
+            maxv=maxv,
+            eps=eps,
+            fused=fused_loss
+        )
+    elif loss_name == "b_mse":
+        criterion = lambda pred, tgt: b_mse_loss(pred, tgt, maxv=maxv, eps=eps, fused=fused_loss)
+    else:
+        raise ValueError(f"Unknown loss function: {loss_name}")
+
+    # checkpoints
+    ckpt_latest = save_dir/"latest.pt"
+    ckpt_best   = save_dir/"best_val.pt"
+    best_val    = float('inf')
+    best_val_sub = float('inf')
+    start_ep = 1
+    validations_since_improvement = 0
+    ema_state = None
+    if ckpt_latest.exists():
+        st = torch.load(ckpt_latest, map_location=device)
+        model.load_state_dict(st['model'])
+        optimizer.load_state_dict(st['optim'])
+        best_val = st['best_val']
+        best_val_sub = st.get('best_val_sub', float('inf'))
+        ema_state = st.get('ema')
+        start_ep = st['epoch'] + 1
+        print(f"✔ Resumed epoch {st['epoch']} (best_val={best_val:.4f})")
+
+    # Mid-epoch checkpoint of the epoch after the last finished one. Every process keeps its
+    # own generator states and running loss; rank 0 also the model and optimizer.
+    ckpt_step = save_dir/"latest_step.pt"
+    ckpt_step_rank = ckpt_step if is_main else save_dir/f"latest_step_rank{rank}.pt"
+    resume_state = None
+    if checkpoint_every_steps > 0 and ckpt_step.exists():
+        st = torch.load(ckpt_step, map_location="cpu", weights_only=False)
+        rank_st = st if is_main else (torch.load(ckpt_step_rank, weights_only=False) if ckpt_step_rank.exists() else None)
+        usable = (st['epoch'] == start_ep and rank_st is not None
+                  and (rank_st['epoch'], rank_st['step']) == (st['epoch'], st['step']))
+        # All processes resume mid-epoch, or none of them
+        if all_reduce_sum(int(usable)) == world_size:
+            model.load_state_dict(st['model'])
+            optimizer.load_state_dict(st['optim'])
+            best_val = st['best_val']
+            best_val_sub = st['best_val_sub']
+            validations_since_improvement = st['validations_since_improvement']
+            ema_state = st.get('ema')
+            resume_state = rank_st['rank_state']
+            print(f"✔ Resumed epoch {st['epoch']} at batch {st['step']}")
+
+    # Moving average of the weights, updated after every optimizer step and used for validation;
+    # a checkpoint without one starts the average from the resumed weights
+    ema = None
+    if ema_decay > 0:
+        ema = ModelEMA(model, decay=ema_decay)
+        if ema_state is not None:
+            ema.load_state_dict(ema_state)
+
+    end_epoch = start_ep + epochs - 1
+    ckpt_writer = AsyncCheckpointWriter(enabled=async_checkpoint, keep_last=keep_last_checkpoints) if is_main else None
+
+    # wandb
+    if use_wandb:
+        import wandb
+        # Resuming the same save_dir continues its wandb run. The id hashes the full path, as sweeps
+        # name their runs run_000, run_001, ... in every sweep directory.
+        run_path = save_dir.resolve()
+        run_id = f"{run_path.name}-{hashlib.sha1(str(run_path).encode()).hexdigest()[:12]}"
+        wandb.init(
+            project=wandb_project,
+            name=f"{run_path.parent.name}/{run_path.name}",
+            id=run_id,
+            resume="allow",
+            dir="experiments",
+            config={
+                'model': model_name,
+                'seq_len_in': seq_len_in,
+                'seq_len_out': seq_len_out,
+                'train_val_test_split': train_val_test_split,
+                'batch_size': batch_size,
+                'lr': lr,
+                **model_kwargs,
+                'epochs': epochs,
+                'device': device,
+                'loss_name': loss_name,
+                'loss_weight_thresh': loss_weight_thresh,
+                'loss_weight_high': loss_weight_high,
+                'patch_size': patch_size,
+                'patch_stride': patch_stride,
+                'patch_thresh': patch_thresh,
+                'patch_frac': patch_frac,
+                'use_patches': use_patches,
+                'wandb_project': wandb_project,
+                'early_stopping_patience': early_stopping_patience,
+                'sampler': sampler,
+                'sampler_temperature': sampler_temperature,
+                'sampler_dry_keep': sampler_dry_keep,
+                'sampler_num_samples': sampler_num_samples,
+                'random_crop': random_crop,
+                'crop_sizes': crop_sizes,
+                'wrap_azimuth': wrap_azimuth,
+                'channels': channels,
+                'channel_reduce': channel_reduce,
+                'downsample': downsample,
+                'downsample_mode': downsample_mode,
+                'fused_loss': fused_loss,
+                'precision': precision,
+                'compile': compile,
+                'distributed': distributed,
+                'world_size': world_size,
+                'accum_steps': accum_steps,
+                'activation_checkpoint': activation_checkpoint,
+                'async_checkpoint': async_checkpoint,
+                'keep_last_checkpoints': keep_last_checkpoints,
+                'val_every': val_every,
+                'val_fraction': val_fraction,
+                'timing_log': timing_log,
+                'profile_steps': profile_steps,
+                'num_workers': num_workers,
+                'num_threads': num_threads,
+                'interop_threads': interop_threads,
+                'cache_dir': cache_dir,
+                'checkpoint_every_steps': checkpoint_every_steps,
+                'ema_decay': ema_decay
+            }
+        )
+        wandb.watch(model)
+
+    # Validation runs the unwrapped model: the ranks may hold different numbers of validation batches
+    net = DistributedDataParallel(model) if distributed else model
+    model_fwd = CompiledForward(net, enabled=compile, cache_dir=compile_cache_dir)
+    if ema is not None:
+        val_fwd = CompiledForward(ema.module, enabled=compile, cache_dir=compile_cache_dir)
+    else:
+        val_fwd = CompiledForward(model, enabled=compile, cache_dir=compile_cache_dir) if distributed else model_fwd
+
+    step_timer = StepTimer(save_dir / ("timing.jsonl" if world_size == 1 else f"timing_rank{rank}.jsonl"),
+                           enabled=timing_log, device=device)
+    profiler = StepProfiler(save_dir / "profile", profile_steps, device=device,
+                            suffix="" if world_size == 1 else f"_rank{rank}")
+
+    # training loop
+    def run_epoch(dl, train=True, metrics=True, resume=None):
+        net.train() if train else net.eval()
+        compute_metrics = not train and metrics
+        start_batch = 0
+        if resume is not None:
+            # Same generator states as at the start of the interrupted epoch, so the sampler
+            # draws the same order; the batches already done are skipped without loading them
+            set_rng_state(resume['epoch_rng'])
+            start_batch = resume['step']
+            dl.sampler.resume(start_batch * batch_size, resume['rng'])
+        epoch_rng = get_rng_state() if train and checkpoint_every_steps > 0 else None
+        step_timer.begin("train" if train else ("val" if metrics else "val_subset"))
+        fwd = model_fwd if train else val_fwd
+        tot = 0.0 if resume is None else resume['tot']
+        n = 0 if resume is None else resume['n']
+
+        if compute_metrics:
+            metrics_accumulator = ForecastingMetricsAccumulator(maxv=maxv, eps=eps)
+
+        n_batches = len(dl)
+        if train:
+            optimizer.zero_grad()
+        with torch.set_grad_enabled(train):
+            for i, batch in enumerate(tqdm(dl, desc=("Train" if train else "Val"), leave=False, disable=not is_main,
+                                           initial=start_batch), start=start_batch):
+                # Patch datasets also return the patch position (t, y, x)
+                xb, yb = batch[0], batch[1]
+                xb, yb = xb.to(device), yb.to(device)
+                step_timer.lap("data")
+                # Gradients are accumulated over groups of accum_steps micro-batches; the last group may be shorter
+                step_now = (i + 1) % accum_steps == 0 or i + 1 == n_batches
+                group_size = min(accum_steps, n_batches - (i // accum_steps) * accum_steps)
+                # DDP all-reduces gradients only on the micro-batch that ends a group
+                with (net.no_sync() if distributed and train and not step_now else nullcontext()):
+                    with autocast_context(device, precision):
+                        pred  = fwd(layout.inputs(xb))
+                    pred  = layout.outputs(pred.float())
+                    yb    = layout.targets(yb)
+                    loss  = criterion(pred, yb)
+                    step_timer.lap("forward")
+                    if train:
+                        (loss / group_size).backward()
+                        step_timer.lap("backward")
+                if train and step_now:
+                    optimizer.step(); optimizer.zero_grad()
+                    if ema is not None:
+                        ema.update(model)
+                    step_timer.lap("optimizer")
+                tot += loss.item()*xb.size(0)
+                n += xb.size(0)
+
+                if compute_metrics:
+                    metrics_accumulator.update(pred.detach(), yb.detach())
+                    step_timer.lap("metrics")
+                step_timer.end_step(xb.size(0))
+                if train:
+                    profiler.step()
+                if (train and step_now and checkpoint_every_steps > 0 and i + 1 < n_batches
+                        and ((i + 1) // accum_steps) % checkpoint_every_steps == 0):
+                    rank_state = {'tot': tot, 'n': n, 'step': i + 1, 'epoch_rng': epoch_rng, 'rng': get_rng_state()}
+                    if is_main:
+                        ckpt_writer.save({'epoch': ep, 'step': i + 1, 'model': model.state_dict(), 'optim': optimizer.state_dict(),
+                                          'best_val': best_val, 'best_val_sub': best_val_sub,
+                                          'validations_since_improvement': validations_since_improvement,
+                                          **({} if ema is None else {'ema': ema.state_dict()}),
+                                          'rank_state': rank_state}, ckpt_step)
+                    else:
+                        atomic_save({'epoch': ep, 'step': i + 1, 'rank_state': rank_state}, ckpt_step_rank)
+
+        if compute_metrics:
+            compute_start = time.perf_counter()
+            metrics_accumulator.all_reduce(device)
+            final_storm_metrics = metrics_accumulator.compute()
+            final_mse_by_range = final_storm_metrics['mse_by_range']
+            step_timer.record("metrics_compute", time.perf_counter() - compute_start)
+
+            if is_main:
+                print("Validation metrics:")
+                print(f"  B-MSE: {final_storm_metrics['b_mse']:.4f}")
+                for th, csi in final_storm_metrics['csi_by_threshold'].items():
+                    print(f"  CSI {th}: {csi:.4f}")
+                for th, hss in final_storm_metrics['hss_by_threshold'].items():
+                    print(f"  HSS {th}: {hss:.4f}")
+                print(f"  MSE: {final_storm_metrics['mse']:.4f}")
+                for range_name, mse_val in final_mse_by_range.items():
+                    print(f"  {range_name}: {mse_val:.4f}")
+
+            if use_wandb:
+                wandb.log({**{f"val_{k}": v for k, v in final_storm_metrics['csi_by_threshold'].items()},
+                           **{f"val_{k}": v for k, v in final_storm_metrics['hss_by_threshold'].items()},
+                           "val_b_mse": final_storm_metrics['b_mse'],
+                           "val_mse": final_storm_metrics['mse'],
+                           **{f"val_{k}": v for k, v in final_mse_by_range.items()}})
+
+            run_epoch.validation_metrics = {
+                "b_mse": final_storm_metrics['b_mse'],
+                "mse": final_storm_metrics['mse'],
+                "csi_by_threshold": final_storm_metrics['csi_by_threshold'],
+                "hss_by_threshold": final_storm_metrics['hss_by_threshold'],
+                "pod_by_threshold": final_storm_metrics['pod_by_threshold'],
+                "far_by_threshold": final_storm_metrics['far_by_threshold'],
+                "bias_by_threshold": final_storm_metrics['bias_by_threshold'],
+                "confusion_by_threshold": final_storm_metrics['confusion_by_threshold'],
+                "mse_by_range": final_mse_by_range
+            }
+
+        # Mean loss over all processes
+        return all_reduce_sum(tot) / all_reduce_sum(n)
+
+    for ep in range(start_ep, end_epoch+1):
+        if use_patches and random_crop:
+            patch_ds.set_epoch(ep, end_epoch)
+            patch_ds.first_batch = 0 if resume_state is None else resume_state['step']
+            if is_main:
+                print(f"Random crop size: {patch_ds.crop_size}")
+        if hasattr(train_sampler, "set_epoch"):
+            train_sampler.set_epoch(ep)
+        step_timer.epoch = ep
+        epoch_start = time.perf_counter()
+        tr = run_epoch(train_dl, True, resume=resume_state)
+        skipped_batches = 0 if resume_state is None else resume_state['step']
+        resume_state = None
+        compile_time = model_fwd.pop_compile_time()
+        train_time = time.perf_counter() - epoch_start - compile_time
+        train_samples_per_sec = (len(train_dl.sampler) - skipped_batches * batch_size) * world_size / train_time
+        # Full validation every val_every epochs and at the end; with val_fraction < 1, a loss-only
+        # pass on the subset decides whether the epoch is an improvement candidate. The schedule
+        # counts from epoch 1, so resuming (e.g. on every sweep rung) validates the same epochs.
+        vl = vl_sub = None
+        if ep % val_every == 0 or ep == end_epoch:
+            if val_sub_dl is not None and ep != end_epoch:
+                vl_sub = run_epoch(val_sub_dl, False, metrics=False)
+                if vl_sub < best_val_sub:
+                    best_val_sub = vl_sub
+                    vl = run_epoch(val_dl, False)
+            else:
+                vl = run_epoch(val_dl, False)
+        compile_time += val_fwd.pop_compile_time()
+        if is_main:
+            val_msg = ("" if vl_sub is None else f"val subset {vl_sub:.4f} | ") + ("" if vl is None else f"val {vl:.4f} | ")
+            print(f"[{ep:02d}/{end_epoch}] train {tr:.4f} | {val_msg}{train_samples_per_sec:.1f} samples/s ({precision})")
+            if compile_time > 0:
+                print(f"  compile time {compile_time:.1f}s (excluded from samples/s)")
+        timing = step_timer.epoch_summary()
+        if is_main:
+            for phase, t in timing.items():
+                print(f"  timing {phase}: " + " | ".join(f"{k[:-3]} {v:.1f} ms" for k, v in t.items() if k.endswith("_ms"))
+                      + (f" | peak RSS {t['peak_rss_mb']:.0f} MB" if t['peak_rss_mb'] is not None else ""))
+        if use_wandb:
+            wandb.log({'epoch':ep,'train_loss':tr,'train_samples_per_sec':train_samples_per_sec,
+                       'train_step_ms':train_time / (len(train_dl) - skipped_batches) * 1e3,'compile_time_sec':compile_time,
+                       **({} if vl is None else {'val_loss':vl}),
+                       **({} if vl_sub is None else {'val_loss_subset':vl_sub}),
+                       **{f"timing/{phase}_{k}": v for phase, t in timing.items() for k, v in t.items()}})
+        if is_main:
+            ckpt_writer.save({'epoch':ep,'model':model.state_dict(),
+                              'optim':optimizer.state_dict(),'best_val':best_val,'best_val_sub':best_val_sub,
+                              **({} if ema is None else {'ema': ema.state_dict()})},
+                             ckpt_latest, history_path=save_dir/f"epoch_{ep:03d}.pt")
+            # Last finished epoch and its validation metrics, read by the sweep scheduler to resume
+            # and rank runs at the same epoch budget
+            progress = {"epoch": ep, "val_loss": vl}
+            if vl is not None and hasattr(run_epoch, 'validation_metrics'):
+                progress["validation_metrics"] = _validation_metrics_json(ep, vl, run_epoch.validation_metrics)
+            with open(save_dir / "progress.json", "w") as f:
+                json.dump(progress, f)
+        # vl is the same on every rank, so all ranks agree on best_val and early stopping
+        if vl is not None and vl < best_val:
+            best_val = vl
+            validations_since_improvement = 0
+            if is_main:
+                # best_val is the loss of the averaged weights when they are validated
+                ckpt_writer.save((model if ema is None else ema.module).state_dict(), ckpt_best)
+                print("New best saved")
+            if use_wandb:
+                wandb.log({'best_val_loss':best_val})
+
+            if is_main and hasattr(run_epoch, 'validation_metrics'):
+                results_dir = save_dir / "results"
+                results_dir.mkdir(exist_ok=True)
+                metrics_to_save = _validation_metrics_json(ep, vl, run_epoch.validation_metrics)
+                with open(results_dir / "best_validation_metrics.json", "w") as f:
+                    json.dump(metrics_to_save, f, indent=2)
+                print(f"Validation metrics saved to {results_dir}/best_validation_metrics.json")
+        elif vl is not None or vl_sub is not None:
+            # Patience counts validations; epochs without validation are not counted
+            validations_since_improvement += 1
+        if early_stopping_patience > 0 and validations_since_improvement >= early_stopping_patience:
+            if is_main:
+                print(f"Early stopping: validation loss did not improve for {validations_since_improvement} validations.")
+                # Tells the sweep scheduler not to train the run further
+                with open(save_dir / "progress.json", "w") as f:
+                    json.dump({**progress, "early_stopped": True}, f)
+            break
+
+    step_timer.close()
+    profiler.close()
+    if is_main:
+        # Wait for the pending checkpoint writes, also after early stopping
+        ckpt_writer.close()
+        print("Done. Checkpoints in", save_dir.resolve())
+    if use_wandb:
+        wandb.finish()
+    if distributed:
+        cleanup_distributed()
+
+
+def predict_test_set(
+    model_name: str,
+    npy_path: str,
+    run_dir:  str,
+    *,
+    model_kwargs: dict = None,
+    seq_len_in: int = 10,
+    seq_len_out: int = 1,
+    train_val_test_split: tuple = (0.7, 0.15, 0.15),
+    batch_size: int = 4,
+    which: str = "best",
+    device: str = None,
+    save_arrays: bool = True,
+    predictions_dir: str = None,
+    channels: tuple = None,
+    channel_reduce: str = None,
+    downsample: int = 1,
+    downsample_mode: str = "max",
+    pyramid_cache: bool = False,
+    upsample_predictions: bool = True,
+    precision: str = "fp32",
+    compile: bool = False,
+    compile_cache_dir: str = None,
+    profile_steps: tuple = None,
+):
+    """
+    Run testing on a trained registered model: generate predictions, save arrays, and compute metrics.
+
+    Parameters
+    ----------
+    model_name : str
+        Registry key of the model family, e.g. 'cnn3d' (see MODEL_REGISTRY).
+    npy_path : str
+        Path to the input NumPy file containing radar reflectivity data with shape (T, C, H, W).
+    run_dir : str
+        Directory containing model checkpoints and statistics from training.
+    model_kwargs : dict, optional
+        Architecture arguments passed to the model builder; must match training (default: None).
+    seq_len_in : int, optional
+        Number of input radar frames to use for prediction (default: 10).
+    seq_len_out : int, optional
+        Number of future radar frames to predict (default: 1).
+    train_val_test_split : tuple, optional
+        Tuple/list of three floats (train, val, test) that sum to 1.0 (default: (0.7, 0.15, 0.15)).
+    batch_size : int, optional
+        Batch size for inference (default: 4).
+    which : str, optional
+        Which checkpoint to load - 'best' for best validation checkpoint or 'latest' (default: 'best').
+        If the run kept a moving average of the weights (ema_decay), the averaged weights are used.
+    device : str, optional
+        Device to run inference on (default: 'cpu').
+    save_arrays : bool, optional
+        Whether to save predictions and targets as memory-mapped .npy files (default: True).
+        Files will be named 'test_preds_dBZ.npy' and 'test_targets_dBZ.npy'.
+    predictions_dir : str, optional
+        Directory to save large prediction/target files (default: same as run_dir).
+        If None, files are saved in run_dir. If specified, creates the directory if it doesn't exist.
+    channels : tuple, optional
+        Channel (elevation) indices to read from the cube, e.g. (0, 1, 2) for the lowest three
+        elevations (default: None, all channels). The model input/output size follows the selection.
+    channel_reduce : str, optional
+        Reduce the selected channels to one composite channel at load time: 'max' (column-max
+        composite) or 'mean' (default: None).
+    downsample : int, optional
+        Spatial pooling factor applied to the frames, e.g. 2 or 4 (default: 1, full resolution).
+    downsample_mode : str, optional
+        Pooling used for downsampling: 'max' or 'mean' (default: 'max').
+    pyramid_cache : bool, optional
+        Whether to cache the pooled cubes next to npy_path as a pyramid of 2x levels (default: False).
+    upsample_predictions : bool, optional
+        With downsample > 1, whether predictions are upsampled to full resolution and compared
+        against full-resolution targets (default: True). Otherwise metrics use pooled targets.
+    precision : str, optional
+        Forward-pass precision: 'fp32' or 'bf16' (torch.autocast on the device); metrics are
+        computed in float32. Non-fp32 results are saved with a '_{precision}' suffix (default: 'fp32').
+    compile : bool, optional
+        Whether to run the model forward through torch.compile; falls back to eager execution
+        if compilation fails (default: False).
+    compile_cache_dir : str, optional
+        Directory of the persistent torch.compile cache, reused between runs (default: None,
+        Inductor's default cache directory).
+    profile_steps : tuple, optional
+        Range (start, stop) of test batches, counted from 0, recorded with torch.profiler; the
+        Chrome trace and operator tables are saved to run_dir/profile (default: None, no profiling).
+    """
+    import torch
+    from torch.utils.data import DataLoader, Subset
+    from tqdm import tqdm
+    from src.training.utils import set_seed, RadarWindowDataset, selected_channel_count, load_pooled_cube
+    from src.training.utils import upsample_frames, autocast_context, CompiledForward, StepProfiler
+    from src.training.utils.training_utils import ForecastingMetricsAccumulator
+
+    set_seed(123)
+    spec = get_model_spec(model_name)
+    layout = spec.layout
+    model_kwargs = model_kwargs or {}
+    device = device or "cpu"
+    run_dir = Path(run_dir)
+    ckpt    = run_dir / ("best_val.pt" if which=="best" else "latest.pt")
+    stats   = np.load(run_dir/"minmax_stats.npz")
+    maxv    = float(stats['maxv']); eps=1e-6
+
+    if predictions_dir is None:
+        predictions_dir = run_dir
+    else:
+        predictions_dir = Path(predictions_dir)
+        predictions_dir.mkdir(parents=True, exist_ok=True)
+
+    cube = np.load(npy_path, mmap_mode='r')
+    T, C, H, W = cube.shape
+    C = selected_channel_count(C, channels, channel_reduce)
+    input_cube, target_cube = cube, None
+    if downsample > 1:
+        input_cube = load_pooled_cube(npy_path, cube, downsample, downsample_mode, cache=pyramid_cache)
+        if upsample_predictions:
+            target_cube = cube
+        else:
+            H, W = input_cube.shape[2:]
+    if not (isinstance(train_val_test_split, (tuple, list)) and len(train_val_test_split) == 3):
+        raise ValueError("train_val_test_split must be a tuple/list of three floats (train, val, test)")
+    if not abs(sum(train_val_test_split) - 1.0) < 1e-6:
+        raise ValueError(f"train_val_test_split must sum to 1.0, got {train_val_test_split} (sum={sum(train_val_test_split)})")
+    train_frac, val_frac, test_frac = train_val_test_split
+    n_total = T - seq_len_in - seq_len_out + 1
+    n_train = int(n_total * train_frac)
+    n_val = int(n_total * val_frac)
+    idx_test = list(range(n_train + n_val, n_total))
+    ds      = RadarWindowDataset(input_cube, seq_len_in, seq_len_out, maxv=maxv, channels=channels, channel_reduce=channel_reduce,
+                              target_cube=target_cube)
+    test_ds  = Subset(ds, idx_test)
+    dl      = DataLoader(test_ds, batch_size, shuffle=False)
+
+    model = spec.build(C, seq_len_in, seq_len_out, **model_kwargs)
+    st = torch.load(ckpt, map_location=device)
+    if isinstance(st, dict) and 'ema' in st:
+        st=st['ema']['model']
+        print("Using the moving average of the weights")
+    if isinstance(st, dict) and 'model' in st:
+        st=st['model']
+    model.load_state_dict(st)
+    model.to(device).eval()
+    model_fwd = CompiledForward(model, enabled=compile, cache_dir=compile_cache_dir)
+
+    N = len(test_ds)
+    if save_arrays:
+        preds_memmap = np.memmap(predictions_dir/"test_preds_dBZ.npy", dtype='float32', mode='w+', shape=(N, C, H, W))
+        gts_memmap   = np.memmap(predictions_dir/"test_targets_dBZ.npy", dtype='float32', mode='w+', shape=(N, C, H, W))
+    else:
+        preds_memmap = None
+        gts_memmap = None
+
+    metrics_accumulator = ForecastingMetricsAccumulator(maxv=maxv, eps=eps)
+
+    idx = 0
+    profiler = StepProfiler(run_dir / "profile", profile_steps, device=device)
+    test_start = time.perf_counter()
+    with torch.no_grad():
+        for xb, yb in tqdm(dl, desc='Testing', total=len(dl)):
+            xb, yb = xb.to(device), yb.to(device)
+            with autocast_context(device, precision):
+                out_n = model_fwd(layout.inputs(xb))
+            out_n = layout.outputs(out_n.float())
+            yb = layout.targets(yb)
+            if out_n.ndim != 4:
+                raise ValueError(f"Expected seq_len_out=1 predictions of shape (B, C, H, W), got {tuple(out_n.shape)}")
+
+            if target_cube is not None:
+                out_n = upsample_frames(out_n, (H, W))
+
+            metrics_accumulator.update(out_n, yb)
+
+            batch_size = out_n.shape[0]
+            if save_arrays:
+                preds_memmap[idx:idx+batch_size] = out_n.cpu().numpy() * (maxv+eps)
+                gts_memmap[idx:idx+batch_size] = yb.cpu().numpy() * (maxv+eps)
+            idx += batch_size
+            profiler.step()
+    profiler.close()
+
+    if save_arrays:
+        preds_memmap.flush()
+        gts_memmap.flush()
+        meta = {
+            'shape': (N, C, H, W),
+            'dtype': 'float32'
+        }
+        np.savez(predictions_dir/"test_preds_dBZ_meta.npz", **meta)
+        np.savez(predictions_dir/"test_targets_dBZ_meta.npz", **meta)
+
+    samples_per_sec = N / (time.perf_counter() - test_start - model_fwd.compile_time)
+    print(f"Test throughput: {samples_per_sec:.1f} samples/s ({precision})")
+    if model_fwd.compile_time > 0:
+        print(f"  compile time {model_fwd.compile_time:.1f}s (excluded from samples/s)")
+
+    final_metrics = metrics_accumulator.compute()
+    mse_by_range = final_metrics['mse_by_range']
+
+    results_dir = run_dir / "results"
+    results_dir.mkdir(exist_ok=True)
+    suffix = "" if precision == "fp32" else f"_{precision}"
+    from src.utils.storm_utils import save_histogram
+    save_histogram(metrics_accumulator.to_histogram(), results_dir / f"test_joint_histogram{suffix}.npz")
+
+    test_metrics = {
+        "b_mse": float(final_metrics['b_mse']),
+        "mse": float(final_metrics['mse']),
+        "csi_by_threshold": {k: float(v) for k, v in final_metrics['csi_by_threshold'].items()},
+        "hss_by_threshold": {k: float(v) for k, v in final_metrics['hss_by_threshold'].items()},
+        "pod_by_threshold": {k: float(v) for k, v in final_metrics['pod_by_threshold'].items()},
+        "far_by_threshold": {k: float(v) for k, v in final_metrics['far_by_threshold'].items()},
+        "bias_by_threshold": {k: float(v) for k, v in final_metrics['bias_by_threshold'].items()},
+        "confusion_by_threshold": {k: {kk: int(vv) for kk, vv in v.items()} for k, v in final_metrics['confusion_by_threshold'].items()},
+        "mse_by_range": {k: float(v) if not np.isnan(v) else None for k, v in mse_by_range.items()},
+        "precision": precision,
+        "samples_per_sec": float(samples_per_sec),
+        "compile_time_sec": float(model_fwd.compile_time),
+    }
+    with open(results_dir / f"test_metrics{suffix}.json", "w") as f:
+        json.dump(test_metrics, f, indent=2)
+
+    with open(results_dir / f"test_mse_by_ranges{suffix}.json", "w") as f:
+        json.dump(test_metrics["mse_by_range"], f, indent=2)
+
+    print("MSE by reflectivity range:")
+    for range_name, mse in mse_by_range.items():
+        print(f"  {range_name}: {mse:.4f}")
+
+    print("\nTest metrics:")
+    print(f"  B-MSE: {final_metrics['b_mse']:.4f}")
+    print(f"  MSE: {final_metrics['mse']:.4f}")
+    for th, csi in final_metrics['csi_by_threshold'].items():
+        print(f"  CSI {th}: {csi:.4f}")
+    for th, hss in final_metrics['hss_by_threshold'].items():
+        print(f"  HSS {th}: {hss:.4f}")
+
+    if save_arrays:
+        print(f"\nSaved test_preds_dBZ.npy + test_targets_dBZ.npy → {predictions_dir}")
+    print(f"Saved test_metrics{suffix}.json and test_mse_by_ranges{suffix}.json → {results_dir}")
+    return None
+
+
+def _autotune_trial(model_name, model_kwargs, input_shape, seq_len_in, seq_len_out, batch_size,
+                    num_threads, interop_threads, num_workers, device, precision, steps, warmup):
+    # Runs in a fresh process: the inter-op thread count can only be set once per process,
+    # and the peak RSS is then that of this configuration alone.
+    import torch
+    from torch.utils.data import DataLoader
+    from src.training.utils import SyntheticWindowDataset, configure_threads, autocast_context, mse_loss, peak_rss_mb
+
+    configure_threads(num_threads, interop_threads)
+    spec = get_model_spec(model_name)
+    layout = spec.layout
+    C, H, W = input_shape
+    model = spec.build(C, seq_len_in, seq_len_out, **model_kwargs).to(device).train()
+    optimizer = torch.optim.Adam(model.parameters(), lr=2e-4)
+    ds = SyntheticWindowDataset((warmup + steps) * batch_size, seq_len_in, seq_len_out, C, H, W)
+    dl = DataLoader(ds, batch_size, shuffle=False, num_workers=num_workers)
+    cuda = torch.device(device).type == "cuda"
+    if cuda:
+        torch.cuda.reset_peak_memory_stats(device)
+    # The first `warmup` steps (allocator, worker start-up) are not timed
+    for i, (xb, yb) in enumerate(dl):
+        if i == warmup:
+            if cuda:
+                torch.cuda.synchronize(device)
+            start = time.perf_counter()
+        xb, yb = xb.to(device), yb.to(device)
+        with autocast_context(device, precision):
+            pred = model(layout.inputs(xb))
+        loss = mse_loss(layout.outputs(pred.float()), layout.targets(yb))
+        loss.backward()
+        optimizer.step(); optimizer.zero_grad()
+    if cuda:
+        torch.cuda.synchronize(device)
+    elapsed = time.perf_counter() - start
+    return {
+        "samples_per_sec": steps * batch_size / elapsed,
+        "peak_memory_mb": torch.cuda.max_memory_allocated(device) / 2**20 if cuda else peak_rss_mb(),
+        "num_threads": torch.get_num_threads(),
+        "interop_threads": torch.get_num_interop_threads(),
+    }
+
+
+def autotune_radar_model(
+    model_name: str,
+    save_dir: str,
+    *,
+    model_kwargs: dict = None,
+    input_shape: tuple = (14, 360, 240),
+    seq_len_in: int = 10,
+    seq_len_out: int = 1,
+    device: str = "cpu",
+    precision: str = "fp32",
+    batch_sizes: tuple = (1, 2, 4, 8, 16),
+    num_threads: tuple = None,
+    interop_threads: tuple = (1, 2),
+    num_workers: tuple = (0, 2, 4, 8),
+    steps: int = 10,
+    warmup: int = 3,
+    max_memory_mb: float = None,
+):
+    """
+    Find the batch size and thread counts with the highest training throughput of a registered model.
+
+    Each configuration trains on synthetic full-frame windows for `warmup` + `steps` steps
+    (Adam, MSE loss) in a fresh process and records the steady-state samples/s and the peak
+    memory (RSS on CPU, allocated CUDA memory on GPU). First every combination of batch size,
+    intra-op and inter-op threads is run with the data loaded in the main process; a batch size
+    that fails or exceeds max_memory_mb ends the sweep over larger batch sizes for those threads.
+    Then the DataLoader worker counts are tried with the fastest combination. All results and
+    the recommended configuration are saved to save_dir/autotune.json.
+
+    Parameters
+    ----------
+    model_name : str
+        Registry key of the model family, e.g. 'cnn3d' (see MODEL_REGISTRY).
+    save_dir : str
+        Directory the results are saved to.
+    model_kwargs : dict, optional
+        Architecture arguments passed to the model builder (default: None).
+    input_shape : tuple, optional
+        Frame shape (C, H, W) of the synthetic windows (default: (14, 360, 240)).
+    seq_len_in : int, optional
+        Number of input frames (default: 10).
+    seq_len_out : int, optional
+        Number of predicted frames (default: 1).
+    device : str, optional
+        Device to train on (default: 'cpu').
+    precision : str, optional
+        Forward-pass precision: 'fp32' or 'bf16' (default: 'fp32').
+    batch_sizes : tuple, optional
+        Batch sizes to try, in ascending order (default: (1, 2, 4, 8, 16)).
+    num_threads : tuple, optional
+        Intra-op thread counts to try (default: None, CPU count / 8, / 4, / 2 and / 1).
+    interop_threads : tuple, optional
+        Inter-op thread counts to try (default: (1, 2)).
+    num_workers : tuple, optional
+        DataLoader worker counts to try (default: (0, 2, 4, 8)).
+    steps : int, optional
+        Timed training steps per configuration (default: 10).
+    warmup : int, optional
+        Untimed steps before the timed ones (default: 3).
+    max_memory_mb : float, optional
+        Configurations with a higher peak memory are not recommended (default: None, no limit).
+
+    Returns
+    -------
+    dict
+        Recommended configuration: batch_size, num_threads, interop_threads, num_workers,
+        samples_per_sec and peak_memory_mb.
+    """
+    spec = get_model_spec(model_name)
+    model_kwargs = model_kwargs or {}
+    save_dir = Path(save_dir)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    if num_threads is None:
+        n_cpu = os.cpu_count() or 1
+        num_threads = tuple(sorted({max(1, n_cpu // d) for d in (8, 4, 2, 1)}))
+    if steps < 1 or warmup < 1:
+        raise ValueError(f"steps and warmup must be >= 1, got steps={steps}, warmup={warmup}")
+    batch_sizes = sorted(batch_sizes)
+    ctx = multiprocessing.get_context("spawn")
+    trials = []
+
+    def run_trial(batch_size, threads, interop, workers):
+        config = {"batch_size": batch_size, "num_threads": threads, "interop_threads": interop, "num_workers": workers}
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                result = pool.submit(_autotune_trial, model_name, model_kwargs, tuple(input_shape), seq_len_in, seq_len_out,
+                                     batch_size, threads, interop, workers, device, precision, steps, warmup).result()
+        except Exception as e:  # e.g. out of memory, also when the process is killed
+            result = {"error": f"{type(e).__name__}: {e}"}
+        trial = {**config, **result}
+        trials.append(trial)
+        if "error" in trial:
+            print(f"  batch {batch_size:3d} | threads {threads:3d} | interop {interop:2d} | workers {workers:2d} | failed: {trial['error']}")
+        else:
+            memory = f"{trial['peak_memory_mb']:.0f} MB" if trial['peak_memory_mb'] is not None else "n/a"
+            print(f"  batch {batch_size:3d} | threads {threads:3d} | interop {interop:2d} | workers {workers:2d} | "
+                  f"{trial['samples_per_sec']:8.2f} samples/s | peak {memory}")
+        return trial
+
+    def fits(trial):
+        return "error" not in trial and (max_memory_mb is None or trial["peak_memory_mb"] is None
+                                         or trial["peak_memory_mb"] <= max_memory_mb)
+
+    print(f"Autotuning {spec.title} on {device}: input {tuple(input_shape)}, {seq_len_in} -> {seq_len_out} frames")
+    for threads in num_threads:
+        for interop in interop_threads:
+            for batch_size in batch_sizes:
+                if not fits(run_trial(batch_size, threads, interop, 0)):
+                    break
+    candidates = [t for t in trials if fits(t)]
+    if not candidates:
+        raise RuntimeError("No configuration ran within the memory limit; try smaller batch sizes")
+    best = max(candidates, key=lambda t: t["samples_per_sec"])
+    for workers in num_workers:
+        if workers > 0:
+            run_trial(best["batch_size"], best["num_threads"], best["interop_threads"], workers)
+    best = max((t for t in trials if fits(t)), key=lambda t: t["samples_per_sec"])
+    recommended = {k: best[k] for k in ("batch_size", "num_threads", "interop_threads", "num_workers", "samples_per_sec", "peak_memory_mb")}
+
+    with open(save_dir / "autotune.json", "w") as f:
+        json.dump({
+            "model_name": model_name,
+            "model_kwargs": model_kwargs,
+            "input_shape": list(input_shape),
+            "seq_len_in": seq_len_in,
+            "seq_len_out": seq_len_out,
+            "device": device,
+            "precision": precision,
+            "steps": steps,
+            "warmup": warmup,
+            "max_memory_mb": max_memory_mb,
+            "recommended": recommended,
+            "trials": trials,
+        }, f, indent=2)
+    print(f"Recommended: {recommended['samples_per_sec']:.2f} samples/s with "
+          f"--batch_size {recommended['batch_size']} --num_threads {recommended['num_threads']} "
+          f"--interop_threads {recommended['interop_threads']} --num_workers {recommended['num_workers']}")
+    print(f"Saved autotune results to {save_dir / 'autotune.json'}")
+    return recommended
+
+
+def subsample_evenly(indices, fraction):
+    """
+    Deterministic subset of indices, evenly spaced over the list.
+
+    Parameters
+    ----------
+    indices : list of int
+        Indices to subsample, e.g. time-ordered validation windows.
+    fraction : float
+        Fraction to keep, in (0, 1].
+
+    Returns
+    -------
+    list of int
+        round(len(indices) * fraction) indices (at least one), in the original order.
+    """
+    if fraction >= 1.0 or len(indices) == 0:
+        return list(indices)
+    n = max(1, int(round(len(indices) * fraction)))
+    positions = np.unique(np.linspace(0, len(indices) - 1, n).round().astype(int))
+    return [indices[i] for i in positions]
+
+
+# Model families
+
+def parse_int_list(val):
+    """Parse a comma-separated list of integers, e.g. '64,128' → [64, 128]."""
+    return [int(x) for x in str(val).split(",")]
+
+
+def expand_to_length(lst, n, name):
+    """Repeat a single value n times, or check that a list already has n values."""
+    if len(lst) == 1:
+        return lst * n
+    if len(lst) != n:
+        raise ValueError(f"{name} must have 1 or {n} values, got {len(lst)}")
+    return lst
+
+
+def _literal_sequence(value, message, allow_int=False):
+    """Parse a Python tuple/list literal from the command line."""
+    try:
+        parsed = ast.literal_eval(value) if isinstance(value, str) else value
+        if allow_int and isinstance(parsed, int):
+            return parsed
+        if not isinstance(parsed, (tuple, list)) or len(parsed) < 1:
+            raise ValueError
+    except Exception:
+        raise ValueError(message)
+    return parsed
+
+
+def _parse_int_tuple(value, name):
+    """Parse an int or a tuple/list of ints from the command line into a tuple."""
+    parsed = _literal_sequence(value, f"{name} must be an int or a tuple of ints, like (1,2,4)", allow_int=True)
+    parsed = (parsed,) if isinstance(parsed, int) else tuple(parsed)
+    if not all(isinstance(v, int) for v in parsed):
+        raise ValueError(f"{name} must be an int or a tuple of ints, like (1,2,4)")
+    return parsed
+
+
+def _add_cnn_arguments(parser, command):
+    if command == "train":
+        parser.add_argument("--hidden_dims", type=str, required=True, help="Hidden dimensions as tuple, e.g., (64, 64)")
+        parser.add_argument("--kernel_size", type=int, required=True, help="Kernel size (must be odd number)")
+    else:
+        parser.add_argument("--hidden_dims", type=str, default="(64,64)", help="Hidden dimensions as tuple, e.g., (64, 64)")
+        parser.add_argument("--kernel_size", type=int, default=3, help="Kernel size (default: 3)")
+
+
+def _parse_cnn_arguments(args, command):
+    hidden_dims = _literal_sequence(args.hidden_dims, "hidden_dims must be a tuple or list, like (64,64) or [64,64]")
+    if command == "train" and args.kernel_size % 2 == 0:
+        raise ValueError("kernel_size must be an odd integer.")
+    return {"hidden_dims": hidden_dims, "kernel_size": args.kernel_size}
+
+
+def _build_cnn3d(C, seq_len_in, seq_len_out, hidden_dims=(64, 64), kernel_size=3):
+    from src.models.cnn_3d import CNN3D
+    return CNN3D(in_ch=C, hidden_dims=hidden_dims, kernel=kernel_size)
+
+
+def _build_conv_lstm(C, seq_len_in, seq_len_out, hidden_dims=(64, 64), kernel_size=3):
+    from src.models.conv_lstm import ConvLSTM
+    return ConvLSTM(in_ch=C, hidden_dims=hidden_dims, kernel=kernel_size)
+
+
+def _add_traj_gru_arguments(parser, command):
+    parser.add_argument("--hidden_channels", type=str, default="64", help="Comma-separated list of hidden channels for TrajGRU layers. Length determines number of layers. Examples: '64' (1 layer), '64,128' (2 layers), '64,128,128' (3 layers)")
+    parser.add_argument("--kernel_size", type=str, default="3", help="Comma-separated list of kernel sizes for each layer. Must have same length as hidden_channels. Examples: '3' (same for all), '5,3' (different per layer)")
+    parser.add_argument("--L", type=str, default="5", help="Comma-separated list of L values (flow fields) for each layer. Must have same length as hidden_channels. Examples: '5' (same for all), '13,9' (different per layer)")
+
+
+def _parse_traj_gru_arguments(args, command):
+    hidden_channels = parse_int_list(args.hidden_channels)
+    n_layers = len(hidden_channels)
+    return {
+        "hidden_channels": hidden_channels,
+        "kernel_size": expand_to_length(parse_int_list(args.kernel_size), n_layers, "kernel_size"),
+        "L": expand_to_length(parse_int_list(args.L), n_layers, "L"),
+    }
+
+
+def _build_traj_gru(C, seq_len_in, seq_len_out, hidden_channels=None, kernel_size=None, L=None):
+    from src.models.traj_gru import TrajGRU
+    if hidden_channels is None:
+        hidden_channels = [64]
+    if kernel_size is None:
+        kernel_size = [3] * len(hidden_channels)
+    if L is None:
+        L = [5] * len(hidden_channels)
+    n_layers = len(hidden_channels)
+    if len(kernel_size) != n_layers:
+        raise ValueError(f"kernel_size must have {n_layers} elements, got {len(kernel_size)}")
+    if len(L) != n_layers:
+        raise ValueError(f"L must have {n_layers} elements, got {len(L)}")
+    return TrajGRU(input_channels=C, hidden_channels=hidden_channels, kernel_size=kernel_size, L=L, seq_len_in=seq_len_in, seq_len_out=seq_len_out)
+
+
+def _add_traj_gru_enc_dec_arguments(parser, command):
+    parser.add_argument("--hidden_channels", type=str, required=True, help="Comma-separated list of hidden channels for each layer (encoder+decoder, symmetric)")
+    parser.add_argument("--kernel_size", type=str, required=True, help="Comma-separated list of kernel sizes for each layer (encoder+decoder, symmetric)")
+    parser.add_argument("--L", type=str, required=True, help="Comma-separated list of L values for each layer (encoder+decoder, symmetric)")
+    parser.add_argument("--conv_kernels", type=str, required=True, help="Comma-separated list of kernel sizes for encoder Conv2d/decoder ConvTranspose2d (symmetric)")
+    parser.add_argument("--conv_strides", type=str, required=True, help="Comma-separated list of strides for encoder Conv2d/decoder ConvTranspose2d (symmetric). WARNING: Be careful, large strides can cause blank predictions")
+
+
+def _parse_traj_gru_enc_dec_arguments(args, command):
+    hidden_channels = parse_int_list(args.hidden_channels)
+    n_layers = len(hidden_channels)
+    return {
+        "hidden_channels": hidden_channels,
+        **{name: expand_to_length(parse_int_list(getattr(args, name)), n_layers, name)
+           for name in ("kernel_size", "L", "conv_kernels", "conv_strides")},
+    }
+
+
+def _build_traj_gru_enc_dec(C, seq_len_in, seq_len_out, hidden_channels=None, kernel_size=None, L=None, conv_kernels=None, conv_strides=None):
+    from src.models.traj_gru_enc_dec import TrajGRUEncoderDecoder
+    if hidden_channels is None:
+        hidden_channels = [64]
+    if kernel_size is None:
+        kernel_size = [3] * len(hidden_channels)
+    if L is None:
+        L = [5] * len(hidden_channels)
+    if conv_kernels is None:
+        conv_kernels = [3] * len(hidden_channels)
+    if conv_strides is None:
+        conv_strides = [2] * len(hidden_channels)
+    n_layers = len(hidden_channels)
+    if not (len(kernel_size) == n_layers and len(L) == n_layers and len(conv_kernels) == n_layers and len(conv_strides) == n_layers):
+        raise ValueError("All architecture lists (hidden_channels, kernel_size, L, conv_kernels, conv_strides) must have the same length.")
+    return TrajGRUEncoderDecoder(
+        input_channels=C,
+        hidden_channels=hidden_channels,
+        kernel_size=kernel_size,
+        L=L,
+        conv_kernels=conv_kernels,
+        conv_strides=conv_strides,
+        seq_len_in=seq_len_in,
+        seq_len_out=seq_len_out
+    )
+
+
+def _add_unet_3d_cnn_arguments(parser, command):
+    if command == "train":
+        parser.add_argument("--base_ch", type=int, required=True, help="Base number of channels for U-Net encoder/decoder")
+        parser.add_argument("--bottleneck_dims", type=str, required=True, help="Tuple/list of widths for 3D CNN bottleneck, e.g., (32, 64, 32)")
+        parser.add_argument("--kernel_size", type=int, required=True, help="Kernel size (must be odd number)")
+    else:
+        parser.add_argument("--base_ch", type=int, default=32, help="Base number of channels for U-Net encoder/decoder (default: 32)")
+        parser.add_argument("--bottleneck_dims", type=str, default="(64,)", help="Bottleneck dims as tuple, e.g., (64,)")
+        parser.add_argument("--kernel_size", type=int, default=3, help="Kernel size (default: 3)")
+
+
+def _parse_unet_3d_cnn_arguments(args, command):
+    bottleneck_dims = _literal_sequence(args.bottleneck_dims, "bottleneck_dims must be a tuple/list of widths, like (32,64,32)")
+    if command == "train" and args.kernel_size % 2 == 0:
+        raise ValueError("kernel_size must be an odd integer.")
+    return {"base_ch": args.base_ch, "bottleneck_dims": bottleneck_dims, "kernel_size": args.kernel_size}
+
+
+def _build_unet_3d_cnn(C, seq_len_in, seq_len_out, base_ch=32, bottleneck_dims=(64,), kernel_size=3):
+    from src.models.unet_3d_cnn import UNet3DCNN
+    return UNet3DCNN(in_ch=C, out_ch=C, base_ch=base_ch, bottleneck_dims=bottleneck_dims, kernel=kernel_size, seq_len_out=seq_len_out)
+
+
+def _add_unet_conv_lstm_arguments(parser, command):
+    if command == "train":
+        parser.add_argument("--kernel", type=int, default=3, help="Kernel size for all convolutions (default: 3, must be odd)")
+        parser.add_argument("--base_ch", type=int, default=32, help="Base number of channels for U-Net (default: 32)")
+        parser.add_argument("--hidden_dims", type=str, default="64", help="Number of hidden channels in the ConvLSTM bottleneck (int or tuple/list, e.g., 64 or (64,128))")
+    else:
+        parser.add_argument("--kernel", type=int, default=3, help="Kernel size for all convolutions (default: 3)")
+        parser.add_argument("--base_ch", type=int, default=32, help="Base number of channels for U-Net encoder/decoder (default: 32)")
+        parser.add_argument("--hidden_dims", type=str, default="64", help="ConvLSTM hidden dims as int or tuple, e.g., 64 or (64,128)")
+
+
+def _parse_unet_conv_lstm_arguments(args, command):
+    hidden_dims = _literal_sequence(args.hidden_dims, "hidden_dims must be an int or tuple/list, like 64 or (64,128)", allow_int=True)
+    if command == "train" and args.kernel % 2 == 0:
+        raise ValueError("kernel must be an odd integer.")
+    return {"kernel": args.kernel, "base_ch": args.base_ch, "hidden_dims": hidden_dims}
+
+
+def _build_unet_conv_lstm(C, seq_len_in, seq_len_out, kernel=3, base_ch=32, hidden_dims=64):
+    from src.models.unet_conv_lstm import UNetConvLSTM
+    return UNetConvLSTM(in_ch=C, out_ch=C, base_ch=base_ch, hidden_dims=hidden_dims, seq_len=seq_len_in, kernel=kernel)
+
+
+def _add_unet_traj_gru_arguments(parser, command):
+    parser.add_argument("--base_ch", type=int, default=32, help="Base number of channels for U-Net encoder/decoder (default: 32)")
+    parser.add_argument("--bottleneck_dims", type=str, default="128", help="Comma-separated list of bottleneck channel dimensions. Examples: '128' (1 stage), '64,32' (2 stages), '128,64,32' (3 stages)")
+    parser.add_argument("--kernel", type=int, default=3, help="Kernel size for all convolutions (default: 3)")
+    parser.add_argument("--L", type=int, default=5, help="Number of flow fields for all TrajGRU layers (default: 5)")
+
+
+def _parse_unet_traj_gru_arguments(args, command):
+    return {"base_ch": args.base_ch, "bottleneck_dims": parse_int_list(args.bottleneck_dims), "kernel": args.kernel, "L": args.L}
+
+
+def _build_unet_traj_gru(C, seq_len_in, seq_len_out, base_ch=32, bottleneck_dims=None, kernel=3, L=5):
+    from src.models.unet_traj_gru import UNetTrajGRU
+    if bottleneck_dims is None:
+        bottleneck_dims = [base_ch*4]
+    return UNetTrajGRU(in_ch=C, out_ch=C, base_ch=base_ch, bottleneck_dims=bottleneck_dims, seq_len=seq_len_in, kernel=kernel, L=L)
+
+
+register_model(ModelSpec("cnn3d", "3D CNN", _build_cnn3d, "btchw", _add_cnn_arguments, _parse_cnn_arguments))
+register_model(ModelSpec("conv_lstm", "ConvLSTM", _build_conv_lstm, "btchw", _add_cnn_arguments, _parse_cnn_arguments))
+register_model(ModelSpec("traj_gru", "TrajGRU", _build_traj_gru, "bcthw", _add_traj_gru_arguments, _parse_traj_gru_arguments,
+                         cli_defaults={"train": {"use_patches": "True"}}))
+register_model(ModelSpec(
+    "traj_gru_enc_dec", "symmetric TrajGRU encoder-decoder", _build_traj_gru_enc_dec, "bcthw->btchw",
+    _add_traj_gru_enc_dec_arguments, _parse_traj_gru_enc_dec_arguments,
+    cli_defaults={"train": {"use_patches": "True"},
+                  "test": {"npy_path": "data/processed/ZH_radar_dataset.npy", "batch_size": 1, "device": "cpu"}},
+    description="Train or test a symmetric TrajGRU encoder-decoder model (no U-Net, no skip connections).\n\nSpecify architecture using comma-separated lists for each argument. Example:\n\n--hidden_channels 64,192,192 --kernel_size 3,3,3 --L 13,13,9 --conv_kernels 5,5,3 --conv_strides 3,2,1\n\nThis will create a 3-layer encoder and 3-layer decoder, with decoder using reversed parameters.\n\n  IMPORTANT: Large strides (>3) can cause blank predictions due to excessive information loss. Use smaller strides for better results.",
+))
+register_model(ModelSpec("unet_3d_cnn", "U-Net 3D CNN", _build_unet_3d_cnn, "bcthw", _add_unet_3d_cnn_arguments, _parse_unet_3d_cnn_arguments))
+register_model(ModelSpec("unet_conv_lstm", "U-Net+ConvLSTM", _build_unet_conv_lstm, "btchw", _add_unet_conv_lstm_arguments, _parse_unet_conv_lstm_arguments))
+register_model(ModelSpec("unet_traj_gru", "UNet TrajGRU", _build_unet_traj_gru, "btchw->bcthw", _add_unet_traj_gru_arguments, _parse_unet_traj_gru_arguments))
+
+
+# Command line
+
+def str2bool(value, name):
+    """Convert a 'True'/'False' command line string to bool."""
+    if isinstance(value, bool):
+        return value
+    if value.lower() in ["true", "1", "yes"]:
+        return True
+    if value.lower() in ["false", "0", "no"]:
+        return False
+    raise ValueError(f"--{name} must be True or False")
+
+
+def _parse_channels(value):
+    if value is None:
+        return None
+    try:
+        channels = ast.literal_eval(value)
+        if isinstance(channels, int):
+            channels = (channels,)
+        if not isinstance(channels, (tuple, list)) or len(channels) < 1:
+            raise ValueError
+    except Exception:
+        raise ValueError("channels must be a tuple/list of channel indices, like (0,1,2)")
+    return channels
+
+
+def _parse_crop_sizes(value):
+    if value is None:
+        return None
+    try:
+        crop_sizes = ast.literal_eval(value)
+        if isinstance(crop_sizes, int):
+            crop_sizes = (crop_sizes,)
+        if not isinstance(crop_sizes, (tuple, list)) or len(crop_sizes) < 1:
+            raise ValueError
+    except Exception:
+        raise ValueError("crop_sizes must be a tuple/list of crop sizes, like (32,48,64)")
+    return crop_sizes
+
+
+def _parse_step_range(value):
+    if value is None:
+        return None
+    try:
+        start, stop = (int(v) for v in value.split(":"))
+        if start < 0 or stop <= start:
+            raise ValueError
+    except Exception:
+        raise ValueError("profile_steps must be a step range a:b with 0 <= a < b, like 10:15")
+    return start, stop
+
+
+def build_parser(model_name):
+    """
+    Build the train/test command line parser of a registered model.
+
+    Parameters
+    ----------
+    model_name : str
+        Registry key of the model family.
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        Parser with 'train' and 'test' subcommands.
+    """
+    spec = get_model_spec(model_name)
+    train_defaults = spec.cli_defaults.get("train", {})
+    test_defaults = spec.cli_defaults.get("test", {})
+    parser = argparse.ArgumentParser(description=spec.description)
+    subparsers = parser.add_subparsers(dest="command", help="Sub-commands")
+
+    # Subparser for training
+    train_parser = subparsers.add_parser("train", help="Train a model")
+    train_parser.add_argument("--save_dir", type=str, required=True, help="Directory to save model checkpoints and stats")
+    spec.add_arguments(train_parser, "train")
+    train_parser.add_argument("--npy_path", type=str, default="data/processed/ZH_radar_dataset.npy", help="Path to input .npy radar file")
+    train_parser.add_argument("--seq_len_in", type=int, default=10, help="Input sequence length (default: 10)")
+    train_parser.add_argument("--seq_len_out", type=int, default=1, help="Output sequence length (default: 1)")
+    train_parser.add_argument("--train_val_test_split", type=str, default="(0.7,0.15,0.15)", help="Tuple/list of three floats (train, val, test) that sum to 1.0, e.g., (0.7,0.15,0.15)")
+    train_parser.add_argument("--batch_size", type=int, default=4, help="Batch size (default: 4)")
+    train_parser.add_argument("--lr", type=float, default=2e-4, help="Learning rate (default: 2e-4)")
+    train_parser.add_argument("--epochs", type=int, default=15, help="Number of epochs (default: 15)")
+    train_parser.add_argument("--device", type=str, default='cuda', help="Device to train on ('cuda' or 'cpu')")
+    train_parser.add_argument("--loss_name", type=str, default="mse", help="Loss function: mse, weighted_mse, or b_mse")
+    train_parser.add_argument("--loss_weight_thresh", type=float, default=30.0, help="Threshold in dBZ to apply higher loss weighting for weighted_mse loss (default: 30.0 dBZ). Only used when --loss_name=weighted_mse")
+    train_parser.add_argument("--loss_weight_high", type=float, default=10.0, help="Weight multiplier for pixels above threshold in weighted_mse loss (default: 10.0). Only used when --loss_name=weighted_mse")
+    train_parser.add_argument("--patch_size", type=int, default=64, help="Size of spatial patches to extract (default: 64)")
+    train_parser.add_argument("--patch_stride", type=int, default=32, help="Stride for patch extraction (default: 32)")
+    train_parser.add_argument("--patch_thresh", type=float, default=35.0, help="Threshold in dBZ for extracting patches (default: 35.0 dBZ)")
+    train_parser.add_argument("--patch_frac", type=float, default=0.01, help="Minimum fraction of pixels in patch above threshold (default: 0.01)")
+    use_patches = train_defaults.get("use_patches", "False")
+    train_parser.add_argument("--use_patches", type=str, default=use_patches, help=f"Whether to use patch-based training: True or False (default: {use_patches})")
+    train_parser.add_argument("--wandb_project", type=str, default="radar-forecasting", help="wandb project name")
+    train_parser.add_argument("--no_wandb", action="store_true", help="Disable wandb logging")
+    train_parser.add_argument("--early_stopping_patience", type=int, default=10, help="Number of validations with no improvement before early stopping; epochs without validation (--val_every) are not counted (default: 10). Set to 0 or negative to disable early stopping.")
+    train_parser.add_argument("--sampler", type=str, default="sequential", choices=["sequential", "event"], help="Training sampler: 'sequential' or 'event' (storm-weighted importance sampling) (default: sequential)")
+    train_parser.add_argument("--sampler_temperature", type=float, default=1.0, help="Temperature of the event sampler; larger values flatten sampling towards uniform (default: 1.0)")
+    train_parser.add_argument("--sampler_dry_keep", type=float, default=1.0, help="Fraction of dry windows eligible per epoch with the event sampler (default: 1.0)")
+    train_parser.add_argument("--sampler_num_samples", type=int, default=None, help="Number of samples per epoch with the event sampler (default: number of eligible windows)")
+    train_parser.add_argument("--random_crop", type=str, default="False", help="Whether to sample random crops inside qualifying regions in patch-based training: True or False (default: False)")
+    train_parser.add_argument("--crop_sizes", type=str, default=None, help="Tuple of crop sizes for random-crop mode, used in ascending order for progressive resizing, e.g., (32,48,64) (default: (patch_size,))")
+    train_parser.add_argument("--wrap_azimuth", type=str, default="False", help="Whether training patches may cross the 0°/360° azimuth seam: True or False (default: False)")
+    train_parser.add_argument("--channels", type=str, default=None, help="Tuple of channel (elevation) indices to use, e.g., (0,1,2) (default: all channels)")
+    train_parser.add_argument("--channel_reduce", type=str, default=None, choices=["max", "mean"], help="Reduce the selected channels to one composite channel: max or mean (default: None)")
+    train_parser.add_argument("--downsample", type=int, default=1, help="Spatial pooling factor for the frames, e.g., 2 or 4 (default: 1, full resolution)")
+    train_parser.add_argument("--downsample_mode", type=str, default="max", choices=["max", "mean"], help="Pooling used for downsampling: max or mean (default: max)")
+    train_parser.add_argument("--pyramid_cache", type=str, default="False", help="Whether to cache pooled cubes next to the .npy file as a 2x pyramid: True or False (default: False)")
+    train_parser.add_argument("--fused_loss", type=str, default="True", help="Whether weighted_mse/b_mse use the fused lookup-table loss with lower memory use, or the original mask-based losses: True or False (default: True)")
+    train_parser.add_argument("--precision", type=str, default="fp32", choices=["fp32", "bf16"], help="Forward-pass precision: fp32, or bf16 autocast with losses and metrics kept in float32 (default: fp32)")
+    train_parser.add_argument("--compile", type=str, default="False", help="Whether to run the model through torch.compile (falls back to eager on failure): True or False (default: False)")
+    train_parser.add_argument("--compile_cache_dir", type=str, default=None, help="Directory of the persistent torch.compile cache reused between runs (default: Inductor default)")
+    train_parser.add_argument("--accum_steps", type=int, default=1, help="Number of micro-batches of --batch_size accumulated per optimizer step; effective batch size is batch_size * accum_steps (default: 1)")
+    train_parser.add_argument("--activation_checkpoint", type=str, default=None, choices=["step", "stage"], help="Activation checkpointing of the TrajGRU models: step (each TrajGRU time step) or stage (each recurrent stage) (default: None)")
+    train_parser.add_argument("--async_checkpoint", type=str, default="False", help="Whether to write checkpoints in a background thread: True or False (default: False)")
+    train_parser.add_argument("--keep_last_checkpoints", type=int, default=0, help="Number of per-epoch checkpoints epoch_XXX.pt to keep (default: 0, only latest.pt and best_val.pt)")
+    train_parser.add_argument("--val_every", type=int, default=1, help="Validate every N epochs and at the last epoch (default: 1)")
+    train_parser.add_argument("--val_fraction", type=float, default=1.0, help="Fraction of validation windows (evenly spaced) for intermediate loss-only validation; full validation runs on improvement and at the end (default: 1.0)")
+    train_parser.add_argument("--timing_log", type=str, default="False", help="Whether to record per-step data/forward/backward/optimizer/metric times, samples/s and peak RSS to timing.jsonl in the run directory: True or False (default: False)")
+    train_parser.add_argument("--profile_steps", type=str, default=None, help="Range a:b of training steps (micro-batches, from 0) to record with torch.profiler; trace and operator tables go to save_dir/profile, e.g., 10:15 (default: None)")
+    train_parser.add_argument("--num_workers", type=int, default=0, help="DataLoader worker processes (default: 0, load in the main process)")
+    train_parser.add_argument("--num_threads", type=int, default=None, help="torch intra-op threads (default: torch default)")
+    train_parser.add_argument("--interop_threads", type=int, default=None, help="torch inter-op threads (default: torch default)")
+    train_parser.add_argument("--cache_dir", type=str, default=None, help="Directory of the patch index and frame score caches, shared between runs (default: save_dir)")
+    train_parser.add_argument("--checkpoint_every_steps", type=int, default=0, help="Save a mid-epoch checkpoint latest_step.pt every N optimizer steps; a restart continues from that step (default: 0, end of epoch only)")
+    train_parser.add_argument("--ema_decay", type=float, default=0.0, help="Decay per optimizer step of a moving average of the weights used for validation and testing, e.g., 0.999 (default: 0.0, disabled)")
+    train_parser.add_argument("--distributed", type=str, default="False", help="Whether to train data-parallel over the processes of a torchrun launch (gloo backend): True or False (default: False)")
+
+    # Subparser for test
+    test_parser = subparsers.add_parser("test", help="Test model: generate predictions and compute metrics")
+    npy_path = test_defaults.get("npy_path")
+    test_parser.add_argument("--npy_path", type=str, required=npy_path is None, default=npy_path, help="Path to input .npy radar file")
+    test_parser.add_argument("--run_dir", type=str, required=True, help="Directory containing model checkpoints and stats")
+    spec.add_arguments(test_parser, "test")
+    test_parser.add_argument("--seq_len_in", type=int, default=10, help="Input sequence length (default: 10)")
+    test_parser.add_argument("--seq_len_out", type=int, default=1, help="Output sequence length (default: 1)")
+    test_parser.add_argument("--train_val_test_split", type=str, default="(0.7,0.15,0.15)", help="Tuple/list of three floats (train, val, test) that sum to 1.0, e.g., (0.7,0.15,0.15)")
+    test_batch_size = test_defaults.get("batch_size", 4)
+    test_parser.add_argument("--batch_size", type=int, default=test_batch_size, help=f"Batch size (default: {test_batch_size})")
+    test_parser.add_argument("--which", type=str, default="best", help="Which checkpoint to load: 'best' or 'latest'")
+    test_parser.add_argument("--device", type=str, default=test_defaults.get("device"), help="Device to run inference on (default: 'cpu')")
+    test_parser.add_argument("--save_arrays", type=str, default="True", help="Whether to save predictions and targets as .npy files (True/False)")
+    test_parser.add_argument("--predictions_dir", type=str, default=None, help="Directory to save large prediction/target files (default: same as run_dir)")
+    test_parser.add_argument("--channels", type=str, default=None, help="Tuple of channel (elevation) indices to use, e.g., (0,1,2) (default: all channels)")
+    test_parser.add_argument("--channel_reduce", type=str, default=None, choices=["max", "mean"], help="Reduce the selected channels to one composite channel: max or mean (default: None)")
+    test_parser.add_argument("--downsample", type=int, default=1, help="Spatial pooling factor for the frames, e.g., 2 or 4 (default: 1, full resolution)")
+    test_parser.add_argument("--downsample_mode", type=str, default="max", choices=["max", "mean"], help="Pooling used for downsampling: max or mean (default: max)")
+    test_parser.add_argument("--pyramid_cache", type=str, default="False", help="Whether to cache pooled cubes next to the .npy file as a 2x pyramid: True or False (default: False)")
+    test_parser.add_argument("--upsample_predictions", type=str, default="True", help="With --downsample > 1, whether to upsample predictions to full resolution for metrics: True or False (default: True)")
+    test_parser.add_argument("--precision", type=str, default="fp32", choices=["fp32", "bf16"], help="Forward-pass precision: fp32, or bf16 autocast with metrics kept in float32 (default: fp32)")
+    test_parser.add_argument("--compile", type=str, default="False", help="Whether to run the model through torch.compile (falls back to eager on failure): True or False (default: False)")
+    test_parser.add_argument("--compile_cache_dir", type=str, default=None, help="Directory of the persistent torch.compile cache reused between runs (default: Inductor default)")
+    test_parser.add_argument("--profile_steps", type=str, default=None, help="Range a:b of test batches (from 0) to record with torch.profiler; trace and operator tables go to run_dir/profile, e.g., 0:5 (default: None)")
+
+    # Autotune subcommand
+    autotune_parser = subparsers.add_parser("autotune", help="Find the batch size and thread counts with the highest training throughput on synthetic data")
+    autotune_parser.add_argument("--save_dir", type=str, required=True, help="Directory to save autotune.json with all results and the recommended configuration")
+    spec.add_arguments(autotune_parser, "train")
+    autotune_parser.add_argument("--input_shape", type=str, default="(14,360,240)", help="Frame shape (C, H, W) of the synthetic windows, e.g., (14,360,240) or (14,64,64) for patches")
+    autotune_parser.add_argument("--seq_len_in", type=int, default=10, help="Input sequence length (default: 10)")
+    autotune_parser.add_argument("--seq_len_out", type=int, default=1, help="Output sequence length (default: 1)")
+    autotune_parser.add_argument("--device", type=str, default="cpu", help="Device to train on ('cuda' or 'cpu') (default: cpu)")
+    autotune_parser.add_argument("--precision", type=str, default="fp32", choices=["fp32", "bf16"], help="Forward-pass precision (default: fp32)")
+    autotune_parser.add_argument("--batch_sizes", type=str, default="(1,2,4,8,16)", help="Tuple of batch sizes to try (default: (1,2,4,8,16))")
+    autotune_parser.add_argument("--num_threads", type=str, default=None, help="Tuple of intra-op thread counts to try (default: CPU count / 8, / 4, / 2, / 1)")
+    autotune_parser.add_argument("--interop_threads", type=str, default="(1,2)", help="Tuple of inter-op thread counts to try (default: (1,2))")
+    autotune_parser.add_argument("--num_workers", type=str, default="(0,2,4,8)", help="Tuple of DataLoader worker counts to try (default: (0,2,4,8))")
+    autotune_parser.add_argument("--steps", type=int, default=10, help="Timed training steps per configuration (default: 10)")
+    autotune_parser.add_argument("--warmup", type=int, default=3, help="Untimed warmup steps per configuration (default: 3)")
+    autotune_parser.add_argument("--max_memory_mb", type=float, default=None, help="Do not recommend configurations with a higher peak memory in MB (default: no limit)")
+
+    # Sweep subcommand
+    sweep_parser = subparsers.add_parser("sweep", help="Run a grid or random hyperparameter sweep of train runs on a local process pool")
+    sweep_parser.add_argument("--spec", type=str, required=True, help="JSON sweep spec with 'method' (grid or random), 'parameters' (searched train options) and 'fixed' (options of all runs)")
+    sweep_parser.add_argument("--save_dir", type=str, required=True, help="Sweep directory: one run_XXX directory per run, shared caches, sweep_runs.json and the leaderboard")
+    sweep_parser.add_argument("--parallel", type=int, default=1, help="Number of runs training at the same time (default: 1)")
+    sweep_parser.add_argument("--cores_per_run", type=int, default=None, help="CPU cores pinned to each run (default: available cores // parallel)")
+    sweep_parser.add_argument("--rank_by", type=str, default="val_loss", help="Metric of best_validation_metrics.json to rank runs by; nested keys joined with dots, e.g., csi_by_threshold.csi_35 (default: val_loss)")
+    sweep_parser.add_argument("--rank_mode", type=str, default="min", choices=["min", "max"], help="Whether lower (min) or higher (max) values rank first (default: min)")
+    return parser
+
+
+def main(model_name, argv=None):
+    """
+    Command line entry point shared by the train_*.py scripts.
+
+    Parameters
+    ----------
+    model_name : str
+        Registry key of the model family.
+    argv : list of str, optional
+        Command line arguments (default: None, sys.argv[1:]).
+    """
+    spec = get_model_spec(model_name)
+    parser = build_parser(model_name)
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.error("a command is required: train, test, autotune or sweep")
+
+    if args.command == "train":
+        for name in ("use_patches", "random_crop", "wrap_azimuth", "pyramid_cache", "fused_loss", "compile", "distributed", "async_checkpoint", "timing_log"):
+            setattr(args, name, str2bool(getattr(args, name), name))
+        crop_sizes = _parse_crop_sizes(args.crop_sizes)
+        channels = _parse_channels(args.channels)
+        model_kwargs = spec.parse_arguments(args, "train")
+        train_val_test_split = ast.literal_eval(args.train_val_test_split)
+        os.makedirs(args.save_dir, exist_ok=True)
+        if int(os.environ.get("RANK", 0)) == 0:
+            with open(os.path.join(args.save_dir, "train_args.json"), "w") as f:
+                json.dump(vars(args), f, indent=2)
+        train_radar_model(
+            model_name,
+            npy_path=args.npy_path,
+            save_dir=args.save_dir,
+            args=args,
+            model_kwargs=model_kwargs,
+            seq_len_in=args.seq_len_in,
+            seq_len_out=args.seq_len_out,
+            train_val_test_split=train_val_test_split,
+            batch_size=args.batch_size,
+            lr=args.lr,
+            epochs=args.epochs,
+            device=args.device,
+            loss_name=args.loss_name,
+            loss_weight_thresh=args.loss_weight_thresh,
+            loss_weight_high=args.loss_weight_high,
+            patch_size=args.patch_size,
+            patch_stride=args.patch_stride,
+            patch_thresh=args.patch_thresh,
+            patch_frac=args.patch_frac,
+            use_patches=args.use_patches,
+            wandb_project=args.wandb_project,
+            early_stopping_patience=args.early_stopping_patience,
+            sampler=args.sampler,
+            sampler_temperature=args.sampler_temperature,
+            sampler_dry_keep=args.sampler_dry_keep,
+            sampler_num_samples=args.sampler_num_samples,
+            random_crop=args.random_crop,
+            crop_sizes=crop_sizes,
+            wrap_azimuth=args.wrap_azimuth,
+            channels=channels,
+            channel_reduce=args.channel_reduce,
+            downsample=args.downsample,
+            downsample_mode=args.downsample_mode,
+            pyramid_cache=args.pyramid_cache,
+            fused_loss=args.fused_loss,
+            precision=args.precision,
+            compile=args.compile,
+            compile_cache_dir=args.compile_cache_dir,
+            distributed=args.distributed,
+            accum_steps=args.accum_steps,
+            activation_checkpoint=args.activation_checkpoint,
+            async_checkpoint=args.async_checkpoint,
+            keep_last_checkpoints=args.keep_last_checkpoints,
+            val_every=args.val_every,
+            val_fraction=args.val_fraction,
+            timing_log=args.timing_log,
+            profile_steps=_parse_step_range(args.profile_steps),
+            num_workers=args.num_workers,
+            num_threads=args.num_threads,
+            interop_threads=args.interop_threads,
+            cache_dir=args.cache_dir,
+            checkpoint_every_steps=args.checkpoint_every_steps,
+            ema_decay=args.ema_decay,
+        )
+    elif args.command == "test":
+        for name in ("save_arrays", "pyramid_cache", "upsample_predictions", "compile"):
+            setattr(args, name, str2bool(getattr(args, name), name))
+        channels = _parse_channels(args.channels)
+        model_kwargs = spec.parse_arguments(args, "test")
+        train_val_test_split = ast.literal_eval(args.train_val_test_split)
+        os.makedirs(args.run_dir, exist_ok=True)
+        with open(os.path.join(args.run_dir, "test_args.json"), "w") as f:
+            json.dump(vars(args), f, indent=2)
+        predict_test_set(
+            model_name,
+            npy_path=args.npy_path,
+            run_dir=args.run_dir,
+            model_kwargs=model_kwargs,
+            seq_len_in=args.seq_len_in,
+            seq_len_out=args.seq_len_out,
+            train_val_test_split=train_val_test_split,
+            batch_size=args.batch_size,
+            which=args.which,
+            device=args.device,
+            save_arrays=args.save_arrays,
+            predictions_dir=args.predictions_dir,
+            channels=channels,
+            channel_reduce=args.channel_reduce,
+            downsample=args.downsample,
+            downsample_mode=args.downsample_mode,
+            pyramid_cache=args.pyramid_cache,
+            upsample_predictions=args.upsample_predictions,
+            precision=args.precision,
+            compile=args.compile,
+            compile_cache_dir=args.compile_cache_dir,
+            profile_steps=_parse_step_range(args.profile_steps),
+        )
+    elif args.command == "autotune":
+        model_kwargs = spec.parse_arguments(args, "train")
+        autotune_radar_model(
+            model_name,
+            save_dir=args.save_dir,
+            model_kwargs=model_kwargs,
+            input_shape=_literal_sequence(args.input_shape, "input_shape must be a tuple (C, H, W), like (14,360,240)"),
+            seq_len_in=args.seq_len_in,
+            seq_len_out=args.seq_len_out,
+            device=args.device,
+            precision=args.precision,
+            batch_sizes=_parse_int_tuple(args.batch_sizes, "batch_sizes"),
+            num_threads=None if args.num_threads is None else _parse_int_tuple(args.num_threads, "num_threads"),
+            interop_threads=_parse_int_tuple(args.interop_threads, "interop_threads"),
+            num_workers=_parse_int_tuple(args.num_workers, "num_workers"),
+            steps=args.steps,
+            warmup=args.warmup,
+            max_memory_mb=args.max_memory_mb,
+        )
+    elif args.command == "sweep":
+        from src.training.sweep import load_sweep_spec, run_sweep
+        run_sweep(
+            [sys.executable, str(Path(__file__).resolve()), model_name, "train"],
+            load_sweep_spec(args.spec),
+            args.save_dir,
+            parallel=args.parallel,
+            cores_per_run=args.cores_per_run,
+            rank_by=args.rank_by,
+            rank_mode=args.rank_mode,
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in MODEL_REGISTRY:
+        print(f"Usage: python src/training/engine.py {{{','.join(MODEL_REGISTRY)}}} {{train,test,autotune,sweep}} [options]")
+        sys.exit(2)
+    main(sys.argv[1], sys.argv[2:])
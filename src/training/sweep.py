@@ -0,0 +1,410 @@
+import csv
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import time
+from pathlib import Path
+
+
+def load_sweep_spec(path):
+    """
+    Load a sweep specification from a JSON file.
+
+    The file holds the search method, the searched parameters and the options shared by all runs:
+
+        {"method": "grid",
+         "parameters": {"base_ch": [16, 32], "L": [5, 9], "loss_name": ["mse", "b_mse"]},
+         "fixed": {"epochs": 20, "use_patches": true}}
+
+    With "method": "random", "num_runs" runs are drawn (with "seed"); a parameter is either a list
+    of values or a range {"min": 1e-4, "max": 1e-3, "log": true, "type": "float"}.
+    An optional "scheduler": {"type": "successive_halving", "min_epochs": 2, "eta": 3} stops
+    the weaker runs early (see run_sweep()).
+
+    Parameters
+    ----------
+    path : str
+        Path to the JSON file.
+
+    Returns
+    -------
+    dict
+        Sweep specification.
+    """
+    with open(path) as f:
+        spec = json.load(f)
+    method = spec.get("method", "grid")
+    if method not in ("grid", "random"):
+        raise ValueError(f"Sweep method must be 'grid' or 'random', got {method}")
+    if not spec.get("parameters"):
+        raise ValueError("Sweep spec needs a non-empty 'parameters' dict")
+    if method == "grid" and any(not isinstance(v, list) for v in spec["parameters"].values()):
+        raise ValueError("Grid sweeps take a list of values for every parameter")
+    if method == "random" and int(spec.get("num_runs", 0)) < 1:
+        raise ValueError("Random sweeps need 'num_runs' >= 1")
+    scheduler = spec.get("scheduler")
+    if scheduler is not None:
+        if scheduler.get("type") != "successive_halving":
+            raise ValueError(f"Sweep scheduler type must be 'successive_halving', got {scheduler.get('type')}")
+        if int(scheduler.get("min_epochs", 0)) < 1 or int(scheduler.get("eta", 3)) < 2:
+            raise ValueError("Successive halving needs 'min_epochs' >= 1 and 'eta' >= 2")
+    return spec
+
+
+def _sample_value(rng, choice):
+    if isinstance(choice, list):
+        return rng.choice(choice)
+    lo, hi = choice["min"], choice["max"]
+    if choice.get("log", False):
+        value = math.exp(rng.uniform(math.log(lo), math.log(hi)))
+    else:
+        value = rng.uniform(lo, hi)
+    return int(round(value)) if choice.get("type", "float") == "int" else value
+
+
+def expand_sweep(spec):
+    """
+    List the parameter sets of the runs of a sweep.
+
+    Parameters
+    ----------
+    spec : dict
+        Sweep specification from load_sweep_spec().
+
+    Returns
+    -------
+    list of dict
+        Searched parameters of each run, in launch order.
+    """
+    params = spec["parameters"]
+    if spec.get("method", "grid") == "grid":
+        names = list(params)
+        return [dict(zip(names, values)) for values in itertools.product(*(params[n] for n in names))]
+    rng = random.Random(spec.get("seed", 0))
+    return [{name: _sample_value(rng, choice) for name, choice in params.items()}
+            for _ in range(int(spec["num_runs"]))]
+
+
+def format_cli_args(options):
+    """
+    Convert run options into train command line arguments.
+
+    Booleans become 'True'/'False' (the store_true option no_wandb becomes the bare flag),
+    lists and tuples become tuple literals, and None values are left out.
+
+    Parameters
+    ----------
+    options : dict
+        Option name → value.
+
+    Returns
+    -------
+    list of str
+        Command line arguments.
+    """
+    argv = []
+    for name, value in options.items():
+        if value is None or (name == "no_wandb" and not value):
+            continue
+        if name == "no_wandb":
+            argv.append("--no_wandb")
+            continue
+        if isinstance(value, bool):
+            value = "True" if value else "False"
+        elif isinstance(value, (list, tuple)):
+            value = str(tuple(value))
+        argv += [f"--{name}", str(value)]
+    return argv
+
+
+def _core_slots(parallel, cores_per_run):
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    cores_per_run = cores_per_run or max(1, len(cores) // parallel)
+    if cores_per_run * parallel > len(cores):
+        raise ValueError(f"{parallel} runs x {cores_per_run} cores needs more than the {len(cores)} available cores")
+    return [cores[i * cores_per_run:(i + 1) * cores_per_run] for i in range(parallel)]
+
+
+def _launch(cmd, cores, log_path):
+    env = dict(os.environ)
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        env[var] = str(len(cores))
+    # Pin the run and everything it starts (DataLoader workers) to its own cores
+    pin = (lambda: os.sched_setaffinity(0, cores)) if hasattr(os, "sched_setaffinity") else None
+    log = open(log_path, "w")
+    proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, env=env, preexec_fn=pin)
+    log.close()
+    return proc
+
+
+def _lookup(metrics, key):
+    value = metrics
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value if isinstance(value, (int, float)) else None
+
+
+def collect_leaderboard(save_dir, runs, rank_by="val_loss", rank_mode="min"):
+    """
+    Collect results/best_validation_metrics.json of every run into a ranked leaderboard.
+
+    Parameters
+    ----------
+    save_dir : str or pathlib.Path
+        Sweep directory; leaderboard.json and leaderboard.csv are written to it.
+    runs : list of dict
+        Run records with 'name', 'params' and 'returncode'.
+    rank_by : str, optional
+        Metric to rank by; nested keys are joined with dots, e.g. 'csi_by_threshold.csi_35'
+        (default: 'val_loss').
+    rank_mode : str, optional
+        'min' or 'max': whether lower or higher values rank first (default: 'min').
+
+    Returns
+    -------
+    list of dict
+        Leaderboard rows, best first; runs without metrics come last.
+    """
+    save_dir = Path(save_dir)
+    rows = []
+    for run in runs:
+        metrics_path = save_dir / run["name"] / "results" / "best_validation_metrics.json"
+        metrics = {}
+        if metrics_path.exists():
+            with open(metrics_path) as f:
+                metrics = json.load(f)
+        rows.append({
+            "run": run["name"],
+            "returncode": run.get("returncode"),
+            "stopped_at_epoch": run.get("stopped_at_epoch"),
+            "early_stopped": run.get("early_stopped", False),
+            **run["params"],
+            rank_by: _lookup(metrics, rank_by),
+            **{k: metrics.get(k) for k in ("epoch", "val_loss", "b_mse", "mse") if k != rank_by},
+        })
+    sign = 1 if rank_mode == "min" else -1
+    rows.sort(key=lambda r: (r[rank_by] is None, sign * r[rank_by] if r[rank_by] is not None else 0))
+
+    with open(save_dir / "leaderboard.json", "w") as f:
+        json.dump(rows, f, indent=2)
+    columns = list(dict.fromkeys(k for row in rows for k in row))
+    with open(save_dir / "leaderboard.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+
+def successive_halving_rungs(min_epochs, max_epochs, eta=3):
+    """
+    Epoch budgets of the rungs of successive halving.
+
+    Parameters
+    ----------
+    min_epochs : int
+        Budget of the first rung.
+    max_epochs : int
+        Budget of the last rung.
+    eta : int, optional
+        Factor between the budgets of consecutive rungs; only the best 1/eta of the runs
+        are promoted to the next rung (default: 3).
+
+    Returns
+    -------
+    list of int
+        Increasing epoch budgets min_epochs, min_epochs * eta, ..., ending with max_epochs.
+    """
+    rungs = []
+    budget = min_epochs
+    while budget < max_epochs:
+        rungs.append(budget)
+        budget *= eta
+    return rungs + [max_epochs]
+
+
+def _progress(run_dir):
+    # progress.json is written by the engine after every epoch; "early_stopped" marks runs
+    # that stopped on --early_stopping_patience and do not train further
+    progress_path = Path(run_dir) / "progress.json"
+    if not progress_path.exists():
+        return {"epoch": 0, "early_stopped": False}
+    with open(progress_path) as f:
+        progress = json.load(f)
+    return {"epoch": int(progress["epoch"]), "early_stopped": bool(progress.get("early_stopped", False))}
+
+
+def _epochs_done(run_dir):
+    return _progress(run_dir)["epoch"]
+
+
+def run_sweep(train_cmd, spec, save_dir, *, parallel=1, cores_per_run=None, rank_by="val_loss", rank_mode="min", poll_interval=5.0):
+    """
+    Run the train command for every parameter set of a sweep on a local process pool.
+
+    Up to `parallel` runs train at once, each pinned to its own set of `cores_per_run` cores
+    (CPU affinity, OMP/MKL threads and --num_threads), so runs do not oversubscribe the cores.
+    All runs read the same memmapped .npy file, so its pages are shared through the OS page
+    cache, and they share the patch index and frame score caches in save_dir/cache
+    (--cache_dir). Run i trains in save_dir/run_{i:03d} and logs to its train.log.
+
+    With a "scheduler" {"type": "successive_halving", "min_epochs": 2, "eta": 3} in the spec,
+    all runs first train for min_epochs; only the best 1/eta by `rank_by` continue from their
+    latest.pt to min_epochs * eta epochs, and so on up to the "epochs" of "fixed". Runs are ranked
+    on the validation metrics of the last epoch of the rung (progress.json), not on their best
+    epoch so far, so every run is compared at the same budget.
+
+    Runs are resumed from their latest.pt when the sweep is restarted. The run records, kept in
+    save_dir/sweep_runs.json, hold the rung each run was promoted to, so a restarted sweep does
+    not rank the finished rungs again, and runs stopped by successive halving stay stopped.
+    Runs stopped by early stopping are not ranked and do not take a promotion; they keep the
+    epoch they stopped at as stopped_at_epoch.
+
+    Parameters
+    ----------
+    train_cmd : list of str
+        Command that starts training of the model, e.g. [python, engine.py, 'unet_traj_gru', 'train'].
+    spec : dict
+        Sweep specification from load_sweep_spec().
+    save_dir : str or pathlib.Path
+        Sweep directory.
+    parallel : int, optional
+        Number of runs training at the same time (default: 1).
+    cores_per_run : int, optional
+        Cores pinned to each run (default: available cores // parallel).
+    rank_by : str, optional
+        Validation metric that ranks the runs, at the rung budget for promotion and at the
+        best epoch for the leaderboard (default: 'val_loss').
+    rank_mode : str, optional
+        'min' or 'max' (default: 'min').
+    poll_interval : float, optional
+        Seconds between checks for finished runs (default: 5.0).
+
+    Returns
+    -------
+    list of dict
+        Leaderboard rows from collect_leaderboard(), best first.
+    """
+    save_dir = Path(save_dir)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = save_dir / "cache"
+    cache_dir.mkdir(exist_ok=True)
+    slots = _core_slots(parallel, cores_per_run)
+    fixed = dict(spec.get("fixed", {}))
+    fixed.setdefault("cache_dir", str(cache_dir))
+    max_epochs = int(fixed.pop("epochs", 15))
+    scheduler = spec.get("scheduler")
+    if scheduler is None:
+        rungs, eta = [max_epochs], None
+    else:
+        eta = int(scheduler.get("eta", 3))
+        rungs = successive_halving_rungs(int(scheduler["min_epochs"]), max_epochs, eta)
+
+    runs = [{"name": f"run_{i:03d}", "params": params, "returncode": None, "rung": 0,
+             "stopped_at_epoch": None, "early_stopped": False}
+            for i, params in enumerate(expand_sweep(spec))]
+    records_path = save_dir / "sweep_runs.json"
+    if records_path.exists():
+        with open(records_path) as f:
+            previous = {r["name"]: r for r in json.load(f)}
+        for run in runs:
+            old = previous.get(run["name"])
+            if old is not None and old["params"] == run["params"]:
+                run.update(old)
+
+    def save_records():
+        with open(records_path, "w") as f:
+            json.dump(runs, f, indent=2)
+
+    def score(run, budget):
+        # Validation metrics of the last epoch of the rung, so all runs are compared at the same budget
+        path = save_dir / run["name"] / "progress.json"
+        if run["returncode"] != 0 or not path.exists():
+            return None
+        with open(path) as f:
+            progress = json.load(f)
+        if progress.get("epoch") != budget:
+            return None
+        return _lookup(progress.get("validation_metrics") or {"val_loss": progress.get("val_loss")}, rank_by)
+
+    print(f"Sweep: {len(runs)} runs, {parallel} in parallel with {len(slots[0])} cores each → {save_dir}")
+    if scheduler is not None:
+        print(f"Successive halving: rungs at {rungs} epochs, eta={eta}")
+    for k, budget in enumerate(rungs):
+        # Runs that entered rung k, including those stopped at its end by an earlier call
+        entrants = [run for run in runs if run["rung"] >= k]
+        active = [run for run in entrants if run["stopped_at_epoch"] is None]
+        pending = [(run, budget - _epochs_done(save_dir / run["name"])) for run in active
+                   if not _progress(save_dir / run["name"])["early_stopped"]]
+        pending = [(run, epochs) for run, epochs in pending if epochs > 0]
+        if len(rungs) > 1:
+            print(f"Rung {k + 1}/{len(rungs)}: {len(active)} runs to {budget} epochs ({len(pending)} to train)")
+        running = {}  # slot index → (run, process, start time)
+        while pending or running:
+            for slot in range(parallel):
+                if slot in running or not pending:
+                    continue
+                run, epochs = pending.pop(0)
+                run_dir = save_dir / run["name"]
+                run_dir.mkdir(exist_ok=True)
+                # The engine resumes from run_dir/latest.pt and trains `epochs` more epochs
+                options = {**fixed, **run["params"], "epochs": epochs, "save_dir": str(run_dir), "num_threads": len(slots[slot])}
+                cmd = list(train_cmd) + format_cli_args(options)
+                run["command"] = cmd
+                running[slot] = (run, _launch(cmd, slots[slot], run_dir / "train.log"), time.perf_counter())
+                print(f"  started {run['name']} on cores {slots[slot][0]}-{slots[slot][-1]}: {run['params']}")
+            save_records()
+            time.sleep(poll_interval)
+            for slot, (run, proc, start) in list(running.items()):
+                if proc.poll() is None:
+                    continue
+                run["returncode"] = proc.returncode
+                run["duration_sec"] = run.get("duration_sec", 0.0) + time.perf_counter() - start
+                run["early_stopped"] = _progress(save_dir / run["name"])["early_stopped"]
+                status = "done" if proc.returncode == 0 else f"failed (exit {proc.returncode}, see {run['name']}/train.log)"
+                print(f"  {run['name']} {status} at epoch {_epochs_done(save_dir / run['name'])}")
+                del running[slot]
+            save_records()
+
+        # Runs stopped by early stopping do not train further: they are stopped at their last
+        # epoch instead of taking a promotion
+        for run in active:
+            progress = _progress(save_dir / run["name"])
+            if progress["early_stopped"]:
+                run["early_stopped"] = True
+                run["stopped_at_epoch"] = progress["epoch"]
+        save_records()
+        if k + 1 == len(rungs):
+            break
+        # Failed runs are not retried in this call; restarting the sweep resumes them, and they
+        # compete for the promotions of the rung that are left
+        promoted = [run for run in entrants if run["rung"] > k]
+        undecided = [run for run in active if run["rung"] == k and run["returncode"] == 0 and run["stopped_at_epoch"] is None]
+        n_keep = max(0, max(1, math.ceil(len(entrants) / eta)) - len(promoted))
+        if not undecided:
+            continue
+        sign = 1 if rank_mode == "min" else -1
+        scores = {run["name"]: score(run, budget) for run in undecided}
+        ranked = sorted(undecided, key=lambda r: (scores[r["name"]] is None, sign * (scores[r["name"]] or 0.0)))
+        kept, stopped = ranked[:n_keep], ranked[n_keep:]
+        for run in kept:
+            run["rung"] = k + 1
+        for run in stopped:
+            run["stopped_at_epoch"] = budget
+        print(f"  promoted {', '.join(r['name'] for r in kept) or 'no runs'}; stopped {len(stopped)} runs at {budget} epochs")
+        save_records()
+
+    rows = collect_leaderboard(save_dir, runs, rank_by=rank_by, rank_mode=rank_mode)
+    print(f"\nLeaderboard ({rank_by}, {'lower' if rank_mode == 'min' else 'higher'} is better):")
+    for row in rows:
+        value = f"{row[rank_by]:.4f}" if row[rank_by] is not None else "n/a"
+        print(f"  {row['run']}: {value} | " + ", ".join(f"{k}={row[k]}" for k in spec["parameters"]))
+    print(f"Saved leaderboard.json and leaderboard.csv → {save_dir}")
+    return rows
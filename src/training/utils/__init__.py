@@ -6,22 +6,70 @@ This module contains common utilities used across different training scripts.
 
 from .dataloaders import (
     RadarWindowDataset,
-    PatchRadarWindowDataset
+    PatchRadarWindowDataset,
+    selected_channel_count,
+    load_pooled_cube,
+    SyntheticWindowDataset
+)
+from .samplers import (
+    EventWeightedSampler,
+    ResumableSampler,
+    build_train_sampler
 )
 from .training_utils import (
     set_seed, 
+    configure_threads,
     atomic_save, 
+    get_rng_state,
+    set_rng_state,
+    AsyncCheckpointWriter,
     mse_loss, 
     weighted_mse_loss, 
-    b_mse_loss
+    b_mse_loss,
+    upsample_frames,
+    autocast_context,
+    CompiledForward,
+    ModelEMA
+)
+from .instrumentation import (
+    StepTimer,
+    StepProfiler,
+    peak_rss_mb
+)
+from .distributed import (
+    init_distributed,
+    cleanup_distributed,
+    barrier,
+    all_reduce_sum
 )
 
 __all__ = [
     'RadarWindowDataset',
     'PatchRadarWindowDataset', 
+    'selected_channel_count',
+    'load_pooled_cube',
+    'SyntheticWindowDataset',
+    'EventWeightedSampler',
+    'ResumableSampler',
+    'build_train_sampler',
     'set_seed',
+    'configure_threads',
     'atomic_save',
+    'get_rng_state',
+    'set_rng_state',
+    'AsyncCheckpointWriter',
     'mse_loss',
     'weighted_mse_loss',
     'b_mse_loss',
-] 
\ No newline at end of file
+    'upsample_frames',
+    'autocast_context',
+    'CompiledForward',
+    'ModelEMA',
+    'StepTimer',
+    'StepProfiler',
+    'peak_rss_mb',
+    'init_distributed',
+    'cleanup_distributed',
+    'barrier',
+    'all_reduce_sum',
+] 
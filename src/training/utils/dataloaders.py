@@ -1,11 +1,255 @@
 
 import os
+import json
+from pathlib import Path
 import numpy as np
 import torch
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, get_worker_info
 from tqdm import tqdm
 
 
+CHANNEL_REDUCTIONS = ("max", "mean")
+POOL_MODES = ("max", "mean")
+
+
+def save_npy_atomic(path, array, meta=None):
+    """
+    Save an array as .npy through a temporary file, so that concurrent runs sharing the
+    cache never read a partly written file.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Target .npy path.
+    array : np.ndarray
+        Array to save.
+    meta : dict, optional
+        JSON-serializable parameters the array was computed from, saved to ``<path>.json``
+        after the array and checked by load_npy_cache() (default: None).
+    """
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+    if meta is not None:
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, f"{path}.json")
+
+
+def load_npy_cache(path, meta, allow_pickle=False):
+    """
+    Load an array saved by save_npy_atomic() if it was computed from the same parameters.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Cached .npy path.
+    meta : dict
+        Parameters of the current run, compared with ``<path>.json``.
+    allow_pickle : bool, optional
+        Whether object arrays may be loaded (default: False).
+
+    Returns
+    -------
+    np.ndarray or None
+        The cached array, or None if it does not exist or was computed from other parameters.
+    """
+    if not os.path.exists(path):
+        return None
+    meta_path = f"{path}.json"
+    saved = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            saved = json.load(f)
+    # Compare through JSON so that tuples and lists are equal
+    if saved != json.loads(json.dumps(meta)):
+        print(f"Ignoring cache {path}: computed with {saved}, need {meta}")
+        return None
+    return np.load(path, allow_pickle=allow_pickle)
+
+
+def pooled_cube_path(npy_path, factor, mode="max"):
+    """
+    Path of the cached pyramid level of a cube, stored next to the cube file.
+
+    Parameters
+    ----------
+    npy_path : str
+        Path to the full-resolution .npy cube.
+    factor : int
+        Spatial pooling factor of the level.
+    mode : str, optional
+        Pooling mode: 'max' or 'mean' (default: 'max').
+
+    Returns
+    -------
+    Path
+        Path like ``<stem>_pool<factor>_<mode>.npy``.
+    """
+    npy_path = Path(npy_path)
+    return npy_path.with_name(f"{npy_path.stem}_pool{factor}_{mode}.npy")
+
+
+def build_pooled_cube(cube, factor, mode="max", cache_path=None, chunk_size=32):
+    """
+    Pool a radar cube spatially by an integer factor, block by block.
+
+    Negative values are clipped to 0 before pooling, as in the dataset normalization, so the
+    pooled cube holds dBZ >= 0. Trailing rows/columns that do not fill a whole block are dropped.
+
+    Parameters
+    ----------
+    cube : np.ndarray
+        Radar data cube of shape (T, C, H, W) in dBZ (may be a memmap).
+    factor : int
+        Pooling factor applied to H and W.
+    mode : str, optional
+        Pooling mode: 'max' or 'mean' (default: 'max').
+    cache_path : str, optional
+        Path of a .npy file to write the pooled cube to, or to load it from if it already
+        exists with the expected shape (default: None, keep it in memory).
+    chunk_size : int, optional
+        Number of frames pooled at once (default: 32).
+
+    Returns
+    -------
+    np.ndarray
+        Pooled cube of shape (T, C, H // factor, W // factor), memory-mapped when cached.
+    """
+    if mode not in POOL_MODES:
+        raise ValueError(f"pooling mode must be one of {POOL_MODES}, got {mode}")
+    if factor == 1:
+        return cube
+    T, C, H, W = cube.shape
+    Hp, Wp = H // factor, W // factor
+    if cache_path is not None and os.path.exists(cache_path):
+        pooled = np.load(cache_path, mmap_mode='r')
+        if pooled.shape == (T, C, Hp, Wp):
+            print(f"Loading pooled cube from {cache_path}")
+            return pooled
+    if cache_path is not None:
+        tmp_path = f"{cache_path}.tmp{os.getpid()}"
+        pooled = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(T, C, Hp, Wp))
+    else:
+        pooled = np.empty((T, C, Hp, Wp), dtype=np.float32)
+    for start in tqdm(range(0, T, chunk_size), desc=f'Pooling {factor}x ({mode})'):
+        block = np.maximum(np.asarray(cube[start:start + chunk_size, :, :Hp * factor, :Wp * factor]), 0)
+        block = block.reshape(len(block), C, Hp, factor, Wp, factor)
+        pooled[start:start + len(block)] = block.max(axis=(3, 5)) if mode == "max" else block.mean(axis=(3, 5))
+    if cache_path is not None:
+        pooled.flush()
+        del pooled
+        os.replace(tmp_path, cache_path)
+        print(f"Saved pooled cube to {cache_path}")
+        return np.load(cache_path, mmap_mode='r')
+    return pooled
+
+
+def load_pooled_cube(npy_path, cube, factor, mode="max", cache=False):
+    """
+    Return the cube pooled by ``factor``, optionally through an on-disk pyramid.
+
+    With ``cache=True``, every level 2, 4, ..., factor is stored next to ``npy_path`` and
+    built from the previous level, so a 4x run reuses the 2x level of an earlier run.
+
+    Parameters
+    ----------
+    npy_path : str
+        Path to the full-resolution .npy cube.
+    cube : np.ndarray
+        Full-resolution cube loaded from ``npy_path``.
+    factor : int
+        Pooling factor; a power of 2 when ``cache=True``.
+    mode : str, optional
+        Pooling mode: 'max' or 'mean' (default: 'max').
+    cache : bool, optional
+        Whether to cache the pyramid levels on disk (default: False).
+
+    Returns
+    -------
+    np.ndarray
+        Pooled cube of shape (T, C, H // factor, W // factor).
+    """
+    if factor < 1:
+        raise ValueError(f"downsample factor must be >= 1, got {factor}")
+    if not cache:
+        return build_pooled_cube(cube, factor, mode)
+    if factor & (factor - 1):
+        raise ValueError(f"the pyramid cache needs a power-of-2 downsample factor, got {factor}")
+    level = 1
+    while level < factor:
+        level *= 2
+        cube = build_pooled_cube(cube, 2, mode, cache_path=pooled_cube_path(npy_path, level, mode))
+    return cube
+
+
+def _channel_key(channels):
+    """
+    Return the index used to read the selected channels from the cube.
+
+    Contiguous channel lists become a slice so the memmap read stays a single block.
+    """
+    if channels is None:
+        return slice(None)
+    channels = [int(c) for c in channels]
+    if channels == list(range(channels[0], channels[0] + len(channels))):
+        return slice(channels[0], channels[0] + len(channels))
+    return channels
+
+
+def selected_channel_count(n_channels, channels=None, channel_reduce=None):
+    """
+    Number of channels returned by the datasets for a channel selection.
+
+    Parameters
+    ----------
+    n_channels : int
+        Number of channels C of the cube.
+    channels : sequence of int, optional
+        Selected channel (elevation) indices (default: None, all channels).
+    channel_reduce : str, optional
+        Reduction over the selected channels: 'max', 'mean' or None (default: None).
+
+    Returns
+    -------
+    int
+        Number of model input/output channels.
+    """
+    if channel_reduce is not None:
+        if channel_reduce not in CHANNEL_REDUCTIONS:
+            raise ValueError(f"channel_reduce must be one of {CHANNEL_REDUCTIONS}, got {channel_reduce}")
+        return 1
+    if channels is None:
+        return n_channels
+    if any(c < 0 or c >= n_channels for c in channels):
+        raise ValueError(f"channels {tuple(channels)} out of range for a cube with {n_channels} channels")
+    return len(channels)
+
+
+def _read_block(cube, t0, t1, y, x, size_y, size_x, channel_key=slice(None), channel_reduce=None, maxv=85.0):
+    """
+    Read a normalized (T, C, size_y, size_x) block from the cube.
+
+    Azimuth rows beyond H are taken modulo H, read as two slices so the channel
+    index stays the only advanced index of the memmap read.
+    """
+    H = cube.shape[2]
+    if y + size_y <= H:
+        block = cube[t0:t1, channel_key, y:y+size_y, x:x+size_x]
+    else:
+        block = np.concatenate([
+            cube[t0:t1, channel_key, y:H, x:x+size_x],
+            cube[t0:t1, channel_key, 0:y + size_y - H, x:x+size_x],
+        ], axis=2)
+    block = np.maximum(block, 0)
+    if channel_reduce == "max":
+        block = block.max(axis=1, keepdims=True)
+    elif channel_reduce == "mean":
+        block = block.mean(axis=1, keepdims=True)
+    return (block / (maxv + 1e-6)).astype(np.float32)
+
+
 class RadarWindowDataset(Dataset):
     """
     Dataset for loading radar data in sliding window format.
@@ -20,29 +264,125 @@ class RadarWindowDataset(Dataset):
         Number of output time steps.
     maxv : float, optional
         Maximum value for normalization (default: 85.0).
+    channels : sequence of int, optional
+        Channel (elevation) indices to read, e.g. (0, 1, 2) for the lowest three (default: None, all channels).
+    channel_reduce : str, optional
+        Reduce the selected channels to a single composite channel: 'max' or 'mean' (default: None).
+    target_cube : np.ndarray, optional
+        Cube the targets are read from, e.g. the full-resolution cube when ``cube`` is a pooled
+        copy from load_pooled_cube() (default: None, same as ``cube``).
     """
     
-    def __init__(self, cube, seq_in, seq_out, maxv=85.0):
+    def __init__(self, cube, seq_in, seq_out, maxv=85.0, channels=None, channel_reduce=None, target_cube=None):
         self.cube = cube
+        self.target_cube = cube if target_cube is None else target_cube
         self.seq_in = seq_in
         self.seq_out = seq_out
         self.maxv = maxv
+        self.channels = channels
+        self.channel_reduce = channel_reduce
+        self.n_channels = selected_channel_count(cube.shape[1], channels, channel_reduce)
+        self.channel_key = _channel_key(channels)
         self.last = cube.shape[0] - seq_in - seq_out + 1
 
     def __len__(self):
         return self.last
 
+    def _read(self, cube, t0, t1):
+        H, W = cube.shape[2:]
+        return _read_block(cube, t0, t1, 0, 0, H, W, self.channel_key, self.channel_reduce, self.maxv)
+
     def __getitem__(self, i):
-        X = np.maximum(self.cube[i:i+self.seq_in], 0) / (self.maxv + 1e-6)
-        Y = np.maximum(self.cube[i+self.seq_in:i+self.seq_in+self.seq_out], 0) / (self.maxv + 1e-6)
-        X = X.astype(np.float32)
-        Y = Y.astype(np.float32).squeeze(0)
+        X = self._read(self.cube, i, i + self.seq_in)
+        Y = self._read(self.target_cube, i + self.seq_in, i + self.seq_in + self.seq_out).squeeze(0)
         return torch.from_numpy(X), torch.from_numpy(Y)
 
 
+def _build_patch_index(cube, seq_in, seq_out, size, stride, thresh, frac, maxv=85.0, chunk_size=32, wrap_azimuth=False,
+                       channels=None, channel_reduce=None):
+    """
+    Find all (t, y, x) patch positions whose target frames have enough pixels above a threshold.
+
+    The count of pixels above the threshold is computed once per frame and summed over
+    patches with an integral image, so every frame of the cube is read only once.
+    With wrap_azimuth, patch rows are taken modulo H so patches may cross the 0°/360° seam.
+
+    Parameters
+    ----------
+    cube : np.ndarray
+        Radar data cube of shape (T, C, H, W) in original scale.
+    seq_in : int
+        Number of input time steps.
+    seq_out : int
+        Number of output time steps.
+    size : int
+        Patch size.
+    stride : int
+        Stride between patch positions.
+    thresh : float
+        Threshold in dBZ.
+    frac : float
+        Minimum fraction of target pixels above threshold.
+    maxv : float, optional
+        Maximum value for normalization (default: 85.0).
+    chunk_size : int, optional
+        Number of windows processed at once (default: 32).
+    wrap_azimuth : bool, optional
+        Whether patch positions may wrap around the azimuth (H) axis (default: False).
+    channels : sequence of int, optional
+        Channel indices used for the threshold test (default: None, all channels).
+    channel_reduce : str, optional
+        Channel reduction applied before the threshold test: 'max', 'mean' or None (default: None).
+
+    Returns
+    -------
+    tuple
+        (list of (t, y, x) tuples, number of positions checked).
+    """
+    T, C, H, W = cube.shape
+    C = selected_channel_count(C, channels, channel_reduce)
+    channel_key = _channel_key(channels)
+    last = T - seq_in - seq_out + 1
+    ys = np.arange(0, H if wrap_azimuth else H - size + 1, stride)
+    xs = np.arange(0, W - size + 1, stride)
+    # Rows y .. y+size-1 modulo H sum to I[(y+size) % H] - I[y] + I[H] when the patch wraps
+    if wrap_azimuth:
+        y1, wraps = (ys + size) % H, (ys + size) // H
+    else:
+        y1, wraps = ys + size, np.zeros_like(ys)
+    y0, y1, wraps = ys[:, None], y1[:, None], wraps[:, None]
+    x0, x1 = xs[None, :], xs[None, :] + size
+    thresh_normalized = thresh / (maxv + 1e-6)
+    total_pix = seq_out * C * size * size
+    patches = []
+    for start in tqdm(range(0, last, chunk_size), desc='Extracting patches'):
+        stop = min(start + chunk_size, last)
+        frames = _read_block(cube, start + seq_in, stop + seq_in + seq_out - 1, 0, 0, H, W,
+                             channel_key, channel_reduce, maxv)
+        above = (frames > thresh_normalized).sum(axis=1, dtype=np.int64)
+        csum_t = np.concatenate([np.zeros((1, H, W), dtype=np.int64), np.cumsum(above, axis=0)])
+        counts = csum_t[seq_out:] - csum_t[:-seq_out]
+        integral = np.zeros((len(counts), H + 1, W + 1), dtype=np.int64)
+        integral[:, 1:, 1:] = counts.cumsum(axis=1).cumsum(axis=2)
+        rows_x1 = integral[:, y1, x1] - integral[:, y0, x1] + wraps * integral[:, H, x1]
+        rows_x0 = integral[:, y1, x0] - integral[:, y0, x0] + wraps * integral[:, H, x0]
+        n_above = rows_x1 - rows_x0
+        tt, yy, xx = np.nonzero(n_above / total_pix >= frac)
+        patches.extend(zip((tt + start).tolist(), ys[yy].tolist(), xs[xx].tolist()))
+    return patches, last * len(ys) * len(xs)
+
+
 class PatchRadarWindowDataset(Dataset):
     """
     Dataset for loading radar data in patch-based format.
+
+    In the default grid mode, patches of ``patch_size`` are taken at fixed positions every
+    ``patch_stride`` pixels. In random-crop mode (``random_crop=True``), the index stores
+    qualifying regions of ``region_size`` and each ``__getitem__`` reads a randomly placed
+    crop of the current crop size inside its region, so every epoch sees different crops.
+    Inside DataLoader workers, the crops of each batch are drawn from a generator seeded by the
+    loader and the position of the batch in the epoch (see __getitems__()), so that a resumed
+    epoch gets the same crops as the interrupted one.
     
     Parameters
     ----------
@@ -64,10 +404,27 @@ class PatchRadarWindowDataset(Dataset):
         Path to save/load patch indices (default: None).
     maxv : float, optional
         Maximum value for normalization (default: 85.0).
+    random_crop : bool, optional
+        Whether to sample random crops inside qualifying regions (default: False).
+    crop_sizes : tuple of int, optional
+        Crop sizes for random-crop mode, used in ascending order by set_epoch() for
+        progressive resizing (default: (patch_size,)).
+    region_size : int, optional
+        Size of the regions stored in the index in random-crop mode
+        (default: max(crop_sizes) + patch_stride).
+    wrap_azimuth : bool, optional
+        Whether patches may cross the 0°/360° azimuth seam. Azimuth rows are then read
+        with a modular index, without building a wrapped copy of the frames (default: False).
+    channels : sequence of int, optional
+        Channel (elevation) indices to read, e.g. (0, 1, 2) for the lowest three (default: None, all channels).
+    channel_reduce : str, optional
+        Reduce the selected channels to a single composite channel: 'max' or 'mean' (default: None).
     """
     
     def __init__(self, cube, seq_in, seq_out, patch_size=64, patch_stride=64, 
-                 patch_thresh=35, patch_frac=0.01, patch_index_path=None, maxv=85.0):
+                 patch_thresh=35, patch_frac=0.01, patch_index_path=None, maxv=85.0,
+                 random_crop=False, crop_sizes=None, region_size=None, wrap_azimuth=False,
+                 channels=None, channel_reduce=None):
         self.cube = cube
         self.seq_in = seq_in
         self.seq_out = seq_out
@@ -76,32 +433,42 @@ class PatchRadarWindowDataset(Dataset):
         self.patch_thresh = patch_thresh
         self.patch_frac = patch_frac
         self.maxv = maxv
+        self.random_crop = random_crop
+        self.wrap_azimuth = wrap_azimuth
+        self.channels = channels
+        self.channel_reduce = channel_reduce
+        self.n_channels = selected_channel_count(cube.shape[1], channels, channel_reduce)
+        self.channel_key = _channel_key(channels)
+        self.crop_sizes = tuple(sorted(crop_sizes)) if crop_sizes else (patch_size,)
+        self.region_size = region_size or (max(self.crop_sizes) + patch_stride)
+        self.crop_size = self.crop_sizes[0]
+        # Position in the epoch of the first batch the workers load, set when an epoch is resumed
+        self.first_batch = 0
+        self._worker_batches = 0
         self.patches = []
         
         T, C, H, W = cube.shape
-        last = T - seq_in - seq_out + 1
-        
-        patch_thresh_normalized = self.patch_thresh / (self.maxv + 1e-6)
+        if random_crop:
+            self.region_size = min(self.region_size, H, W)
+            if max(self.crop_sizes) > self.region_size:
+                raise ValueError(f"crop sizes {self.crop_sizes} must not exceed region_size {self.region_size}")
+        index_size = self.region_size if random_crop else patch_size
         
-        if patch_index_path is not None and os.path.exists(patch_index_path):
+        # Saved next to the index; an index computed with other parameters is rebuilt
+        index_meta = {"shape": list(cube.shape), "seq_in": seq_in, "seq_out": seq_out, "size": index_size,
+                      "stride": patch_stride, "thresh": float(patch_thresh), "frac": float(patch_frac),
+                      "wrap_azimuth": bool(wrap_azimuth), "channels": None if channels is None else [int(c) for c in channels],
+                      "channel_reduce": channel_reduce}
+        cached = None if patch_index_path is None else load_npy_cache(patch_index_path, index_meta, allow_pickle=True)
+        if cached is not None:
             print(f"Loading patch indices from {patch_index_path}")
-            self.patches = np.load(patch_index_path, allow_pickle=True).tolist()
+            self.patches = cached.tolist()
         else:
-            total_patches_checked = 0
-            patches_found = 0
-            for t in tqdm(range(last), desc='Extracting patches'):
-                for y in range(0, H - patch_size + 1, patch_stride):
-                    for x in range(0, W - patch_size + 1, patch_stride):
-                        if y + patch_size <= H and x + patch_size <= W:
-                            total_patches_checked += 1
-                            Y_patch = np.maximum(
-                                cube[t+seq_in:t+seq_in+seq_out, :, y:y+patch_size, x:x+patch_size], 0
-                            ) / (maxv + 1e-6)
-                            total_pix = Y_patch.size
-                            n_above = (Y_patch > patch_thresh_normalized).sum()
-                            if n_above / total_pix >= patch_frac:
-                                self.patches.append((t, y, x))
-                                patches_found += 1
+            self.patches, total_patches_checked = _build_patch_index(
+                cube, seq_in, seq_out, index_size, patch_stride, patch_thresh, patch_frac, maxv=maxv,
+                wrap_azimuth=wrap_azimuth, channels=channels, channel_reduce=channel_reduce
+            )
+            patches_found = len(self.patches)
             
             print(f"Patch extraction summary:")
             print(f"  Total patches checked: {total_patches_checked}")
@@ -114,20 +481,125 @@ class PatchRadarWindowDataset(Dataset):
                 print(f"  - Checking if data has enough high-intensity regions")
             
             if patch_index_path is not None:
-                np.save(patch_index_path, np.array(self.patches, dtype=object))
+                save_npy_atomic(patch_index_path, np.array(self.patches, dtype=object), meta=index_meta)
                 print(f"Saved patch indices to {patch_index_path}")
 
+    def set_crop_size(self, size):
+        """
+        Set the crop size returned in random-crop mode.
+
+        Parameters
+        ----------
+        size : int
+            Crop size, at most region_size.
+        """
+        if size > self.region_size:
+            raise ValueError(f"crop size {size} exceeds region_size {self.region_size}")
+        self.crop_size = size
+
+    def set_epoch(self, epoch, total_epochs):
+        """
+        Select the crop size for an epoch of a progressive-resizing schedule.
+
+        The epochs are split into len(crop_sizes) equal stages that use the crop sizes
+        in ascending order.
+
+        Parameters
+        ----------
+        epoch : int
+            Current epoch (1-based).
+        total_epochs : int
+            Last epoch of the run.
+        """
+        stage = (max(epoch, 1) - 1) * len(self.crop_sizes) // max(total_epochs, 1)
+        self.set_crop_size(self.crop_sizes[min(stage, len(self.crop_sizes) - 1)])
+
     def __len__(self):
         return len(self.patches)
 
+    def _read(self, t0, t1, y, x, size):
+        return _read_block(self.cube, t0, t1, y, x, size, size, self.channel_key, self.channel_reduce, self.maxv)
+
     def __getitem__(self, i):
+        return self._load(i)
+
+    def __getitems__(self, indices):
+        """
+        Load the samples of a batch.
+
+        In random-crop mode inside a DataLoader worker, the crop offsets of the batch are drawn
+        from a generator seeded with the base seed of the loader and the position of the batch
+        in the epoch. The workers receive the batches round-robin, so the position follows from
+        the worker id and the number of batches the worker has loaded since first_batch. The
+        crops then do not depend on which worker loads a batch or on the batches skipped when an
+        epoch is resumed. The workers must be restarted every epoch (persistent_workers=False).
+        In the main process, the crops use the global torch generator as in __getitem__.
+
+        Parameters
+        ----------
+        indices : list of int
+            Indices of the samples of the batch.
+
+        Returns
+        -------
+        list of tuple
+            Samples as returned by __getitem__.
+        """
+        info = get_worker_info()
+        if not self.random_crop or info is None:
+            return [self._load(i) for i in indices]
+        batch = self.first_batch + info.id + self._worker_batches * info.num_workers
+        self._worker_batches += 1
+        generator = torch.Generator().manual_seed(hash((info.seed - info.id, batch)) % 2**63)
+        return [self._load(i, generator) for i in indices]
+
+    def _load(self, i, generator=None):
         t, y, x = self.patches[i]
-        X_patch = np.maximum(
-            self.cube[t:t+self.seq_in, :, y:y+self.patch_size, x:x+self.patch_size], 0
-        ) / (self.maxv + 1e-6)
-        Y_patch = np.maximum(
-            self.cube[t+self.seq_in:t+self.seq_in+self.seq_out, :, y:y+self.patch_size, x:x+self.patch_size], 0
-        ) / (self.maxv + 1e-6)
-        X_patch = X_patch.astype(np.float32)
-        Y_patch = Y_patch.astype(np.float32).squeeze(0)
-        return torch.from_numpy(X_patch), torch.from_numpy(Y_patch), t, y, x 
\ No newline at end of file
+        size = self.patch_size
+        if self.random_crop:
+            size = self.crop_size
+            y += int(torch.randint(0, self.region_size - size + 1, (1,), generator=generator))
+            x += int(torch.randint(0, self.region_size - size + 1, (1,), generator=generator))
+            y %= self.cube.shape[2]
+        X_patch = self._read(t, t + self.seq_in, y, x, size)
+        Y_patch = self._read(t + self.seq_in, t + self.seq_in + self.seq_out, y, x, size).squeeze(0)
+        return torch.from_numpy(X_patch), torch.from_numpy(Y_patch), t, y, x
+
+
+class SyntheticWindowDataset(Dataset):
+    """
+    Random windows with the shapes of RadarWindowDataset, for benchmarks without radar data.
+
+    Parameters
+    ----------
+    length : int
+        Number of windows.
+    seq_in : int
+        Number of input time steps.
+    seq_out : int
+        Number of output time steps.
+    channels : int
+        Number of channels.
+    height : int
+        Frame height.
+    width : int
+        Frame width.
+    seed : int, optional
+        Base seed; window i is drawn with seed + i (default: 0).
+    """
+
+    def __init__(self, length, seq_in, seq_out, channels, height, width, seed=0):
+        self.length = length
+        self.seq_in = seq_in
+        self.seq_out = seq_out
+        self.shape = (channels, height, width)
+        self.seed = seed
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        g = torch.Generator().manual_seed(self.seed + i)
+        X = torch.rand((self.seq_in, *self.shape), generator=g)
+        Y = torch.rand((self.seq_out, *self.shape), generator=g).squeeze(0)
+        return X, Y
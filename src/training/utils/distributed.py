@@ -0,0 +1,78 @@
+import os
+import torch
+import torch.distributed as dist
+
+
+def init_distributed(device="cpu", backend="gloo", num_threads=None):
+    """
+    Join the process group described by the torchrun environment (RANK, WORLD_SIZE, ...).
+
+    Launch with e.g. ``torchrun --standalone --nproc_per_node=4 <script> train --distributed True``.
+    On CPU each process gets an equal share of the cores for its intra-op threads, since
+    torchrun otherwise limits every process to one thread.
+
+    Parameters
+    ----------
+    device : str, optional
+        Requested device; 'cuda' is mapped to the GPU of the local rank (default: 'cpu').
+    backend : str, optional
+        torch.distributed backend (default: 'gloo').
+    num_threads : int, optional
+        Intra-op threads per process on CPU (default: CPU count // processes per node).
+
+    Returns
+    -------
+    tuple
+        (rank, world_size, device) of this process.
+    """
+    if "RANK" not in os.environ or "WORLD_SIZE" not in os.environ:
+        raise RuntimeError("Distributed training needs the torchrun environment (RANK, WORLD_SIZE); launch the script with torchrun")
+    if not dist.is_available():
+        raise RuntimeError("torch.distributed is not available in this PyTorch build")
+    local_rank = int(os.environ.get("LOCAL_RANK", 0))
+    local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", 1))
+    if not dist.is_initialized():
+        dist.init_process_group(backend=backend)
+    rank, world_size = dist.get_rank(), dist.get_world_size()
+    if torch.device(device).type == "cuda":
+        device = f"cuda:{local_rank}"
+        torch.cuda.set_device(device)
+    else:
+        num_threads = num_threads or max(1, (os.cpu_count() or 1) // local_world_size)
+        torch.set_num_threads(num_threads)
+    if rank == 0:
+        print(f"Distributed training: backend={backend}, world_size={world_size}, device={device}, threads/process={torch.get_num_threads()}")
+    return rank, world_size, device
+
+
+def cleanup_distributed():
+    """Leave the process group, if one was initialized."""
+    if dist.is_available() and dist.is_initialized():
+        dist.destroy_process_group()
+
+
+def barrier():
+    """Wait for all processes; no-op without a process group."""
+    if dist.is_available() and dist.is_initialized():
+        dist.barrier()
+
+
+def all_reduce_sum(value):
+    """
+    Sum a Python number over all processes.
+
+    Parameters
+    ----------
+    value : float or int
+        Local value.
+
+    Returns
+    -------
+    float
+        Sum over all processes (the local value without a process group).
+    """
+    if not (dist.is_available() and dist.is_initialized()):
+        return value
+    t = torch.tensor(value, dtype=torch.float64)
+    dist.all_reduce(t, op=dist.ReduceOp.SUM)
+    return t.item()
@@ -0,0 +1,242 @@
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+import torch
+from torch.profiler import profile, schedule, ProfilerActivity
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+STEP_PHASES = ("data", "forward", "backward", "optimizer", "metrics")
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB (None if unavailable).
+
+    Returns
+    -------
+    float or None
+        Peak RSS in MB.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class StepTimer:
+    """
+    Per-step timing of the training/validation loop, written as JSON lines.
+
+    Each step is split into the phases data (waiting for the DataLoader and copying to the
+    device), forward, backward, optimizer and metrics by calling lap() after each of them;
+    end_step() writes one record with the phase times in ms, samples/s and the peak RSS.
+    On CUDA the device is synchronized at every lap so that kernel time is attributed to the
+    right phase. When disabled, all methods return immediately.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        JSONL file the step records are appended to.
+    enabled : bool, optional
+        Whether to record timings (default: False).
+    device : str or torch.device, optional
+        Device the loop runs on (default: 'cpu').
+    """
+
+    def __init__(self, path, enabled=False, device="cpu"):
+        self.enabled = enabled
+        self.path = path
+        self.sync = enabled and torch.device(device).type == "cuda"
+        self.epoch = None
+        self._file = None
+        self._epoch_sums = defaultdict(lambda: defaultdict(float))
+
+    def begin(self, phase):
+        """
+        Start timing a loop over the DataLoader.
+
+        Parameters
+        ----------
+        phase : str
+            Loop name recorded with each step, e.g. 'train' or 'val'.
+        """
+        if not self.enabled:
+            return
+        if self._file is None:
+            self._file = open(self.path, "a", buffering=1)
+        self.phase = phase
+        self.step = 0
+        self._laps = dict.fromkeys(STEP_PHASES, 0.0)
+        self._step_start = self._last = time.perf_counter()
+
+    def lap(self, name):
+        """
+        Attribute the time since the previous lap to a step phase.
+
+        Parameters
+        ----------
+        name : str
+            One of 'data', 'forward', 'backward', 'optimizer', 'metrics'.
+        """
+        if not self.enabled:
+            return
+        if self.sync:
+            torch.cuda.synchronize()
+        now = time.perf_counter()
+        self._laps[name] += now - self._last
+        self._last = now
+
+    def end_step(self, batch_size):
+        """
+        Write the record of the current step and start the next one.
+
+        Parameters
+        ----------
+        batch_size : int
+            Number of samples in the step.
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        step_time = now - self._step_start
+        record = {
+            "epoch": self.epoch,
+            "phase": self.phase,
+            "step": self.step,
+            "batch_size": int(batch_size),
+            **{f"{k}_ms": v * 1e3 for k, v in self._laps.items()},
+            "step_ms": step_time * 1e3,
+            "samples_per_sec": batch_size / step_time if step_time > 0 else None,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        self._file.write(json.dumps(record) + "\n")
+        sums = self._epoch_sums[self.phase]
+        for k, v in self._laps.items():
+            sums[f"{k}_ms"] += v * 1e3
+        sums["step_ms"] += step_time * 1e3
+        sums["samples"] += batch_size
+        sums["steps"] += 1
+        self.step += 1
+        self._laps = dict.fromkeys(STEP_PHASES, 0.0)
+        self._step_start = self._last = now
+
+    def record(self, name, seconds):
+        """
+        Write a record of a timed section outside the steps, e.g. the final metric computation.
+
+        Parameters
+        ----------
+        name : str
+            Section name.
+        seconds : float
+            Duration in seconds.
+        """
+        if not self.enabled:
+            return
+        self._file.write(json.dumps({"epoch": self.epoch, "phase": self.phase, "section": name, "ms": seconds * 1e3}) + "\n")
+        self._epoch_sums[self.phase][f"{name}_total_ms"] += seconds * 1e3
+
+    def epoch_summary(self):
+        """
+        Mean step timings per loop since the previous call.
+
+        Returns
+        -------
+        dict
+            {phase: {'data_ms': ..., ..., 'step_ms': ..., 'samples_per_sec': ..., 'peak_rss_mb': ...}},
+            plus '{name}_total_ms' of sections from record(); empty when disabled.
+        """
+        summary = {}
+        for phase, sums in self._epoch_sums.items():
+            steps = max(sums["steps"], 1)
+            summary[phase] = {k: (v if k.endswith("_total_ms") else v / steps) for k, v in sums.items() if k.endswith("_ms")}
+            summary[phase]["samples_per_sec"] = sums["samples"] / (sums["step_ms"] / 1e3) if sums["step_ms"] > 0 else None
+            summary[phase]["peak_rss_mb"] = peak_rss_mb()
+        self._epoch_sums.clear()
+        return summary
+
+    def close(self):
+        """Close the JSONL file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class StepProfiler:
+    """
+    torch.profiler over a range of loop steps, exported as a Chrome trace and operator tables.
+
+    Steps [start, stop) are recorded with CPU activity (plus CUDA on GPU), input shapes,
+    memory and Python stacks. When the window closes, trace{suffix}.json (open in
+    chrome://tracing or Perfetto) and the tables ops{suffix}.txt (by operator),
+    ops_by_shape{suffix}.txt and ops_by_stack{suffix}.txt (by calling Python code) are
+    written to out_dir. Without steps, all methods return immediately.
+
+    Parameters
+    ----------
+    out_dir : str or pathlib.Path
+        Directory of the exported files.
+    steps : tuple of int, optional
+        Step range (start, stop), counted from 0 (default: None, profiling disabled).
+    device : str or torch.device, optional
+        Device the loop runs on (default: 'cpu').
+    suffix : str, optional
+        Suffix of the file names, e.g. '_rank1' (default: '').
+    row_limit : int, optional
+        Number of operators per table (default: 50).
+    """
+
+    def __init__(self, out_dir, steps=None, device="cpu", suffix="", row_limit=50):
+        self.enabled = steps is not None
+        self._prof = None
+        if not self.enabled:
+            return
+        start, stop = steps
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.suffix = suffix
+        self.row_limit = row_limit
+        activities = [ProfilerActivity.CPU]
+        if torch.device(device).type == "cuda":
+            activities.append(ProfilerActivity.CUDA)
+        # One warmup step before the window (if there is one) keeps profiler start-up out of the trace
+        warmup = 1 if start > 0 else 0
+        self._prof = profile(
+            activities=activities,
+            schedule=schedule(wait=start - warmup, warmup=warmup, active=stop - start, repeat=1),
+            on_trace_ready=self._export,
+            record_shapes=True,
+            profile_memory=True,
+            with_stack=True,
+        )
+        self._prof.start()
+
+    def step(self):
+        """Mark the end of a loop step."""
+        if self._prof is not None:
+            self._prof.step()
+
+    def _export(self, prof):
+        trace_path = self.out_dir / f"trace{self.suffix}.json"
+        prof.export_chrome_trace(str(trace_path))
+        sort_by = "self_cuda_time_total" if ProfilerActivity.CUDA in prof.activities else "self_cpu_time_total"
+        tables = {
+            "ops": prof.key_averages(),
+            "ops_by_shape": prof.key_averages(group_by_input_shape=True),
+            "ops_by_stack": prof.key_averages(group_by_stack_n=5),
+        }
+        for name, averages in tables.items():
+            with open(self.out_dir / f"{name}{self.suffix}.txt", "w") as f:
+                f.write(averages.table(sort_by=sort_by, row_limit=self.row_limit))
+        print(f"Profiler trace and operator tables saved to {self.out_dir}")
+
+    def close(self):
+        """Stop the profiler; exports the window if it is still open."""
+        if self._prof is not None:
+            self._prof.stop()
+            self._prof = None
@@ -0,0 +1,286 @@
+import numpy as np
+import torch
+from torch.utils.data import Sampler
+from torch.utils.data.distributed import DistributedSampler
+from tqdm import tqdm
+
+from .dataloaders import save_npy_atomic, load_npy_cache, _channel_key
+from .training_utils import set_rng_state
+
+
+def compute_frame_intensity_fractions(cube, thresholds=(35.0, 45.0), chunk_size=32, score_path=None,
+                                      channels=None, channel_reduce=None):
+    """
+    Compute, for every frame, the fraction of pixels above each reflectivity threshold.
+
+    Parameters
+    ----------
+    cube : np.ndarray
+        Radar data cube of shape (T, C, H, W) in dBZ (may be a memmap).
+    thresholds : tuple of float, optional
+        Reflectivity thresholds in dBZ (default: (35.0, 45.0)).
+    chunk_size : int, optional
+        Number of frames read from the cube at once (default: 32).
+    score_path : str, optional
+        Path to save/load the fractions as .npy (default: None). The thresholds, channel
+        selection and cube shape are saved next to it, and a cache computed with others is recomputed.
+    channels : sequence of int, optional
+        Channel (elevation) indices that are scored (default: None, all channels).
+    channel_reduce : str, optional
+        Reduction of the selected channels before scoring: 'max', 'mean' or None (default: None).
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (T, len(thresholds)) with per-frame fractions.
+    """
+    T = cube.shape[0]
+    meta = {"thresholds": [float(th) for th in thresholds], "shape": list(cube.shape),
+            "channels": None if channels is None else [int(c) for c in channels], "channel_reduce": channel_reduce}
+    channel_key = _channel_key(channels)
+    if score_path is not None:
+        fractions = load_npy_cache(score_path, meta)
+        if fractions is not None:
+            print(f"Loading frame intensity scores from {score_path}")
+            return fractions
+    fractions = np.zeros((T, len(thresholds)), dtype=np.float32)
+    for start in tqdm(range(0, T, chunk_size), desc='Scoring frames'):
+        frames = np.asarray(cube[start:start + chunk_size, channel_key])
+        if channel_reduce == "max":
+            frames = frames.max(axis=1, keepdims=True)
+        elif channel_reduce == "mean":
+            frames = frames.mean(axis=1, keepdims=True)
+        for k, th in enumerate(thresholds):
+            fractions[start:start + len(frames), k] = (frames > th).mean(axis=(1, 2, 3))
+    if score_path is not None:
+        save_npy_atomic(score_path, fractions, meta=meta)
+        print(f"Saved frame intensity scores to {score_path}")
+    return fractions
+
+
+def compute_window_intensity_scores(frame_fractions, window_starts, seq_in, seq_out):
+    """
+    Aggregate per-frame fractions into per-window scores over the target frames.
+
+    Parameters
+    ----------
+    frame_fractions : np.ndarray
+        Per-frame fractions of shape (T, K) from compute_frame_intensity_fractions().
+    window_starts : sequence of int
+        Start index t of each window (input frames t .. t+seq_in-1).
+    seq_in : int
+        Number of input time steps.
+    seq_out : int
+        Number of output time steps.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (len(window_starts),) with the summed per-threshold fractions,
+        averaged over the target frames of each window.
+    """
+    starts = np.asarray(window_starts, dtype=np.int64)
+    per_frame = frame_fractions.sum(axis=1)
+    cumsum = np.concatenate([[0.0], np.cumsum(per_frame, dtype=np.float64)])
+    first = starts + seq_in
+    return ((cumsum[first + seq_out] - cumsum[first]) / seq_out).astype(np.float32)
+
+
+class EventWeightedSampler(Sampler):
+    """
+    Importance sampler that draws storm-heavy windows more often than dry ones.
+
+    Each window i is drawn with probability proportional to
+    ``(score_i / max(score) + floor) ** (1 / temperature)``. Windows with a score of
+    zero (no pixel above the lowest threshold) are considered dry; only a random
+    ``dry_keep`` fraction of them is eligible in each epoch.
+
+    For distributed training, every process draws the same indices from a generator seeded
+    with ``seed + epoch`` (see set_epoch()) and keeps every ``num_replicas``-th of them.
+
+    Parameters
+    ----------
+    scores : np.ndarray
+        Per-window intensity scores, one per dataset item.
+    temperature : float, optional
+        Values > 1 flatten the distribution towards uniform, values < 1 sharpen it (default: 1.0).
+    floor : float, optional
+        Additive floor on the normalized score so weak windows keep a non-zero weight (default: 0.01).
+    dry_keep : float, optional
+        Fraction of dry windows eligible per epoch, between 0 and 1 (default: 1.0).
+    num_samples : int, optional
+        Number of indices drawn per epoch (default: number of eligible windows).
+    generator : torch.Generator, optional
+        Random generator used for sampling (default: None).
+    num_replicas : int, optional
+        Number of distributed processes sharing the draw (default: 1).
+    rank : int, optional
+        Rank of this process (default: 0).
+    seed : int, optional
+        Seed of the shared draw when num_replicas > 1 (default: 0).
+    """
+
+    def __init__(self, scores, temperature=1.0, floor=0.01, dry_keep=1.0, num_samples=None, generator=None,
+                 num_replicas=1, rank=0, seed=0):
+        if temperature <= 0:
+            raise ValueError(f"temperature must be positive, got {temperature}")
+        if not 0.0 <= dry_keep <= 1.0:
+            raise ValueError(f"dry_keep must be between 0 and 1, got {dry_keep}")
+        scores = np.asarray(scores, dtype=np.float64)
+        if scores.ndim != 1 or len(scores) == 0:
+            raise ValueError("scores must be a non-empty 1D array")
+        self.scores = scores
+        self.temperature = temperature
+        self.floor = floor
+        self.dry_keep = dry_keep
+        self.generator = generator
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.seed = seed
+        self.epoch = 0
+        self.dry = torch.from_numpy(scores <= 0)
+        max_score = scores.max()
+        normalized = scores / max_score if max_score > 0 else scores
+        self.weights = torch.from_numpy((normalized + floor) ** (1.0 / temperature))
+        n_dry = int(self.dry.sum())
+        self.n_dry_kept = int(round(n_dry * dry_keep))
+        self.num_samples = num_samples if num_samples is not None else len(scores) - n_dry + self.n_dry_kept
+        if self.num_samples <= 0:
+            raise ValueError("num_samples must be positive; no eligible windows left after dry-window subsampling")
+        # Equal number of samples on every process, so all of them run the same number of steps
+        self.samples_per_replica = -(-self.num_samples // num_replicas)
+        print(f"Event sampler: windows={len(scores)}, dry={n_dry}, dry_kept={self.n_dry_kept}, samples/epoch={self.num_samples}")
+
+    def set_epoch(self, epoch):
+        """Set the epoch of the shared distributed draw."""
+        self.epoch = epoch
+
+    def _epoch_weights(self, generator):
+        weights = self.weights.clone()
+        dry_idx = torch.nonzero(self.dry).flatten()
+        if len(dry_idx) > self.n_dry_kept:
+            perm = torch.randperm(len(dry_idx), generator=generator)
+            weights[dry_idx[perm[self.n_dry_kept:]]] = 0.0
+        return weights
+
+    def __iter__(self):
+        if self.num_replicas == 1:
+            idx = torch.multinomial(self._epoch_weights(self.generator), self.num_samples, replacement=True, generator=self.generator)
+            return iter(idx.tolist())
+        generator = torch.Generator().manual_seed(self.seed + self.epoch)
+        idx = torch.multinomial(self._epoch_weights(generator), self.samples_per_replica * self.num_replicas,
+                                replacement=True, generator=generator)
+        return iter(idx[self.rank::self.num_replicas].tolist())
+
+    def __len__(self):
+        return self.samples_per_replica
+
+
+def build_train_sampler(name, cube, seq_in, seq_out, window_starts, *, temperature=1.0, dry_keep=1.0,
+                        num_samples=None, thresholds=(35.0, 45.0), score_path=None, num_replicas=1, rank=0,
+                        channels=None, channel_reduce=None):
+    """
+    Build the training sampler selected on the command line.
+
+    Parameters
+    ----------
+    name : str
+        Sampler name: 'sequential' (no sampler, iterate in order) or 'event'.
+    cube : np.ndarray
+        Radar data cube of shape (T, C, H, W) in dBZ.
+    seq_in : int
+        Number of input time steps.
+    seq_out : int
+        Number of output time steps.
+    window_starts : sequence of int
+        Start index t of the window behind each item of the training dataset.
+    temperature : float, optional
+        Sampling temperature for EventWeightedSampler (default: 1.0).
+    dry_keep : float, optional
+        Fraction of dry windows eligible per epoch (default: 1.0).
+    num_samples : int, optional
+        Number of samples per epoch (default: number of eligible windows).
+    thresholds : tuple of float, optional
+        Reflectivity thresholds in dBZ used for scoring (default: (35.0, 45.0)).
+    score_path : str, optional
+        Path to cache per-frame intensity fractions (default: None).
+    num_replicas : int, optional
+        Number of distributed processes (default: 1).
+    rank : int, optional
+        Rank of this process (default: 0).
+    channels : sequence of int, optional
+        Channel indices scored for the 'event' sampler (default: None, all channels).
+    channel_reduce : str, optional
+        Reduction of the scored channels: 'max', 'mean' or None (default: None).
+
+    Returns
+    -------
+    EventWeightedSampler, DistributedSampler or None
+        Sampler to pass to the DataLoader, or None for sequential iteration in a single process.
+        With several processes, 'sequential' splits the time-ordered windows with a
+        DistributedSampler (no shuffling) and 'event' shares one draw between the processes.
+    """
+    if name == "sequential":
+        if num_replicas > 1:
+            return DistributedSampler(range(len(window_starts)), num_replicas=num_replicas, rank=rank, shuffle=False)
+        return None
+    if name != "event":
+        raise ValueError(f"Unknown sampler: {name}")
+    fractions = compute_frame_intensity_fractions(cube, thresholds=thresholds, score_path=score_path,
+                                                  channels=channels, channel_reduce=channel_reduce)
+    scores = compute_window_intensity_scores(fractions, window_starts, seq_in, seq_out)
+    return EventWeightedSampler(scores, temperature=temperature, dry_keep=dry_keep, num_samples=num_samples,
+                                num_replicas=num_replicas, rank=rank)
+
+
+class ResumableSampler(Sampler):
+    """
+    Wraps the sampler of the training DataLoader so that an epoch can continue mid-way.
+
+    After resume(skip, rng_state), the next iteration draws the epoch's indices from the
+    wrapped sampler as usual, drops the first `skip` of them without loading their data, and
+    then restores the generator states of the checkpoint, so that random crops and the like
+    continue as in the interrupted epoch. Later iterations are not affected.
+
+    Parameters
+    ----------
+    sampler : Sampler or sequence
+        Wrapped sampler, e.g. an EventWeightedSampler, DistributedSampler or range(len(dataset)).
+    """
+
+    def __init__(self, sampler):
+        self.sampler = sampler
+        self._skip = 0
+        self._rng_state = None
+
+    def set_epoch(self, epoch):
+        """Forward the epoch to the wrapped sampler."""
+        if hasattr(self.sampler, "set_epoch"):
+            self.sampler.set_epoch(epoch)
+
+    def resume(self, skip, rng_state=None):
+        """
+        Skip the first indices of the next iteration.
+
+        Parameters
+        ----------
+        skip : int
+            Number of indices (batches done * batch size) to drop.
+        rng_state : dict, optional
+            Generator states from get_rng_state(), restored after skipping (default: None).
+        """
+        self._skip = skip
+        self._rng_state = rng_state
+
+    def __iter__(self):
+        skip, rng_state = self._skip, self._rng_state
+        self._skip, self._rng_state = 0, None
+        it = iter(self.sampler)
+        for _ in range(skip):
+            next(it, None)
+        if rng_state is not None:
+            set_rng_state(rng_state)
+        yield from it
+
+    def __len__(self):
+        return len(self.sampler)
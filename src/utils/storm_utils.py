@@ -9,84 +9,194 @@ import os
 from scipy.signal import correlate2d
 from scipy.optimize import minimize_scalar
 
-def compute_csi_hss(pred, target, threshold):
+B_MSE_EDGES = (2.0, 5.0, 10.0, 30.0, 45.0)
+B_MSE_WEIGHTS = (1.0, 2.0, 5.0, 10.0, 30.0, 45.0)
+DEFAULT_THRESHOLDS = (2, 5, 10, 30, 45)
+DEFAULT_RANGES = ((0, 20), (20, 35), (35, 45), (45, 100))
+
+def joint_histogram(pred, target, bin_width=1.0, max_dbz=90.0, scale=1.0, chunk_size=16):
     """
-    Compute Critical Success Index (CSI) and Heidke Skill Score (HSS) for a given threshold.
-    
+    Accumulate the joint histogram of (predicted dBZ bin, target dBZ bin) in a single pass.
+
+    Bin k holds values in [k * bin_width, (k + 1) * bin_width); values below 0 fall in the
+    first bin and values above max_dbz in the last one. Besides the joint counts, the sum of
+    squared errors is kept per target bin, so that MSE, MSE-by-range and B-MSE can be derived
+    exactly from the histogram by metrics_from_histogram().
+
     Parameters
     ----------
     pred : np.ndarray
-        Predicted values in dBZ.
+        Predicted values in dBZ, any shape (may be a memmap).
     target : np.ndarray
-        Ground truth values in dBZ.
-    threshold : float
-        Threshold in dBZ to convert to binary (0/1).
-    
+        Ground truth values in dBZ, same shape as pred.
+    bin_width : float, optional
+        Width of the dBZ bins (default: 1.0).
+    max_dbz : float, optional
+        Start of the last, open-ended bin in dBZ (default: 90.0).
+    scale : float, optional
+        Factor applied to both arrays before binning, e.g. maxv + eps for normalized inputs (default: 1.0).
+    chunk_size : int, optional
+        Number of entries along the first axis processed at once (default: 16).
+
     Returns
     -------
-    tuple
-        (CSI, HSS) scores.
+    dict
+        Histogram with keys 'counts' (n_bins, n_bins) indexed [pred_bin, target_bin],
+        'sq_err_sum' (n_bins,) per target bin, and 'bin_width'.
     """
-    pred_binary = (pred >= threshold).astype(int)
-    target_binary = (target >= threshold).astype(int)
-    
-    TP = np.sum((pred_binary == 1) & (target_binary == 1))
-    FN = np.sum((pred_binary == 0) & (target_binary == 1))
-    FP = np.sum((pred_binary == 1) & (target_binary == 0))
-    TN = np.sum((pred_binary == 0) & (target_binary == 0))
-    
-    if TP + FN + FP == 0:
-        CSI = 0.0
-    else:
-        CSI = TP / (TP + FN + FP)
-    
-    denominator = (TP + FN) * (FN + TN) + (TP + FP) * (FP + TN)
-    if denominator == 0:
-        HSS = 0.0
-    else:
-        HSS = (TP * TN - FN * FP) / denominator
-    
-    return CSI, HSS
+    n_bins = int(round(max_dbz / bin_width)) + 1
+    counts = np.zeros(n_bins * n_bins, dtype=np.int64)
+    sq_err_sum = np.zeros(n_bins, dtype=np.float64)
+    pred = pred.reshape(1, -1) if np.ndim(pred) < 2 else pred
+    target = target.reshape(1, -1) if np.ndim(target) < 2 else target
+    for start in range(0, len(pred), chunk_size):
+        p = np.asarray(pred[start:start + chunk_size], dtype=np.float32).ravel() * scale
+        t = np.asarray(target[start:start + chunk_size], dtype=np.float32).ravel() * scale
+        p_bin = np.clip(np.floor(p / bin_width), 0, n_bins - 1).astype(np.int64)
+        t_bin = np.clip(np.floor(t / bin_width), 0, n_bins - 1).astype(np.int64)
+        counts += np.bincount(p_bin * n_bins + t_bin, minlength=n_bins * n_bins)
+        sq_err_sum += np.bincount(t_bin, weights=(p.astype(np.float64) - t) ** 2, minlength=n_bins)
+    return {
+        "counts": counts.reshape(n_bins, n_bins),
+        "sq_err_sum": sq_err_sum,
+        "bin_width": float(bin_width),
+    }
 
-def compute_b_mse(pred, target, maxv=85.0, eps=1e-6):
+def merge_histograms(hist_a, hist_b):
     """
-    Compute Balanced Mean Squared Error (B-MSE) using the same weighting scheme as in training.
-    
+    Sum two histograms from joint_histogram() with the same binning.
+
     Parameters
     ----------
-    pred : np.ndarray
-        Predicted values in dBZ.
-    target : np.ndarray
-        Ground truth values in dBZ.
-    maxv : float, optional
-        Maximum value for normalization (default: 85.0).
-    eps : float, optional
-        Small epsilon to avoid division by zero (default: 1e-6).
-    
+    hist_a, hist_b : dict
+        Histograms to merge.
+
     Returns
     -------
-    float
-        B-MSE value.
+    dict
+        Merged histogram.
     """
-    if pred.max() <= 1.0 and target.max() <= 1.0:
-        pred = pred * (maxv + eps)
-        target = target * (maxv + eps)
-    
-    w = np.ones_like(target, dtype=np.float32)  
+    if hist_a["counts"].shape != hist_b["counts"].shape or hist_a["bin_width"] != hist_b["bin_width"]:
+        raise ValueError("histograms must use the same binning")
+    return {
+        "counts": hist_a["counts"] + hist_b["counts"],
+        "sq_err_sum": hist_a["sq_err_sum"] + hist_b["sq_err_sum"],
+        "bin_width": hist_a["bin_width"],
+    }
 
-    w = np.where(target < 2, 1.0, w)
-    w = np.where((target >= 2) & (target < 5), 2.0, w)
-    w = np.where((target >= 5) & (target < 10), 5.0, w)
-    w = np.where((target >= 10) & (target < 30), 10.0, w)
-    w = np.where((target >= 30) & (target < 45), 30.0, w)
-    w = np.where(target >= 45, 45.0, w)
-    
-    b_mse = np.mean(w * (pred - target) ** 2)
-    return b_mse
+def _edge_index(value, bin_width, n_bins):
+    """Index of the bin edge at `value` dBZ; raises if `value` is not on a bin edge."""
+    k = value / bin_width
+    if abs(k - round(k)) > 1e-6:
+        raise ValueError(f"{value} dBZ is not a multiple of the histogram bin width {bin_width}")
+    return int(min(max(round(k), 0), n_bins))
 
-def compute_forecasting_metrics(pred, target, maxv=85.0, eps=1e-6):
+def metrics_from_histogram(hist, thresholds=DEFAULT_THRESHOLDS, ranges=DEFAULT_RANGES):
+    """
+    Derive forecasting metrics for any threshold set from a joint histogram.
+
+    Thresholds and range limits must lie on bin edges (multiples of the bin width); the
+    metrics are then identical to computing them on the full arrays.
+
+    Parameters
+    ----------
+    hist : dict
+        Histogram from joint_histogram() or ForecastingMetricsAccumulator.to_histogram().
+    thresholds : sequence of float, optional
+        Thresholds in dBZ for the categorical scores (default: (2, 5, 10, 30, 45)).
+    ranges : sequence of tuple, optional
+        Target dBZ ranges [min, max) for MSE-by-range (default: ((0, 20), (20, 35), (35, 45), (45, 100))).
+
+    Returns
+    -------
+    dict
+        Dictionary containing:
+        - 'b_mse': Balanced Mean Squared Error
+        - 'mse': Mean Squared Error
+        - 'csi_by_threshold', 'hss_by_threshold', 'pod_by_threshold', 'far_by_threshold',
+          'bias_by_threshold': scores for each threshold
+        - 'confusion_by_threshold': TP/FP/TN/FN counts for each threshold
+        - 'mse_by_range': MSE for each target range
+    """
+    counts = np.asarray(hist["counts"], dtype=np.int64)
+    sq_err_sum = np.asarray(hist["sq_err_sum"], dtype=np.float64)
+    bin_width = float(hist["bin_width"])
+    n_bins = counts.shape[0]
+    total = int(counts.sum())
+    target_counts = counts.sum(axis=0)
+
+    # at_least[i, j]: number of pixels with pred_bin >= i and target_bin >= j
+    at_least = np.zeros((n_bins + 1, n_bins + 1), dtype=np.int64)
+    at_least[:n_bins, :n_bins] = counts[::-1, ::-1].cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]
+
+    scores = {name: {} for name in ("csi", "hss", "pod", "far", "bias")}
+    confusion_by_threshold = {}
+    for th in thresholds:
+        k = _edge_index(th, bin_width, n_bins)
+        tp = int(at_least[k, k])
+        fp = int(at_least[k, 0]) - tp
+        fn = int(at_least[0, k]) - tp
+        tn = total - tp - fp - fn
+        denom = (tp + fn) * (fn + tn) + (tp + fp) * (fp + tn)
+        scores["csi"][f"csi_{th}"] = tp / (tp + fp + fn) if (tp + fp + fn) > 0 else 0.0
+        scores["hss"][f"hss_{th}"] = ((tp * tn) - (fn * fp)) / denom if denom > 0 else 0.0
+        scores["pod"][f"pod_{th}"] = tp / (tp + fn) if (tp + fn) > 0 else 0.0
+        scores["far"][f"far_{th}"] = fp / (tp + fp) if (tp + fp) > 0 else 0.0
+        scores["bias"][f"bias_{th}"] = (tp + fp) / (tp + fn) if (tp + fn) > 0 else 0.0
+        confusion_by_threshold[str(th)] = {"TP": tp, "FP": fp, "TN": tn, "FN": fn}
+
+    lower_edges = np.arange(n_bins) * bin_width
+    weights = np.asarray(B_MSE_WEIGHTS)[np.searchsorted(B_MSE_EDGES, lower_edges, side='right')]
+    mse_by_range = {}
+    for r_min, r_max in ranges:
+        lo, hi = _edge_index(r_min, bin_width, n_bins), _edge_index(r_max, bin_width, n_bins)
+        n_pix = target_counts[lo:hi].sum()
+        mse_by_range[f"mse_{r_min}_{r_max}"] = float(sq_err_sum[lo:hi].sum() / n_pix) if n_pix > 0 else float('nan')
+
+    return {
+        "b_mse": float((weights * sq_err_sum).sum() / total) if total > 0 else float('nan'),
+        "mse": float(sq_err_sum.sum() / total) if total > 0 else float('nan'),
+        **{f"{name}_by_threshold": {key: float(v) for key, v in values.items()} for name, values in scores.items()},
+        "confusion_by_threshold": confusion_by_threshold,
+        "mse_by_range": mse_by_range,
+    }
+
+def save_histogram(hist, path):
+    """
+    Save a joint histogram to an .npz file.
+
+    Parameters
+    ----------
+    hist : dict
+        Histogram from joint_histogram().
+    path : str
+        Output .npz path.
+    """
+    np.savez(path, counts=hist["counts"], sq_err_sum=hist["sq_err_sum"], bin_width=hist["bin_width"])
+
+def load_histogram(path):
+    """
+    Load a joint histogram saved with save_histogram().
+
+    Parameters
+    ----------
+    path : str
+        Path to the .npz file.
+
+    Returns
+    -------
+    dict
+        Histogram accepted by metrics_from_histogram().
+    """
+    data = np.load(path)
+    return {"counts": data["counts"], "sq_err_sum": data["sq_err_sum"], "bin_width": float(data["bin_width"])}
+
+def compute_forecasting_metrics(pred, target, maxv=85.0, eps=1e-6, thresholds=DEFAULT_THRESHOLDS):
     """
     Compute forecasting metrics including CSI, HSS, and B-MSE.
+
+    All thresholds are evaluated from a single joint histogram pass (see joint_histogram()),
+    so the cost does not grow with the number of thresholds. Thresholds must be whole dBZ values.
     
     Parameters
     ----------
@@ -98,37 +208,32 @@ def compute_forecasting_metrics(pred, target, maxv=85.0, eps=1e-6):
         Maximum value for normalization (default: 85.0).
     eps : float, optional
         Small epsilon to avoid division by zero (default: 1e-6).
+    thresholds : sequence of int, optional
+        Thresholds in dBZ for the categorical scores (default: (2, 5, 10, 30, 45)).
     
     Returns
     -------
     dict
         Dictionary containing all metrics:
         - 'b_mse': Balanced Mean Squared Error
-        - 'csi_by_threshold': CSI scores for thresholds [2, 5, 10, 30, 45] dBZ
-        - 'hss_by_threshold': HSS scores for thresholds [2, 5, 10, 30, 45] dBZ
+        - 'csi_by_threshold': CSI scores for each threshold
+        - 'hss_by_threshold': HSS scores for each threshold
+        - 'pod_by_threshold', 'far_by_threshold', 'bias_by_threshold': POD, FAR and frequency bias for each threshold
     """
-
-    pred_dBZ = pred.copy()
-    target_dBZ = target.copy()
+    scale = 1.0
     if pred.max() <= 1.0 and target.max() <= 1.0:
-        pred_dBZ = pred * (maxv + eps)
-        target_dBZ = target * (maxv + eps)
-    
-    b_mse_value = compute_b_mse(pred, target, maxv=maxv, eps=eps)
+        scale = maxv + eps
     
-    thresholds = [2, 5, 10, 30, 45]
-    csi_by_threshold = {}
-    hss_by_threshold = {}
-    
-    for th in thresholds:
-        csi, hss = compute_csi_hss(pred_dBZ, target_dBZ, th)
-        csi_by_threshold[f"csi_{th}"] = float(csi)
-        hss_by_threshold[f"hss_{th}"] = float(hss)  
+    hist = joint_histogram(pred, target, scale=scale)
+    metrics = metrics_from_histogram(hist, thresholds=thresholds)
     
     return {
-        "b_mse": float(b_mse_value),
-        "csi_by_threshold": csi_by_threshold,
-        "hss_by_threshold": hss_by_threshold
+        "b_mse": metrics["b_mse"],
+        "csi_by_threshold": metrics["csi_by_threshold"],
+        "hss_by_threshold": metrics["hss_by_threshold"],
+        "pod_by_threshold": metrics["pod_by_threshold"],
+        "far_by_threshold": metrics["far_by_threshold"],
+        "bias_by_threshold": metrics["bias_by_threshold"]
     }
 
 
@@ -0,0 +1,100 @@
+import pytest
+import torch
+
+from src.training.utils.training_utils import (
+    _LUTWeightedMSE,
+    _lut_tensors,
+    lut_weighted_mse,
+    b_mse_loss,
+    weighted_mse_loss,
+    B_MSE_EDGES,
+    B_MSE_WEIGHTS,
+)
+
+MAXV, EPS = 85.0, 1e-6
+
+
+def where_b_mse(pred, target, maxv=MAXV, eps=EPS):
+    """Original B-MSE: one mask per weight level."""
+    pred_dBZ = pred * (maxv + eps)
+    target_dBZ = target * (maxv + eps)
+    w = torch.ones_like(target_dBZ)
+    w = torch.where((target_dBZ >= 2) & (target_dBZ < 5), torch.tensor(2.0), w)
+    w = torch.where((target_dBZ >= 5) & (target_dBZ < 10), torch.tensor(5.0), w)
+    w = torch.where((target_dBZ >= 10) & (target_dBZ < 30), torch.tensor(10.0), w)
+    w = torch.where((target_dBZ >= 30) & (target_dBZ < 45), torch.tensor(30.0), w)
+    w = torch.where(target_dBZ >= 45, torch.tensor(45.0), w)
+    return (w * (pred_dBZ - target_dBZ) ** 2).mean()
+
+
+def where_weighted_mse(pred, target, threshold=30.0, weight_high=10.0, maxv=MAXV, eps=EPS):
+    """Original weighted MSE: weight_high strictly above the threshold."""
+    pred_dBZ = pred * (maxv + eps)
+    target_dBZ = target * (maxv + eps)
+    weight = torch.ones_like(target_dBZ)
+    weight[target_dBZ > threshold] = weight_high
+    return ((pred_dBZ - target_dBZ) ** 2 * weight).mean()
+
+
+def make_batch(seed=0, shape=(2, 3, 9, 7)):
+    g = torch.Generator().manual_seed(seed)
+    pred = torch.rand(shape, generator=g)
+    target = torch.rand(shape, generator=g) ** 2
+    # Targets at the bucket edges and their float32 neighbours, where < and <= differ
+    flat = target.view(-1)
+    edge_values = torch.tensor([e / (MAXV + EPS) for e in B_MSE_EDGES])
+    edge_values = torch.cat([torch.nextafter(edge_values, torch.zeros(1)), edge_values,
+                             torch.nextafter(edge_values, torch.ones(1))])
+    for k, value in enumerate(edge_values):
+        flat[k::40] = value
+    return pred, target
+
+
+def lut_b_mse(pred, target, maxv=MAXV, eps=EPS, fused=True):
+    return lut_weighted_mse(pred, target, B_MSE_EDGES, B_MSE_WEIGHTS, maxv=maxv, eps=eps, right=True, fused=fused)
+
+
+def lut_threshold_mse(pred, target, maxv=MAXV, eps=EPS, fused=True):
+    return lut_weighted_mse(pred, target, (30.0,), (1.0, 10.0), maxv=maxv, eps=eps, right=False, fused=fused)
+
+
+@pytest.mark.parametrize("fused", [False, True])
+@pytest.mark.parametrize("loss, reference", [
+    (b_mse_loss, where_b_mse),
+    (weighted_mse_loss, where_weighted_mse),
+    (lut_b_mse, where_b_mse),
+    (lut_threshold_mse, where_weighted_mse),
+])
+def test_lut_loss_matches_masks(loss, reference, fused):
+    pred, target = make_batch()
+    pred_ref = pred.clone().requires_grad_(True)
+    pred = pred.clone().requires_grad_(True)
+    value = loss(pred, target, maxv=MAXV, eps=EPS, fused=fused)
+    expected = reference(pred_ref, target)
+    value.backward()
+    expected.backward()
+    torch.testing.assert_close(value, expected, rtol=1e-5, atol=0)
+    torch.testing.assert_close(pred.grad, pred_ref.grad, rtol=1e-5, atol=1e-7)
+
+
+@pytest.mark.parametrize("right", [True, False])
+def test_fused_lut_backward_gradcheck(right):
+    pred, target = make_batch(seed=1, shape=(2, 1, 4, 3))
+    pred = pred.double().requires_grad_(True)
+    target = target.double()
+    edges, weights = _lut_tensors(B_MSE_EDGES, B_MSE_WEIGHTS, target.device)
+    assert torch.autograd.gradcheck(
+        lambda p: _LUTWeightedMSE.apply(p, target, edges, weights, MAXV + EPS, right), (pred,)
+    )
+
+
+def test_fused_losses_are_default_and_b_mse_deviation_is_rounding():
+    g = torch.Generator().manual_seed(0)
+    target = torch.rand((4, 14, 90, 60), generator=g) ** 3
+    pred = (target + 0.05 * torch.randn(target.shape, generator=g)).clamp(0, 1)
+    assert b_mse_loss(pred, target) == b_mse_loss(pred, target, fused=True)
+    assert weighted_mse_loss(pred, target) == weighted_mse_loss(pred, target, fused=True)
+    # (w * diff) * diff instead of w * diff ** 2: float32 rounding of the mean only
+    fused, masks = b_mse_loss(pred, target), b_mse_loss(pred, target, fused=False)
+    torch.testing.assert_close(fused, masks, rtol=1e-6, atol=0)
+    torch.testing.assert_close(fused, where_b_mse(pred, target), rtol=1e-6, atol=0)
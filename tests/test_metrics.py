@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+import torch
+
+from src.training.utils.training_utils import ForecastingMetricsAccumulator
+
+MAXV, EPS = 85.0, 1e-6
+THRESHOLDS = [2, 5, 10, 30, 45]
+
+
+def around_threshold(th):
+    """Normalized float32 values nearest to th dBZ and their neighbours on both sides."""
+    value = np.float32(th / (MAXV + EPS))
+    return [float(np.nextafter(value, np.float32(-1))), float(value), float(np.nextafter(value, np.float32(2)))]
+
+
+def make_batches(n_batches=4, shape=(3, 2, 12, 10), seed=0):
+    """Normalized (pred, target) batches, with some targets on the threshold boundaries."""
+    g = torch.Generator().manual_seed(seed)
+    batches = []
+    for _ in range(n_batches):
+        pred = torch.rand(shape, generator=g) ** 2
+        target = torch.rand(shape, generator=g) ** 2
+        flat = target.view(-1)
+        for k, value in enumerate(v for th in THRESHOLDS for v in around_threshold(th)):
+            flat[k::50] = value
+        batches.append((pred, target))
+    return batches
+
+
+def loop_metrics(batches, thresholds=THRESHOLDS):
+    """Original metric accumulation: one confusion matrix per threshold and a masked B-MSE per batch."""
+    b_mse_sum = mse_sum = 0.0
+    n_pixels = n_samples = 0
+    counts = {th: {"TP": 0, "FP": 0, "TN": 0, "FN": 0} for th in thresholds}
+    for pred, target in batches:
+        pred_dBZ = pred.numpy() * (MAXV + EPS)
+        target_dBZ = target.numpy() * (MAXV + EPS)
+        w = np.ones_like(target_dBZ, dtype=np.float32)
+        w = np.where((target_dBZ >= 2) & (target_dBZ < 5), 2.0, w)
+        w = np.where((target_dBZ >= 5) & (target_dBZ < 10), 5.0, w)
+        w = np.where((target_dBZ >= 10) & (target_dBZ < 30), 10.0, w)
+        w = np.where((target_dBZ >= 30) & (target_dBZ < 45), 30.0, w)
+        w = np.where(target_dBZ >= 45, 45.0, w)
+        b_mse_sum += np.mean(w * (pred_dBZ - target_dBZ) ** 2) * pred.shape[0]
+        mse_sum += np.sum((pred_dBZ - target_dBZ) ** 2)
+        n_pixels += pred_dBZ.size
+        n_samples += pred.shape[0]
+        for th in thresholds:
+            pred_bin, true_bin = pred_dBZ >= th, target_dBZ >= th
+            counts[th]["TP"] += int(np.sum(pred_bin & true_bin))
+            counts[th]["FP"] += int(np.sum(pred_bin & ~true_bin))
+            counts[th]["TN"] += int(np.sum(~pred_bin & ~true_bin))
+            counts[th]["FN"] += int(np.sum(~pred_bin & true_bin))
+    csi, hss = {}, {}
+    for th in thresholds:
+        tp, fp, tn, fn = (counts[th][k] for k in ("TP", "FP", "TN", "FN"))
+        csi[f"csi_{th}"] = tp / (tp + fp + fn) if (tp + fp + fn) > 0 else 0.0
+        denom = (tp + fn) * (fn + tn) + (tp + fp) * (fp + tn)
+        hss[f"hss_{th}"] = ((tp * tn) - (fn * fp)) / denom if denom > 0 else 0.0
+    return {
+        "b_mse": b_mse_sum / n_samples,
+        "mse": mse_sum / n_pixels,
+        "csi_by_threshold": csi,
+        "hss_by_threshold": hss,
+        "confusion_by_threshold": {str(th): counts[th] for th in thresholds},
+    }
+
+
+def test_accumulator_matches_loop_metrics():
+    batches = make_batches()
+    acc = ForecastingMetricsAccumulator(THRESHOLDS, maxv=MAXV, eps=EPS)
+    for pred, target in batches:
+        acc.update(pred, target)
+    metrics = acc.compute()
+    expected = loop_metrics(batches)
+
+    assert metrics["confusion_by_threshold"] == expected["confusion_by_threshold"]
+    for key in ("csi_by_threshold", "hss_by_threshold"):
+        assert metrics[key] == pytest.approx(expected[key], rel=1e-12)
+    assert metrics["mse"] == pytest.approx(expected["mse"], rel=1e-6)
+    assert metrics["b_mse"] == pytest.approx(expected["b_mse"], rel=1e-6)
+    assert acc.total_samples == sum(p.shape[0] for p, _ in batches)
+
+
+def test_accumulator_accepts_numpy_and_reset():
+    batches = make_batches(n_batches=2)
+    acc = ForecastingMetricsAccumulator(THRESHOLDS, maxv=MAXV, eps=EPS)
+    acc.update(batches[0][0], batches[0][1])
+    acc.reset()
+    for pred, target in batches:
+        acc.update(pred.numpy(), target.numpy())
+    assert acc.compute()["confusion_by_threshold"] == loop_metrics(batches)["confusion_by_threshold"]
+
+
+def test_histogram_metrics_at_other_thresholds_match_loop():
+    from src.utils.storm_utils import metrics_from_histogram
+    batches = make_batches(seed=1)
+    acc = ForecastingMetricsAccumulator(THRESHOLDS, maxv=MAXV, eps=EPS)
+    for pred, target in batches:
+        acc.update(pred, target)
+    thresholds = [0, 15, 20, 25, 35, 40, 50, 90]
+    metrics = metrics_from_histogram(acc.to_histogram(), thresholds=thresholds)
+    expected = loop_metrics(batches, thresholds)
+    assert metrics["confusion_by_threshold"] == expected["confusion_by_threshold"]
+    assert metrics["csi_by_threshold"] == pytest.approx(expected["csi_by_threshold"], rel=1e-12)
+    assert metrics["hss_by_threshold"] == pytest.approx(expected["hss_by_threshold"], rel=1e-12)
+
+
+def test_numpy_histogram_matches_accumulator():
+    from src.utils.storm_utils import joint_histogram, merge_histograms
+    batches = make_batches(seed=2)
+    acc = ForecastingMetricsAccumulator(THRESHOLDS, maxv=MAXV, eps=EPS)
+    hist = None
+    for pred, target in batches:
+        acc.update(pred, target)
+        h = joint_histogram(pred.numpy(), target.numpy(), scale=MAXV + EPS)
+        hist = h if hist is None else merge_histograms(hist, h)
+    on_device = acc.to_histogram()
+    np.testing.assert_array_equal(hist["counts"], on_device["counts"])
+    np.testing.assert_allclose(hist["sq_err_sum"], on_device["sq_err_sum"], rtol=1e-6)
+
+
+def test_mse_by_range_matches_masks():
+    batches = make_batches(seed=3)
+    acc = ForecastingMetricsAccumulator(THRESHOLDS, maxv=MAXV, eps=EPS)
+    for pred, target in batches:
+        acc.update(pred, target)
+    pred_dBZ = np.concatenate([p.numpy().ravel() for p, _ in batches]) * np.float32(MAXV + EPS)
+    target_dBZ = np.concatenate([t.numpy().ravel() for _, t in batches]) * np.float32(MAXV + EPS)
+    for (r_min, r_max), (key, value) in zip([(0, 20), (20, 35), (35, 45), (45, 100)], acc.compute()["mse_by_range"].items()):
+        mask = (target_dBZ >= r_min) & (target_dBZ < r_max)
+        assert key == f"mse_{r_min}_{r_max}"
+        assert value == pytest.approx(np.mean((pred_dBZ[mask].astype(np.float64) - target_dBZ[mask]) ** 2), rel=1e-6)
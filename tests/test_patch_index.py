@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from src.training.utils.dataloaders import _build_patch_index, _read_block, PatchRadarWindowDataset
+
+
+def loop_patch_index(cube, seq_in, seq_out, size, stride, thresh, frac, maxv=85.0, wrap_azimuth=False):
+    """
+    Patch search of the original PatchRadarWindowDataset: one threshold test per (t, y, x).
+
+    With wrap_azimuth, rows are taken modulo H and every row is a valid patch start.
+    """
+    T, C, H, W = cube.shape
+    thresh_normalized = thresh / (maxv + 1e-6)
+    patches = []
+    for t in range(T - seq_in - seq_out + 1):
+        for y in range(0, H if wrap_azimuth else H - size + 1, stride):
+            rows = np.arange(y, y + size) % H
+            for x in range(0, W - size + 1, stride):
+                Y_patch = np.maximum(cube[t+seq_in:t+seq_in+seq_out][:, :, rows, x:x+size], 0) / (maxv + 1e-6)
+                if (Y_patch > thresh_normalized).sum() / Y_patch.size >= frac:
+                    patches.append((t, y, x))
+    return patches
+
+
+def make_cube(T=14, C=2, H=24, W=20, seed=0):
+    rng = np.random.default_rng(seed)
+    # About 20% of the pixels above 35 dBZ, and some negative values
+    return (rng.random((T, C, H, W)) ** 3 * 70 - 2).astype(np.float32)
+
+
+@pytest.mark.parametrize("seq_in, seq_out, size, stride, frac", [
+    (3, 1, 8, 8, 0.2),
+    (2, 3, 8, 4, 0.2),
+    (4, 2, 7, 5, 0.25),
+    # Random-crop regions are larger than the stride: max(crop_sizes) + patch_stride
+    (2, 1, 12, 4, 0.2),
+])
+def test_patch_index_matches_loop(seq_in, seq_out, size, stride, frac):
+    cube = make_cube()
+    patches, n_checked = _build_patch_index(cube, seq_in, seq_out, size, stride, 35.0, frac, chunk_size=4)
+    expected = loop_patch_index(cube, seq_in, seq_out, size, stride, 35.0, frac)
+    assert 0 < len(expected) < n_checked
+    assert sorted(patches) == sorted(expected)
+
+
+def test_random_crops_stay_inside_regions():
+    cube = make_cube()
+    ds = PatchRadarWindowDataset(cube, 2, 1, patch_size=6, patch_stride=4, patch_thresh=35.0, patch_frac=0.2,
+                                 random_crop=True, crop_sizes=(4, 6))
+    assert ds.region_size == 10
+    ds.set_crop_size(4)
+    for i in range(len(ds)):
+        t, y0, x0 = ds.patches[i]
+        X, Y, t_i, y, x = ds[i]
+        assert X.shape[-2:] == (4, 4) and Y.shape[-2:] == (4, 4)
+        assert y0 <= y <= y0 + 6 and x0 <= x <= x0 + 6
+
+
+@pytest.mark.parametrize("size, stride", [(8, 4), (7, 5), (12, 4)])
+def test_wrapped_patch_index_matches_loop(size, stride):
+    cube = make_cube()
+    patches, n_checked = _build_patch_index(cube, 2, 2, size, stride, 35.0, 0.2, chunk_size=4, wrap_azimuth=True)
+    expected = loop_patch_index(cube, 2, 2, size, stride, 35.0, 0.2, wrap_azimuth=True)
+    # Some patches cross the 0/360 degree seam
+    assert any(y + size > cube.shape[2] for _, y, _ in expected)
+    assert sorted(patches) == sorted(expected)
+    assert n_checked == (cube.shape[0] - 3) * len(range(0, cube.shape[2], stride)) * len(range(0, cube.shape[3] - size + 1, stride))
+
+
+def test_wrapped_read_matches_modular_index():
+    cube = make_cube()
+    H = cube.shape[2]
+    block = _read_block(cube, 3, 6, H - 5, 2, 9, 7)
+    rows = np.arange(H - 5, H + 4) % H
+    expected = np.maximum(cube[3:6][:, :, rows, 2:9], 0) / (85.0 + 1e-6)
+    np.testing.assert_array_equal(block, expected.astype(np.float32))
@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import DataLoader, RandomSampler, Subset
+
+from src.training.utils.dataloaders import PatchRadarWindowDataset
+from src.training.utils.samplers import EventWeightedSampler, ResumableSampler
+from src.training.utils.training_utils import get_rng_state, set_rng_state
+
+
+def make_scores(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    scores = rng.random(n) ** 3
+    scores[rng.random(n) < 0.3] = 0.0  # dry windows
+    return scores
+
+
+@pytest.mark.parametrize("num_replicas, num_samples", [(2, None), (3, 50), (4, 7)])
+def test_distributed_draw_is_strided_single_draw(num_replicas, num_samples):
+    scores = make_scores()
+    samplers = [EventWeightedSampler(scores, dry_keep=0.5, num_samples=num_samples, num_replicas=num_replicas, rank=r, seed=5)
+                for r in range(num_replicas)]
+    per_replica = samplers[0].samples_per_replica
+    assert per_replica * num_replicas >= samplers[0].num_samples > (per_replica - 1) * num_replicas
+    for epoch in (1, 2):
+        for s in samplers:
+            s.set_epoch(epoch)
+        draws = [list(s) for s in samplers]
+        # The same draw as a single process with the generator of the shared draw, strided over the ranks
+        single = EventWeightedSampler(scores, dry_keep=0.5, num_samples=per_replica * num_replicas,
+                                      generator=torch.Generator().manual_seed(5 + epoch))
+        shared = list(single)
+        for r, draw in enumerate(draws):
+            assert len(draw) == len(samplers[r]) == per_replica
+            assert draw == shared[r::num_replicas]
+        # Every process draws again the same indices for the same epoch
+        assert [list(s) for s in samplers] == draws
+
+
+def test_distributed_draw_changes_with_epoch_and_skips_dropped_dry_windows():
+    scores = make_scores()
+    sampler = EventWeightedSampler(scores, dry_keep=0.0, num_replicas=2, rank=1)
+    sampler.set_epoch(1)
+    first = list(sampler)
+    sampler.set_epoch(2)
+    assert list(sampler) != first
+    assert not any(scores[i] <= 0 for i in first)
+
+
+def test_uneven_draw_gives_every_rank_the_same_number_of_steps():
+    scores = make_scores(61, seed=2)
+    samplers = [EventWeightedSampler(scores, dry_keep=0.5, num_replicas=3, rank=r, seed=7) for r in range(3)]
+    num_samples = samplers[0].num_samples
+    assert num_samples % 3 != 0
+    draws = [list(s) for s in samplers]
+    # Every rank runs the same number of steps, padded up to a multiple of the replicas
+    assert len({len(s) for s in samplers}) == 1
+    assert [len(d) for d in draws] == [len(s) for s in samplers] == [-(-num_samples // 3)] * 3
+    loaders = [DataLoader(range(len(scores)), batch_size=4, sampler=s) for s in samplers]
+    assert len({len(list(dl)) for dl in loaders}) == 1
+    # Interleaved, the ranks' draws rebuild the shared draw of a single process
+    single = EventWeightedSampler(scores, dry_keep=0.5, num_samples=3 * len(samplers[0]),
+                                  generator=torch.Generator().manual_seed(7))
+    assert [i for step in zip(*draws) for i in step] == list(single)
+
+
+def interrupted_epoch(sampler, skip):
+    """Indices of an epoch and the generator states of a checkpoint after `skip` indices."""
+    torch.manual_seed(0)
+    np.random.seed(0)
+    epoch_rng = get_rng_state()
+    it = iter(sampler)
+    indices = [next(it) for _ in range(skip)]
+    # Random crops drawn for the batches done before the checkpoint
+    torch.rand(skip)
+    np.random.rand(skip)
+    step_rng = get_rng_state()
+    indices += list(it)
+    after = (torch.rand(3), np.random.rand(3))
+    return indices, epoch_rng, step_rng, after
+
+
+@pytest.mark.parametrize("wrapped", [
+    lambda: RandomSampler(range(40)),
+    lambda: EventWeightedSampler(make_scores(40), dry_keep=0.5),
+    lambda: range(40),
+])
+def test_resumable_sampler_continues_interrupted_epoch(wrapped):
+    sampler = ResumableSampler(wrapped())
+    skip = 12
+    full, epoch_rng, step_rng, after = interrupted_epoch(sampler, skip)
+
+    set_rng_state(epoch_rng)
+    sampler.resume(skip, step_rng)
+    resumed = list(sampler)
+    assert resumed == full[skip:]
+    # The generators continue from the checkpoint, as in the interrupted run
+    torch.testing.assert_close(torch.rand(3), after[0])
+    np.testing.assert_array_equal(np.random.rand(3), after[1])
+    # The next epoch is complete again
+    assert len(list(sampler)) == len(full) == len(sampler)
+
+
+def test_resumable_sampler_forwards_set_epoch():
+    sampler = ResumableSampler(EventWeightedSampler(make_scores(), num_replicas=2, rank=0))
+    sampler.set_epoch(3)
+    assert sampler.sampler.epoch == 3
+
+
+def test_random_crops_resume_with_workers():
+    rng = np.random.default_rng(0)
+    cube = (rng.random((30, 1, 32, 32)) * 60).astype(np.float32)
+    ds = PatchRadarWindowDataset(cube, 2, 1, patch_size=8, patch_stride=8, patch_thresh=0.0, patch_frac=0.0,
+                                 random_crop=True, crop_sizes=(4, 8))
+    ds.set_crop_size(4)
+    sampler = ResumableSampler(RandomSampler(range(len(ds))))
+    dl = DataLoader(Subset(ds, list(range(len(ds)))), 4, sampler=sampler, num_workers=2)
+    torch.manual_seed(1)
+    epoch_rng = get_rng_state()
+    full = [batch[2:] for batch in dl]
+    skip = 5
+    set_rng_state(epoch_rng)
+    sampler.resume(skip * 4, get_rng_state())
+    ds.first_batch = skip
+    resumed = [batch[2:] for batch in dl]
+    assert len(resumed) == len(full) - skip
+    for a, b in zip(resumed, full[skip:]):
+        for x, y in zip(a, b):
+            torch.testing.assert_close(x, y)